@@ -0,0 +1,387 @@
+"""
+Lokalna baza analityczna (SQLite) zasilana etapami pipeline.py:
+- rzis_wiersze: wiersze RZiS per placówka (parse_rzis_pdf),
+- rzis_podsumowanie: pozycje zestawienia per placówka i rok (build_summary),
+- placowki: słownik placówek z kodem TERYT gminy,
+- wykaz: wiersze wykazu szkół/placówek (wybrane kolumny),
+- gus_prognoza: prognozy ludności GUS (Tabl. 1) per TERYT / wariant / płeć / wiek / rok,
+  z zakresem wieku (wiek_od, wiek_do), więc grupy typu 3–6 to zwykły filtr zakresu.
+Pierwsza budowa: od zera do pliku tymczasowego i atomowa podmiana; kolejne – tylko grupy tabel, których wejście
+się zmieniło (skróty w tabeli wersje), w jednej transakcji. Indeksy zakładane po wstawieniu danych.
+Zapytania: `python analytics_store.py tabele | sql "SELECT ..." | koszt-popyt --rok 2030`.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import analyze_financials
+import extract_gus_children
+import gus_source
+
+DB_PATH = Path("cache/analityka.sqlite")
+ROK_SPRAWOZDAN = 2024
+# prognozy GUS ładowane do bazy: jednostki o kodach TERYT zaczynających się od (24 = śląskie)
+TERYT_PREFIKSY = ("24",)
+# placówki z pobrane/ to jednostki miasta Racibórz
+TERYT_PLACOWEK = extract_gus_children.MIASTO_TERYT
+
+KOLUMNY_PODSUMOWANIA = [c for c in analyze_financials.SUMMARY_COLUMNS if c not in analyze_financials.TEXT_COLUMNS]
+
+# kolumna w bazie -> kolumna wykazu
+KOLUMNY_WYKAZU = {
+    "id_podmiotu": "idPodmiotGlowny",
+    "id_nadrzedny": "idPodmiotNadrzedny",
+    "nazwa": "Nazwa placówki",
+    "typ_podmiotu": "Typ podmiotu",
+    "rodzaj": "Rodzaj szkoły/placówki",
+    "kategoria": "Rodzaj_kategorii",
+    "powiat": "Powiat",
+    "gmina": "Gmina",
+    "miejscowosc": "Miejscowość",
+    "ucz_ogolem": "ucz_ogolem",
+    "ucz_dziewczeta": "w tym_ucz_dziewczeta",
+    "oddz_przedszk": "w tym_w oddz_przedszk",
+    "lb_oddz": "lb_oddz",
+}
+KOLUMNY_WYKAZU_LICZBOWE = {"ucz_ogolem", "ucz_dziewczeta", "oddz_przedszk", "lb_oddz"}
+
+TABLES = {
+    "placowki": """
+CREATE TABLE placowki (
+    placowka TEXT PRIMARY KEY,
+    typ TEXT NOT NULL,
+    teryt TEXT NOT NULL
+)""",
+    "rzis_wiersze": """
+CREATE TABLE rzis_wiersze (
+    placowka TEXT NOT NULL REFERENCES placowki(placowka),
+    rok INTEGER NOT NULL,
+    lp INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    prev_year REAL,
+    current_year REAL,
+    PRIMARY KEY (placowka, rok, lp)
+)""",
+    "rzis_podsumowanie": f"""
+CREATE TABLE rzis_podsumowanie (
+    placowka TEXT NOT NULL REFERENCES placowki(placowka),
+    rok INTEGER NOT NULL,
+    typ TEXT,
+    odczyt TEXT,
+    strony_nieczytelne TEXT,
+    {", ".join(f"{c} REAL" for c in KOLUMNY_PODSUMOWANIA)},
+    PRIMARY KEY (placowka, rok)
+)""",
+    "wykaz": f"""
+CREATE TABLE wykaz (
+    {", ".join(f"{c} {'REAL' if c in KOLUMNY_WYKAZU_LICZBOWE else 'TEXT'}" for c in KOLUMNY_WYKAZU)}
+)""",
+    "gus_prognoza": """
+CREATE TABLE gus_prognoza (
+    teryt TEXT NOT NULL,
+    wariant TEXT NOT NULL,
+    plec TEXT NOT NULL,
+    wiek TEXT NOT NULL,
+    wiek_od INTEGER,
+    wiek_do INTEGER,
+    rok INTEGER NOT NULL,
+    liczba REAL NOT NULL,
+    PRIMARY KEY (teryt, wariant, plec, wiek, rok)
+) WITHOUT ROWID""",
+}
+
+INDEXES = {
+    "placowki": ["CREATE INDEX ix_placowki_teryt ON placowki (teryt)"],
+    "rzis_wiersze": ["CREATE INDEX ix_rzis_wiersze_label ON rzis_wiersze (label)"],
+    "rzis_podsumowanie": ["CREATE INDEX ix_rzis_podsumowanie_rok_typ ON rzis_podsumowanie (rok, typ)"],
+    "wykaz": [
+        "CREATE INDEX ix_wykaz_powiat_gmina ON wykaz (powiat, gmina)",
+        "CREATE INDEX ix_wykaz_kategoria ON wykaz (kategoria)",
+    ],
+    "gus_prognoza": ["CREATE INDEX ix_gus_prognoza_rok_wiek ON gus_prognoza (wariant, plec, rok, wiek_od, wiek_do)"],
+}
+
+# grupy tabel przebudowywane razem – każda z jednego wejścia etapu baza_analityczna
+GROUPS = {
+    "sprawozdania": ("placowki", "rzis_wiersze", "rzis_podsumowanie"),
+    "wykaz": ("wykaz",),
+    "gus_prognoza": ("gus_prognoza",),
+}
+# skrót treści i schematu każdej grupy zapisany w bazie – niezmieniona grupa nie jest przebudowywana
+VERSIONS = "CREATE TABLE IF NOT EXISTS wersje (grupa TEXT PRIMARY KEY, klucz TEXT NOT NULL)"
+
+QUERIES = {
+    # koszt na ucznia wg typu placówek vs prognoza dzieci 3–6 (gminy mają tylko grupy 0–9, więc popyt 3–6
+    # z prognozy powiatu: 4 pierwsze cyfry TERYT gminy)
+    "koszt-popyt": """
+        WITH popyt AS (
+            SELECT teryt, rok, SUM(liczba) AS dzieci_3_6
+            FROM gus_prognoza
+            WHERE wariant = :wariant AND plec = 'ogolem' AND wiek_od >= 3 AND wiek_do <= 6
+            GROUP BY teryt, rok
+        )
+        SELECT p.teryt AS teryt_gminy, d.teryt AS teryt_prognozy, s.typ, d.rok,
+               COUNT(*) AS placowki,
+               SUM(s.koszty_operacyjne) AS koszty_operacyjne,
+               SUM(s.liczba_uczniow) AS uczniowie,
+               SUM(s.koszty_operacyjne) / NULLIF(SUM(s.liczba_uczniow), 0) AS koszt_na_ucznia,
+               d.dzieci_3_6
+        FROM rzis_podsumowanie s
+        JOIN placowki p USING (placowka)
+        JOIN popyt d ON d.teryt = substr(p.teryt, 1, 4)
+        WHERE s.rok = :rok_sprawozdan AND d.rok = :rok
+        GROUP BY p.teryt, d.teryt, s.typ, d.rok
+        ORDER BY koszty_operacyjne DESC
+    """,
+}
+
+
+def age_range(label: str) -> Tuple[str, Optional[int], Optional[int]]:
+    """Etykieta wieku GUS -> (wiek, wiek_od, wiek_do): '5' -> 5..5, '0-9' -> 0..9, '90+' -> 90..NULL."""
+    if label.startswith("Ogółem"):
+        return "ogolem", 0, None
+    if match := re.fullmatch(r"(\d+)\s*[-–]\s*(\d+)", label):
+        lo, hi = int(match.group(1)), int(match.group(2))
+        if hi < lo:
+            # literówka w prognozie gmin GUS: '50-49' zamiast '50-59'
+            hi = lo + 9
+        return f"{lo}-{hi}", lo, hi
+    if match := re.fullmatch(r"(\d+)\s*\+", label):
+        return f"{match.group(1)}+", int(match.group(1)), None
+    if label.isdigit():
+        return label, int(label), int(label)
+    return label, None, None
+
+
+def projection_units(prefixes: Iterable[str] = TERYT_PREFIKSY) -> List[Tuple[str, str]]:
+    """(wariant, TERYT) jednostek z prognoz GUS o kodach zaczynających się od podanych prefiksów."""
+    prefixes = tuple(prefixes)
+    return sorted(key for key in gus_source.build_index() if key[1].startswith(prefixes))
+
+
+def projection_sources(prefixes: Iterable[str] = TERYT_PREFIKSY) -> List[Path]:
+    """Pliki źródłowe prognoz (archiwum .zip albo skoroszyt) – do kluczy przebudowy."""
+    paths = set()
+    for wariant, teryt in projection_units(prefixes):
+        archive, member, _ = gus_source.find(teryt, wariant)
+        paths.add(archive if archive is not None else Path(member))
+    return sorted(paths)
+
+
+def load_projections(prefixes: Iterable[str] = TERYT_PREFIKSY) -> pd.DataFrame:
+    """Tabl. 1 prognoz GUS w długim formacie: teryt, wariant, plec, wiek, wiek_od, wiek_do, rok, liczba."""
+    frames = []
+    for wariant, teryt in projection_units(prefixes):
+        table = gus_source.read_tables(teryt, ("Tabl. 1",), wariant)["Tabl. 1"]
+        lata = table["lata"]
+        for plec, (labels, values) in table["bloki"].items():
+            wiek, od, do = zip(*(age_range(label) for label in labels))
+            frame = pd.DataFrame(
+                {
+                    "teryt": teryt,
+                    "wariant": wariant,
+                    "plec": plec,
+                    "wiek": np.repeat(wiek, len(lata)),
+                    "wiek_od": np.repeat(np.array(od, dtype=float), len(lata)),
+                    "wiek_do": np.repeat(np.array(do, dtype=float), len(lata)),
+                    "rok": np.tile(lata, len(labels)),
+                    "liczba": values.reshape(-1),
+                }
+            )
+            frames.append(frame[frame["liczba"].notna()])
+    df = pd.concat(frames, ignore_index=True)
+    return df.astype({"wiek_od": "Int64", "wiek_do": "Int64"})
+
+
+def _rows(df: pd.DataFrame) -> List[tuple]:
+    """Wiersze do executemany: NaN/NA -> NULL, typy NumPy -> typy Pythona (kolumnami, bez pętli po komórkach)."""
+    columns = [col.astype(object).where(col.notna(), None).tolist() for _, col in df.items()]
+    return list(zip(*columns))
+
+
+def _insert(con: sqlite3.Connection, table: str, df: pd.DataFrame):
+    placeholders = ", ".join("?" for _ in df.columns)
+    con.executemany(f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({placeholders})", _rows(df))
+
+
+def _frames_key(*frames: Optional[pd.DataFrame]) -> str:
+    h = hashlib.sha256()
+    for df in frames:
+        if df is None:
+            h.update(b"brak")
+            continue
+        h.update(repr(list(df.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def group_keys(
+    zestawienie: pd.DataFrame,
+    tabele_placowek: Dict[str, pd.DataFrame],
+    rejestr: Optional[pd.DataFrame],
+    prognozy: pd.DataFrame,
+    rok: int = ROK_SPRAWOZDAN,
+) -> Dict[str, str]:
+    """Skrót każdej grupy tabel: schemat (DDL i indeksy) + treść wejścia (wektorowo, hash_pandas_object)."""
+    content = {
+        "sprawozdania": [
+            _frames_key(zestawienie, *(tabele_placowek[name] for name in sorted(tabele_placowek))),
+            sorted(tabele_placowek),
+            rok,
+            TERYT_PLACOWEK,
+        ],
+        "wykaz": [_frames_key(rejestr[[c for c in KOLUMNY_WYKAZU.values() if c in rejestr]] if rejestr is not None else None)],
+        "gus_prognoza": [_frames_key(prognozy)],
+    }
+    schema = {group: [TABLES[t] for t in tables] + [INDEXES[t] for t in tables] for group, tables in GROUPS.items()}
+    return {group: hashlib.sha256(repr((content[group], schema[group])).encode("utf-8")).hexdigest() for group in GROUPS}
+
+
+def _fill(
+    con: sqlite3.Connection,
+    group: str,
+    zestawienie: pd.DataFrame,
+    tabele_placowek: Dict[str, pd.DataFrame],
+    rejestr: Optional[pd.DataFrame],
+    prognozy: pd.DataFrame,
+    rok: int,
+):
+    """Utwórz tabele grupy, wstaw dane i załóż indeksy (po wstawieniu danych)."""
+    for table in GROUPS[group]:
+        con.execute(TABLES[table])
+    if group == "sprawozdania":
+        _insert(con, "placowki", zestawienie[["placowka", "typ"]].assign(teryt=TERYT_PLACOWEK))
+        for placowka, df in tabele_placowek.items():
+            lines = df[["label", "prev_year", "current_year"]].assign(placowka=placowka, rok=rok, lp=range(1, len(df) + 1))
+            _insert(con, "rzis_wiersze", lines)
+        _insert(con, "rzis_podsumowanie", zestawienie[[*analyze_financials.TEXT_COLUMNS, *KOLUMNY_PODSUMOWANIA]].assign(rok=rok))
+    elif group == "wykaz":
+        if rejestr is not None:
+            wykaz = pd.DataFrame({col: rejestr.get(src) for col, src in KOLUMNY_WYKAZU.items()})
+            for col in KOLUMNY_WYKAZU_LICZBOWE:
+                wykaz[col] = pd.to_numeric(wykaz[col], errors="coerce")
+            _insert(con, "wykaz", wykaz)
+    else:
+        # wstawianie w kolejności klucza głównego (WITHOUT ROWID) – bez przebudowy stron B-drzewa
+        _insert(con, "gus_prognoza", prognozy.sort_values(["teryt", "wariant", "plec", "wiek", "rok"]))
+    for table in GROUPS[group]:
+        for index in INDEXES[table]:
+            con.execute(index)
+
+
+def stored_keys(path: Path = DB_PATH) -> Dict[str, str]:
+    """Skróty grup zapisane w bazie ({} – brak bazy albo baza sprzed tabeli wersje)."""
+    if not path.exists():
+        return {}
+    with closing(connect(path)) as con:
+        if not con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'wersje'").fetchone():
+            return {}
+        return dict(con.execute("SELECT grupa, klucz FROM wersje"))
+
+
+def write_store(
+    zestawienie: pd.DataFrame,
+    tabele_placowek: Dict[str, pd.DataFrame],
+    rejestr: Optional[pd.DataFrame],
+    prognozy: pd.DataFrame,
+    path: Path = DB_PATH,
+    rok: int = ROK_SPRAWOZDAN,
+) -> List[str]:
+    """
+    Zapisz bazę; zwraca przebudowane grupy tabel. Gdy baza istnieje, przebudowywane są tylko grupy, których
+    wejście (lub schemat) się zmieniło – w jednej transakcji, więc czytelnicy widzą stan sprzed albo po
+    (bez przeliczania ~1,3 mln wierszy prognoz przy zmianie jednego sprawozdania). Bez bazy: budowa od zera
+    (plik tymczasowy + atomowa podmiana – czytelnicy nie widzą niepełnej bazy).
+    """
+    data = (zestawienie, tabele_placowek, rejestr, prognozy, rok)
+    keys = group_keys(zestawienie, tabele_placowek, rejestr, prognozy, rok)
+    stored = stored_keys(path)
+    if stored:
+        changed = [group for group in GROUPS if stored.get(group) != keys[group]]
+        if changed:
+            con = sqlite3.connect(path, timeout=60)
+            try:
+                with con:
+                    for group in changed:
+                        for table in GROUPS[group]:
+                            con.execute(f"DROP TABLE IF EXISTS {table}")
+                        _fill(con, group, *data)
+                        con.execute("INSERT OR REPLACE INTO wersje (grupa, klucz) VALUES (?, ?)", (group, keys[group]))
+                    for group in changed:
+                        for table in GROUPS[group]:
+                            con.execute(f"ANALYZE {table}")
+            finally:
+                con.close()
+        print(f"Baza {path}: przebudowano {', '.join(changed) or 'nic'}; bez zmian: {', '.join(g for g in GROUPS if g not in changed) or 'nic'}")
+        return changed
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    con = sqlite3.connect(tmp)
+    try:
+        # plik tymczasowy budowany od zera: bez dziennika i fsync (błąd = brak podmiany, stara baza zostaje)
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        con.execute(VERSIONS)
+        for group in GROUPS:
+            _fill(con, group, *data)
+        con.executemany("INSERT INTO wersje (grupa, klucz) VALUES (?, ?)", keys.items())
+        con.execute("ANALYZE")
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, path)
+    print(f"Baza {path}: zbudowana od zera")
+    return list(GROUPS)
+
+
+def connect(path: Path = DB_PATH) -> sqlite3.Connection:
+    """Połączenie tylko do odczytu."""
+    if not path.exists():
+        raise SystemExit(f"Brak bazy {path} – uruchom: python pipeline.py build baza_analityczna")
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def query(sql: str, params: Optional[dict] = None, path: Path = DB_PATH) -> pd.DataFrame:
+    with closing(connect(path)) as con:
+        return pd.read_sql_query(sql, con, params=params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zapytania do lokalnej bazy analitycznej.")
+    parser.add_argument("--baza", type=Path, default=DB_PATH, help=f"plik bazy (domyślnie {DB_PATH})")
+    sub = parser.add_subparsers(dest="polecenie", required=True)
+    sub.add_parser("tabele", help="tabele i liczba wierszy")
+    sql = sub.add_parser("sql", help="dowolne zapytanie SELECT")
+    sql.add_argument("zapytanie")
+    kp = sub.add_parser("koszt-popyt", help="koszt na ucznia wg typu placówek vs prognoza dzieci 3–6")
+    kp.add_argument("--rok", type=int, default=2030, help="rok prognozy (domyślnie 2030)")
+    kp.add_argument("--wariant", default="bazowy", choices=gus_source.WARIANTY)
+    args = parser.parse_args()
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", 20)
+    if args.polecenie == "tabele":
+        with closing(connect(args.baza)) as con:
+            names = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+            for name in names:
+                print(f"{name:20s} {con.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]:>10,d}")
+    elif args.polecenie == "sql":
+        print(query(args.zapytanie, path=args.baza).to_string(index=False))
+    else:
+        params = {"rok": args.rok, "wariant": args.wariant, "rok_sprawozdan": ROK_SPRAWOZDAN}
+        print(query(QUERIES["koszt-popyt"], params, args.baza).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
 import os
 import re
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import unicodedata
 
 import pandas as pd
-import pdfplumber
-from docx import Document
+
+import instrumentation
+import peer_anomalies
+import text_layer
 
 # Katalog bazowy ze sprawozdaniami
 SPRAWOZDANIA_DIR = Path("pobrane/sprawozdania_2024")
@@ -41,6 +43,37 @@ TRANSLIT_MAP = str.maketrans(
 
 Number = Optional[float]
 
+# Kolejność kolumn zestawienia dla czytelności
+SUMMARY_COLUMNS = [
+    "placowka",
+    "typ",
+    "odczyt",  # tekst / ocr / nieczytelne (text_layer.reading_status)
+    "strony_nieczytelne",  # numery stron bez odczytu (np. zeskanowana strona z podpisami)
+    "przychody_netto",
+    "dotacje_podstawowe",
+    "przychody_budzetowe",
+    "koszty_operacyjne",
+    "amortyzacja",
+    "materialy_i_energia",
+    "uslugi_obce",
+    "podatki_i_oplaty",
+    "wynagrodzenia",
+    "ubezpieczenia_i_swiadczenia",
+    "pozostale_koszty_rodzajowe",
+    "pozostale_przychody_operacyjne",
+    "pozostale_koszty_operacyjne",
+    "zysk_strata_netto",
+    "liczba_uczniow",
+    "koszt_na_ucznia",
+]
+# Formaty liczbowe w raporcie Excel (jak w fix_financials_excel)
+TEXT_COLUMNS = ["placowka", "typ", "odczyt", "strony_nieczytelne"]
+MONEY_COLUMNS = [c for c in SUMMARY_COLUMNS if c not in (*TEXT_COLUMNS, "liczba_uczniow")]
+COUNT_COLUMNS = ["liczba_uczniow"]
+MONEY_FORMAT = "#,##0.00"
+COUNT_FORMAT = "0"
+PIVOT_COLUMNS = ["placowka", "koszty_operacyjne", "zysk_strata_netto", "liczba_uczniow", "koszt_na_ucznia"]
+
 
 def clean_label(text: str) -> str:
     """Zamień wielokrotne spacje i nowe linie na pojedyncze spacje."""
@@ -74,12 +107,71 @@ def extract_numbers(cells: List[str]) -> List[float]:
     return nums
 
 
-def parse_rzis_pdf(path: str) -> List[Dict[str, Optional[float]]]:
-    """Zwróć listę wierszy: label, prev_year, current_year."""
+def _row(label: str, numbers: List[float]) -> Dict[str, Optional[float]]:
+    prev_val = numbers[0] if numbers else None
+    curr_val = numbers[-1] if numbers else None
+    return {"label": label, "prev_year": prev_val, "current_year": curr_val}
+
+
+def _table_row(label: str, cells: List[Optional[str]]) -> Dict[str, Optional[float]]:
+    """
+    Wiersz tabeli. Dwie kolumny kwot (None = komórki scalone) z najwyżej jedną liczbą każda – pozycyjnie,
+    więc pusta kolumna roku poprzedniego zostaje pusta zamiast powielać kwotę roku bieżącego; inne układy – _row.
+    """
+    columns = [extract_numbers([c]) for c in cells if c is not None]
+    if len(columns) == 2 and all(len(nums) <= 1 for nums in columns):
+        prev_nums, curr_nums = columns
+        return {
+            "label": label,
+            "prev_year": prev_nums[0] if prev_nums else None,
+            "current_year": curr_nums[0] if curr_nums else None,
+        }
+    return _row(label, extract_numbers([c or "" for c in cells]))
+
+
+def rows_from_text(text: str) -> List[Dict[str, Optional[float]]]:
+    """Wiersze RZiS z tekstu strony (OCR): etykieta do pierwszej kwoty, kwoty w formacie '1 234,56' (jedna = rok bieżący)."""
     rows: List[Dict[str, Optional[float]]] = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            for table in page.extract_tables():
+    for line in text.splitlines():
+        amounts = list(re.finditer(r"-?\d{1,3}(?:[ \xa0]\d{3})*,\d{2}(?!\d)", line))
+        label = clean_label(line[: amounts[0].start()] if amounts else line)
+        if not label:
+            continue
+        numbers = [parse_number(m.group()) for m in amounts]
+        if len(numbers) > 1:
+            row = _row(label, numbers)
+        else:
+            # OCR gubi położenie kolumn: pojedyncza kwota to rok bieżący, rok poprzedni zostaje pusty
+            row = {"label": label, "prev_year": None, "current_year": numbers[0] if numbers else None}
+        rows.append({**row, "zrodlo": text_layer.OCR})
+    return rows
+
+
+def parse_rzis_pdf(path: str) -> List[Dict[str, Optional[float]]]:
+    """
+    Zwróć listę wierszy: label, prev_year, current_year. Strony bez warstwy tekstowej (skany) idą do OCR
+    (text_layer) – ich wiersze mają zrodlo="ocr"; strona, której nie udało się odczytać, daje wiersz
+    z zrodlo="nieczytelne" zamiast cichego pominięcia.
+    """
+    import pdfplumber  # ciężki import tylko przy faktycznym parsowaniu (moduł importują też lekkie narzędzia)
+
+    pages: Dict[int, List[Dict[str, Optional[float]]]] = {}
+    scans = []
+    with instrumentation.span("rzis.pdf", plik=path), pdfplumber.open(path) as pdf:
+        for nr, page in enumerate(pdf.pages, 1):
+            instrumentation.count("strony")
+            ocena = text_layer.triage(page, nr)
+            if not ocena.czytelna:
+                if ocena.do_ocr:
+                    scans.append((nr, page))
+                    instrumentation.count("strony.skany")
+                continue
+            with instrumentation.span("rzis.strona", nr=nr):
+                tables = page.extract_tables()
+            instrumentation.count("tabele", len(tables))
+            rows = pages[nr] = []
+            for table in tables:
+                instrumentation.count("wiersze", len(table))
                 for raw_row in table:
                     if not raw_row:
                         continue
@@ -88,12 +180,26 @@ def parse_rzis_pdf(path: str) -> List[Dict[str, Optional[float]]]:
                     # pomijamy nagłówki bez etykiety
                     if not label:
                         continue
-                    numeric_cells = [c or "" for c in raw_row[1:]]
-                    numbers = extract_numbers(numeric_cells)
-                    prev_val = numbers[0] if len(numbers) >= 2 else (numbers[0] if len(numbers) == 1 else None)
-                    curr_val = numbers[-1] if numbers else None
-                    rows.append({"label": label, "prev_year": prev_val, "current_year": curr_val})
-    return rows
+                    rows.append(_table_row(label, raw_row[1:]))
+
+        if scans:
+            backend = text_layer.load_backend()
+            texts = text_layer.ocr_pages(scans, backend) if backend else {}
+            for nr, _ in scans:
+                text = texts.get(nr)
+                pages[nr] = rows_from_text(text) if text else []
+                if not pages[nr]:
+                    powod = "OCR bez wyniku" if backend else "brak silnika OCR"
+                    pages[nr] = [
+                        {
+                            "label": f"[strona {nr}: brak warstwy tekstowej – nie odczytano ({powod})]",
+                            "prev_year": None,
+                            "current_year": None,
+                            "zrodlo": text_layer.NIECZYTELNE,
+                            "strona": nr,
+                        }
+                    ]
+    return [row for nr in sorted(pages) for row in pages[nr]]
 
 
 def find_value(rows: List[Dict[str, Optional[float]]], prefix: str) -> Tuple[Number, Number]:
@@ -104,46 +210,39 @@ def find_value(rows: List[Dict[str, Optional[float]]], prefix: str) -> Tuple[Num
     return None, None
 
 
-def build_summary(rows: List[Dict[str, Optional[float]]]) -> Dict[str, Number]:
-    """Przygotuj kluczowe agregaty kosztów/przychodów."""
-    summary: Dict[str, Number] = {}
-    summary["przychody_netto"] = find_value(rows, "A. Przychody netto z podstawowej działalności operacyjnej")[1]
-    summary["dotacje_podstawowe"] = find_value(rows, "A.V. Dotacje na finansowanie działalności podstawowej")[1]
-    summary["przychody_budzetowe"] = find_value(rows, "A.VI. Przychody z tytułu dochodów budżetowych")[1]
-    summary["koszty_operacyjne"] = find_value(rows, "B. Koszty działalności operacyjnej")[1]
-    summary["amortyzacja"] = find_value(rows, "B.I. Amortyzacja")[1]
-    summary["materialy_i_energia"] = find_value(rows, "B.II. Zużycie materiałów i energii")[1]
-    summary["uslugi_obce"] = find_value(rows, "B.III. Usługi obce")[1]
-    summary["podatki_i_oplaty"] = find_value(rows, "B.IV. Podatki i opłaty")[1]
-    summary["wynagrodzenia"] = find_value(rows, "B.V. Wynagrodzenia")[1]
-    summary["ubezpieczenia_i_swiadczenia"] = find_value(
-        rows, "B.VI. Ubezpieczenia społeczne i inne świadczenia dla pracowników"
-    )[1]
-    summary["pozostale_koszty_rodzajowe"] = find_value(rows, "B.VII. Pozostałe koszty rodzajowe")[1]
-    summary["pozostale_przychody_operacyjne"] = find_value(rows, "D. Pozostałe przychody operacyjne")[1]
-    summary["pozostale_koszty_operacyjne"] = find_value(rows, "E. Pozostałe koszty operacyjne")[1]
-    summary["zysk_strata_netto"] = find_value(rows, "L. Zysk (strata) netto")[1]
-    return summary
-
-
-def detect_issues(name: str, summary: Dict[str, Number], student_count: Number) -> List[str]:
-    """Zwróć listę uwag dla danej placówki."""
-    issues: List[str] = []
-    net = summary.get("zysk_strata_netto")
-    costs = summary.get("koszty_operacyjne")
-    revenues = summary.get("przychody_netto")
-
-    if net is not None and net < 0:
-        issues.append(f"Wynik netto ujemny ({net:,.2f} PLN).")
-    if costs is not None and revenues is not None and costs > revenues:
-        issues.append("Koszty operacyjne przewyższają przychody podstawowe (deficyt operacyjny).")
-    if summary.get("pozostale_koszty_operacyjne"):
-        issues.append("Występują pozostałe koszty operacyjne – warto sprawdzić ich naturę.")
-    if summary.get("pozostale_koszty_rodzajowe"):
-        issues.append("Odnotowano pozostałe koszty rodzajowe > 0.")
-    if student_count is None:
-        issues.append("Brak liczby uczniów/wychowanków – koszt na ucznia nie został policzony.")
-    return issues
+# Pozycje zestawienia -> początek etykiety wiersza RZiS
+SUMMARY_ITEMS = {
+    "przychody_netto": "A. Przychody netto z podstawowej działalności operacyjnej",
+    "dotacje_podstawowe": "A.V. Dotacje na finansowanie działalności podstawowej",
+    "przychody_budzetowe": "A.VI. Przychody z tytułu dochodów budżetowych",
+    "koszty_operacyjne": "B. Koszty działalności operacyjnej",
+    "amortyzacja": "B.I. Amortyzacja",
+    "materialy_i_energia": "B.II. Zużycie materiałów i energii",
+    "uslugi_obce": "B.III. Usługi obce",
+    "podatki_i_oplaty": "B.IV. Podatki i opłaty",
+    "wynagrodzenia": "B.V. Wynagrodzenia",
+    "ubezpieczenia_i_swiadczenia": "B.VI. Ubezpieczenia społeczne i inne świadczenia dla pracowników",
+    "pozostale_koszty_rodzajowe": "B.VII. Pozostałe koszty rodzajowe",
+    "pozostale_przychody_operacyjne": "D. Pozostałe przychody operacyjne",
+    "pozostale_koszty_operacyjne": "E. Pozostałe koszty operacyjne",
+    "zysk_strata_netto": "L. Zysk (strata) netto",
+}
+
+
+def summary_rows(rows: List[Dict[str, Optional[float]]]) -> List[Dict[str, Optional[float]]]:
+    """Wiersze, z których build_summary odczytuje pozycje zestawienia (z kwotą roku bieżącego)."""
+    found = []
+    for prefix in SUMMARY_ITEMS.values():
+        row = next((row for row in rows if row["label"].startswith(prefix)), None)
+        if row is not None and row["current_year"] is not None:
+            found.append(row)
+    return found
+
+
+def build_summary(rows: List[Dict[str, Optional[float]]], column: str = "current_year") -> Dict[str, Number]:
+    """Przygotuj kluczowe agregaty kosztów/przychodów (column: current_year albo prev_year)."""
+    idx = 0 if column == "prev_year" else 1
+    return {name: find_value(rows, prefix)[idx] for name, prefix in SUMMARY_ITEMS.items()}
 
 
 def normalize_name_from_dir(dir_path: str) -> str:
@@ -181,15 +280,23 @@ def classify_facility_type(name: str) -> str:
     return "Inne"
 
 
-def load_registry_index() -> Dict[str, Dict[str, float]]:
-    """Zbuduj słownik liczby uczniów z wykazu (miasto Racibórz)."""
+def load_registry_index(
+    registry: Optional[pd.DataFrame] = None,
+    path: Path = REGISTRY_FILE,
+    powiat: str = POWIAT_FILTER,
+    miasto: str = MIASTO_FILTER,
+) -> Dict[str, Dict[str, float]]:
+    """Zbuduj słownik liczby uczniów z wykazu (domyślnie miasto Racibórz); registry = już wczytany wykaz."""
     base_index: Dict[str, Dict[str, float]] = {"przedszkole": {}, "szkola_podstawowa": {}, "zsp": {}, "zlobek": None}
-    if not REGISTRY_FILE.exists():
-        return base_index
-
-    df = pd.read_excel(REGISTRY_FILE)
-    df = df[df["Powiat"].str.contains(POWIAT_FILTER, case=False, na=False)]
-    df = df[df["Gmina"].str.contains(MIASTO_FILTER, case=False, na=False)]
+    if registry is None:
+        if not path.exists():
+            return base_index
+        with instrumentation.span("wykaz.read_excel", plik=path):
+            registry = pd.read_excel(path)
+        instrumentation.count("wiersze_wykazu", len(registry))
+
+    df = registry[registry["Powiat"].str.contains(powiat, case=False, na=False)]
+    df = df[df["Gmina"].str.contains(miasto, case=False, na=False)].copy()
     df["norm_name"] = df["Nazwa placówki"].apply(normalize_ascii)
 
     for _, row in df.iterrows():
@@ -229,49 +336,76 @@ def match_student_count(facility_name: str, registry_index: Dict[str, Dict[str,
     return None
 
 
-def collect_rzis_files() -> List[str]:
-    """Zbierz ścieżki do RZiS 2024, z fallbackiem do pobrane/."""
+def statement_year(path: str) -> Optional[int]:
+    """Rok sprawozdania z nazwy pliku, np. 'Rachunek_zyskow_i_strat_2024r_P_16.pdf' -> 2024."""
+    match = re.search(r"(?<!\d)(20\d{2})(?!\d)", Path(path).name)
+    return int(match.group(1)) if match else None
+
+
+def default_base_dirs() -> List[Path]:
+    """Katalogi ze sprawozdaniami: SPRAWOZDANIA_DIR, a jako fallback całe pobrane/."""
     base_dirs: List[Path] = []
     if SPRAWOZDANIA_DIR.exists():
         base_dirs.append(SPRAWOZDANIA_DIR)
     pobrane_dir = Path("pobrane")
     if pobrane_dir.exists() and pobrane_dir not in base_dirs:
         base_dirs.append(pobrane_dir)
+    return base_dirs
+
+
+def collect_pdf_files(
+    match: Callable[[str], bool], rok: Optional[int] = 2024, base_dirs: Optional[List[Path]] = None
+) -> List[str]:
+    """Zbierz ścieżki PDF-ów sprawozdań za dany rok (None = wszystkie lata), których nazwa (lowercase) spełnia match."""
+    base_dirs = [Path(d) for d in base_dirs] if base_dirs else default_base_dirs()
 
     files: List[str] = []
     seen = set()
     for base in base_dirs:
         for pdf_path in base.rglob("*.pdf"):
             lower = pdf_path.name.lower()
-            if "rachunek" in lower and "2024" in lower:
+            year = statement_year(lower)
+            if match(lower) and year is not None and (rok is None or year == rok):
                 resolved = pdf_path.resolve()
                 if resolved in seen:
                     continue
                 seen.add(resolved)
                 files.append(str(pdf_path))
     files.sort()
+    return files
+
+
+def collect_rzis_files(rok: Optional[int] = 2024, base_dirs: Optional[List[Path]] = None) -> List[str]:
+    """Zbierz ścieżki do RZiS za dany rok (None = wszystkie lata), domyślnie z fallbackiem do pobrane/."""
+    files = collect_pdf_files(lambda name: "rachunek" in name, rok, base_dirs)
     if not files:
         raise SystemExit("Nie znaleziono plików Rachunek*.pdf w podkatalogach pobrane.")
     return files
 
 
-def main():
+def analyze(
+    rzis_files: List[str],
+    registry_index: Dict[str, Dict[str, float]],
+    parse: Callable[[str], List[Dict[str, Optional[float]]]] = parse_rzis_pdf,
+) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Sparsuj RZiS placówek: (zestawienie zbiorcze, tabele RZiS per placówka).
+    parse: parser jednego PDF-a (np. z cache per plik – wtedy nowy PDF to jeden odczyt i tania agregacja).
+    """
     report_rows = []
     per_facility_tables: Dict[str, pd.DataFrame] = {}
-    issues: Dict[str, List[str]] = {}
-
-    registry_index = load_registry_index()
-    rzis_files = collect_rzis_files()
 
     for pdf_path in rzis_files:
         facility_dir = os.path.dirname(pdf_path)
         facility_name = normalize_name_from_dir(facility_dir)
         facility_type = classify_facility_type(facility_name)
         student_count = match_student_count(facility_name, registry_index)
-        rows = parse_rzis_pdf(pdf_path)
+        rows = parse(pdf_path)
         summary = build_summary(rows)
         summary["liczba_uczniow"] = student_count
         summary["typ"] = facility_type
+        summary["odczyt"] = text_layer.reading_status(rows, summary_rows(rows))
+        summary["strony_nieczytelne"] = ", ".join(map(str, text_layer.unread_pages(rows))) or None
         costs = summary.get("koszty_operacyjne")
         if student_count is not None and student_count != 0 and costs is not None:
             summary["koszt_na_ucznia"] = costs / student_count
@@ -280,53 +414,295 @@ def main():
 
         report_rows.append({"placowka": facility_name, **summary})
         per_facility_tables[facility_name] = pd.DataFrame(rows)
-        issues[facility_name] = detect_issues(facility_name, summary, student_count)
 
     # DataFrame zbiorczy
     summary_df = pd.DataFrame(report_rows)
-    # Kolejność kolumn dla czytelności
-    ordered_cols = [
-        "placowka",
-        "typ",
-        "przychody_netto",
-        "dotacje_podstawowe",
-        "przychody_budzetowe",
-        "koszty_operacyjne",
-        "amortyzacja",
-        "materialy_i_energia",
-        "uslugi_obce",
-        "podatki_i_oplaty",
-        "wynagrodzenia",
-        "ubezpieczenia_i_swiadczenia",
-        "pozostale_koszty_rodzajowe",
-        "pozostale_przychody_operacyjne",
-        "pozostale_koszty_operacyjne",
-        "zysk_strata_netto",
-        "liczba_uczniow",
-        "koszt_na_ucznia",
-    ]
-    summary_df = summary_df[ordered_cols]
+    summary_df = summary_df[SUMMARY_COLUMNS]
     summary_df.sort_values("placowka", inplace=True)
+    return summary_df, per_facility_tables
 
-    # Eksport do Excela: arkusz zbiorczy + arkusze placówek
-    with pd.ExcelWriter(SUMMARY_XLSX, engine="openpyxl") as writer:
-        summary_df.to_excel(writer, sheet_name="Zbiorcze_porownanie", index=False)
-        for name, df in per_facility_tables.items():
-            # skracamy nazwę arkusza do 31 znaków
-            sheet_name = name[:31]
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
 
-    # Dokument Word z uwagami
+def _cell(value):
+    """Wartość do zapisu w komórce: None dla braków, typy NumPy -> typy Pythona."""
+    if value is None or pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def sheet_titles(names: List[str]) -> Dict[str, str]:
+    """Unikalne nazwy arkuszy (limit 31 znaków Excela); kolizje po skróceniu dostają sufiks ' (2)', ' (3)'..."""
+    titles: Dict[str, str] = {}
+    used = {"zbiorcze_porownanie", "pivot_placowka", "wykresy"}
+    for name in names:
+        title = name[:31]
+        k = 1
+        while title.lower() in used:
+            k += 1
+            suffix = f" ({k})"
+            title = name[: 31 - len(suffix)].rstrip() + suffix
+        used.add(title.lower())
+        titles[name] = title
+    return titles
+
+
+def _write_row(ws, row: int, values: List, formats: List):
+    for col, (value, fmt) in enumerate(zip(values, formats)):
+        value = _cell(value)
+        if value is None:
+            ws.write_blank(row, col, None, fmt)
+        else:
+            ws.write(row, col, value, fmt)
+
+
+def iferror_ratio(num, den):
+    """Wynik =IFERROR(num/den,"") tak, jak policzy go Excel (pusta komórka = 0, dzielenie przez 0 -> "")."""
+    num, den = _cell(num) or 0, _cell(den) or 0
+    return num / den if den else ""
+
+
+def _write_table(
+    ws,
+    df: pd.DataFrame,
+    header_fmt,
+    formats: Optional[List] = None,
+    formula_cols: Optional[Dict[str, Tuple[Callable[[int], str], Callable[[dict], object]]]] = None,
+):
+    """
+    Nagłówek + wiersze po kolei (tryb constant_memory).
+    formula_cols: kolumna -> (formuła dla numeru wiersza Excela, wynik formuły dla rekordu); wynik zapisywany
+    jako wartość buforowana, więc pandas/openpyxl (data_only=True) czytają liczby bez przeliczania w Excelu.
+    """
+    columns = list(df.columns)
+    formats = formats or [None] * len(columns)
+    formula_cols = formula_cols or {}
+    for col, name in enumerate(columns):
+        ws.write_string(0, col, str(name), header_fmt)
+    for row, record in enumerate(df.itertuples(index=False, name=None), start=1):
+        _write_row(ws, row, list(record), formats)
+        for name, (formula, result) in formula_cols.items():
+            col = columns.index(name)
+            ws.write_formula(row, col, formula(row + 1), formats[col], result(dict(zip(columns, record))))
+    return len(df)
+
+
+def write_summary_xlsx(
+    summary_df: pd.DataFrame,
+    per_facility_tables: Dict[str, pd.DataFrame],
+    path: Path = SUMMARY_XLSX,
+):
+    """
+    Eksport do Excela jednym przebiegiem (xlsxwriter, constant_memory): arkusz zbiorczy z formułami koszt_na_ucznia,
+    formatami i autofiltrem, arkusze placówek, Pivot_placowka i Wykresy – bez ponownego wczytywania pliku.
+    """
+    import xlsxwriter
+    from xlsxwriter.utility import xl_col_to_name
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb = xlsxwriter.Workbook(str(path), {"constant_memory": True, "nan_inf_to_errors": True})
+    header_fmt = wb.add_format({"bold": True, "border": 1, "align": "center", "valign": "top", "text_wrap": True})
+    sheet_header_fmt = wb.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    money_fmt = wb.add_format({"num_format": MONEY_FORMAT})
+    count_fmt = wb.add_format({"num_format": COUNT_FORMAT})
+
+    def column_formats(columns: List[str]) -> List:
+        return [money_fmt if c in MONEY_COLUMNS else count_fmt if c in COUNT_COLUMNS else None for c in columns]
+
+    def kpu_formula(columns: List[str], cost: str, count: str) -> Tuple[Callable[[int], str], Callable[[dict], object]]:
+        cost_col, count_col = xl_col_to_name(columns.index(cost)), xl_col_to_name(columns.index(count))
+        return (
+            lambda r: f'=IFERROR({cost_col}{r}/{count_col}{r},"")',
+            lambda rec: iferror_ratio(rec[cost], rec[count]),
+        )
+
+    # Zbiorcze_porownanie
+    columns = list(summary_df.columns)
+    ws = wb.add_worksheet("Zbiorcze_porownanie")
+    n = _write_table(
+        ws,
+        summary_df,
+        header_fmt,
+        column_formats(columns),
+        {"koszt_na_ucznia": kpu_formula(columns, "koszty_operacyjne", "liczba_uczniow")},
+    )
+    ws.autofilter(0, 0, n, len(columns) - 1)
+
+    # arkusze placówek (nazwy skrócone do 31 znaków, bez kolizji)
+    titles = sheet_titles(list(per_facility_tables))
+    for name, df in per_facility_tables.items():
+        _write_table(wb.add_worksheet(titles[name]), df, sheet_header_fmt)
+
+    # Pivot_placowka: malejąco wg kosztów operacyjnych, braki na końcu
+    pivot = summary_df[PIVOT_COLUMNS].copy()
+    pivot["_brak"] = pivot["koszty_operacyjne"].isna()
+    pivot = pivot.sort_values(["_brak", "koszty_operacyjne"], ascending=[True, False], kind="stable").drop(columns="_brak")
+    ws = wb.add_worksheet("Pivot_placowka")
+    n = _write_table(
+        ws,
+        pivot,
+        header_fmt,
+        column_formats(PIVOT_COLUMNS),
+        {"koszt_na_ucznia": kpu_formula(PIVOT_COLUMNS, "koszty_operacyjne", "liczba_uczniow")},
+    )
+    ws.autofilter(0, 0, n, len(PIVOT_COLUMNS) - 1)
+
+    # Wykresy słupkowe na podstawie pivota
+    ws_chart = wb.add_worksheet("Wykresy")
+    for column, title, anchor, y_title in [
+        ("koszty_operacyjne", "Koszty operacyjne per placówka", "B2", "PLN"),
+        ("zysk_strata_netto", "Wynik netto per placówka", "B22", "PLN"),
+        ("koszt_na_ucznia", "Koszt na ucznia per placówka", "B42", "PLN/uczeń"),
+    ]:
+        col = PIVOT_COLUMNS.index(column)
+        chart = wb.add_chart({"type": "column"})
+        chart.add_series(
+            {
+                "name": ["Pivot_placowka", 0, col],
+                "categories": ["Pivot_placowka", 1, 0, n, 0],
+                "values": ["Pivot_placowka", 1, col, n, col],
+                "data_labels": {"value": True},
+            }
+        )
+        chart.set_title({"name": title})
+        chart.set_x_axis({"name": "Placówka"})
+        chart.set_y_axis({"name": y_title})
+        ws_chart.insert_chart(anchor, chart)
+    wb.close()
+
+
+def write_issues_docx(
+    findings: pd.DataFrame,
+    summary_df: pd.DataFrame,
+    path: Path = ISSUES_DOCX,
+    niezgodnosci: Optional[pd.DataFrame] = None,
+    rok: Optional[int] = 2024,
+):
+    """
+    Dokument Word z rankingiem odchyleń od grup porównawczych (peer_anomalies), brakami danych
+    i – gdy podano – niezgodnościami między sprawozdaniami (reconciliation.violations).
+    rok trafia do tytułu (None = sprawozdania z różnych lat, tytuł bez roku).
+    """
+    from docx import Document
+
     doc = Document()
-    doc.add_heading("Uwagi i potencjalne nieprawidłowości – sprawozdania 2024", level=1)
-    for name in sorted(issues.keys()):
-        doc.add_heading(name, level=2)
-        for item in issues[name]:
-            doc.add_paragraph(item, style="List Bullet")
-    doc.save(ISSUES_DOCX)
-
-    print(f"Zapisano raport Excel: {SUMMARY_XLSX}")
-    print(f"Zapisano dokument Word: {ISSUES_DOCX}")
+    doc.add_heading(f"Uwagi i potencjalne nieprawidłowości – sprawozdania{f' {rok}' if rok else ''}", level=1)
+    doc.add_paragraph(
+        "Wskaźniki każdej placówki porównano z medianą jej grupy (typ placówki; grupy mniejsze niż "
+        f"{peer_anomalies.MIN_GRUPA} – ze wszystkimi placówkami). Wykazano wartości poza przedziałem "
+        f"Q1 − {peer_anomalies.MNOZNIK_IQR}·IQR … Q3 + {peer_anomalies.MNOZNIK_IQR}·IQR o odpornym "
+        f"z-score |z| ≥ {peer_anomalies.PROG_Z}, od największego odchylenia."
+    )
+
+    doc.add_heading("Ranking odchyleń od grupy porównawczej", level=2)
+    if findings.empty:
+        doc.add_paragraph("Brak istotnych odchyleń.")
+    else:
+        table = doc.add_table(rows=1, cols=7)
+        table.style = "Table Grid"
+        for cell, text in zip(table.rows[0].cells, ["Lp.", "Placówka", "Wskaźnik", "Wartość", "Mediana grupy", "Grupa (n)", "z"]):
+            cell.text = text
+        for lp, row in enumerate(findings.itertuples(index=False), start=1):
+            cells = table.add_row().cells
+            cells[0].text = str(lp)
+            cells[1].text = row.placowka
+            cells[2].text = row.opis
+            cells[3].text = peer_anomalies.format_value(row.wartosc, row.jednostka)
+            cells[4].text = peer_anomalies.format_value(row.mediana, row.jednostka)
+            cells[5].text = f"{row.grupa} ({row.n:.0f})"
+            cells[6].text = f"{row.z:+.1f}".replace(".", ",")
+
+    if niezgodnosci is not None:
+        doc.add_heading("Niezgodności między sprawozdaniami", level=2)
+        if niezgodnosci.empty:
+            doc.add_paragraph("RZiS, bilans i zestawienie zmian w funduszu są wzajemnie zgodne we wszystkich placówkach.")
+        else:
+            table = doc.add_table(rows=1, cols=6)
+            table.style = "Table Grid"
+            for cell, text in zip(table.rows[0].cells, ["Lp.", "Placówka", "Rok", "Uzgodnienie", "Strony (L / P)", "Różnica"]):
+                cell.text = text
+            for lp, row in enumerate(niezgodnosci.itertuples(index=False), start=1):
+                cells = table.add_row().cells
+                cells[0].text = str(lp)
+                cells[1].text = row.placowka
+                cells[2].text = str(row.rok)
+                cells[3].text = row.opis
+                cells[4].text = f"{peer_anomalies.format_value(row.lewa, 'zł')} / {peer_anomalies.format_value(row.prawa, 'zł')}"
+                cells[5].text = peer_anomalies.format_value(row.roznica, "zł")
+
+    missing = summary_df.loc[summary_df["liczba_uczniow"].isna(), "placowka"].tolist()
+    unread = summary_df.loc[summary_df["odczyt"] == text_layer.NIECZYTELNE, "placowka"].tolist()
+    # sprawozdanie z warstwą tekstową, z którego nie odczytano żadnej pozycji zestawienia (np. inny układ tabel)
+    empty = summary_df.loc[
+        (summary_df["odczyt"] != text_layer.NIECZYTELNE) & summary_df[list(SUMMARY_ITEMS)].isna().all(axis=1), "placowka"
+    ].tolist()
+    scanned = summary_df.loc[summary_df["odczyt"] == text_layer.OCR, "placowka"].tolist()
+    # odczytane sprawozdania z pojedynczymi stronami bez odczytu (np. skan strony z podpisami)
+    partial = summary_df.loc[
+        (summary_df["odczyt"] != text_layer.NIECZYTELNE) & summary_df["strony_nieczytelne"].notna(),
+        ["placowka", "strony_nieczytelne"],
+    ]
+    if missing or unread or empty or scanned or not partial.empty:
+        doc.add_heading("Braki danych", level=2)
+    if unread:
+        doc.add_paragraph(
+            f"Sprawozdania nieodczytane ({len(unread)} placówek) – skany bez warstwy tekstowej, których nie "
+            "rozpoznano (brak silnika OCR albo OCR bez wyniku); pozycje zestawienia są puste: "
+            + ", ".join(sorted(unread))
+            + "."
+        )
+    if empty:
+        doc.add_paragraph(
+            f"Nie odczytano żadnej pozycji RZiS ({len(empty)} placówek) – sprawdzić układ sprawozdania: "
+            + ", ".join(sorted(empty))
+            + "."
+        )
+    if not partial.empty:
+        doc.add_paragraph(
+            f"Strony bez odczytu w odczytanych sprawozdaniach ({len(partial)} placówek) – sprawdzić, czy nie "
+            "zawierają pozycji RZiS: "
+            + ", ".join(f"{row.placowka} (str. {row.strony_nieczytelne})" for row in partial.sort_values("placowka").itertuples())
+            + "."
+        )
+    if scanned:
+        doc.add_paragraph(
+            f"Wartości odczytane przez OCR ze skanów ({len(scanned)} placówek) – do weryfikacji z dokumentem: "
+            + ", ".join(sorted(scanned))
+            + "."
+        )
+    if missing:
+        doc.add_paragraph(
+            f"Brak liczby uczniów/wychowanków ({len(missing)} placówek) – koszt na ucznia nie został policzony: "
+            + ", ".join(sorted(missing))
+            + "."
+        )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc.save(path)
+
+
+def build_reports(
+    base_dirs: Optional[List[Path]] = None,
+    registry_file: Path = REGISTRY_FILE,
+    summary_path: Path = SUMMARY_XLSX,
+    issues_path: Path = ISSUES_DOCX,
+    rok: int = 2024,
+    powiat: str = POWIAT_FILTER,
+    miasto: str = MIASTO_FILTER,
+):
+    registry_index = load_registry_index(path=registry_file, powiat=powiat, miasto=miasto)
+    rzis_files = collect_rzis_files(rok, base_dirs)
+    with instrumentation.span("analyze", pliki=len(rzis_files)):
+        summary_df, per_facility_tables = analyze(rzis_files, registry_index)
+
+    with instrumentation.span("zapis.xlsx", plik=summary_path):
+        write_summary_xlsx(summary_df, per_facility_tables, summary_path)
+    with instrumentation.span("zapis.docx", plik=issues_path):
+        write_issues_docx(peer_anomalies.detect_anomalies(summary_df), summary_df, issues_path, rok=rok)
+
+    print(f"Zapisano raport Excel: {summary_path}")
+    print(f"Zapisano dokument Word: {issues_path}")
+
+
+def main():
+    build_reports()
 
 
 if __name__ == "__main__":
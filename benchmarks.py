@@ -0,0 +1,319 @@
+"""
+Benchmarki gorących ścieżek (czas i szczytowa pamięć RSS) – na korpusie syntetycznym (synthetic_corpus,
+bez sieci i bez pobrane/) oraz na prawdziwym pobrane/, gdy jest dostępne:
+- parse_rzis_pdf (wszystkie PDF-y RZiS), analyze (parsowanie + zestawienie),
+- load_registry_index, process_registry.registry_tables, process_zsp_report.build_report (wykaz placówek),
+- extract_gus_children.load_powiat (Tabl. 1 prognozy GUS),
+- zapisy Excela: write_summary_xlsx, write_demografia.
+Każdy benchmark działa w osobnym procesie (spawn): przygotowanie danych poza pomiarem, potem N powtórzeń;
+szczyt RSS to VmHWM z /proc/self/status po wyzerowaniu licznika (clear_refs), a bez /proc – ru_maxrss.
+Wyniki trafiają do cache/benchmarki/<czas>-<commit>.json; `porownaj A.json B.json` zestawia dwa przebiegi.
+
+  python benchmarks.py [--korpus syntetyczny|pobrane|oba] [--placowki 20] [--strony 1] [--wiersze 20000]
+  python benchmarks.py porownaj cache/benchmarki/<stary>.json cache/benchmarki/<nowy>.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import instrumentation
+
+OUT_DIR = Path("cache/benchmarki")
+KORPUS_DIR = OUT_DIR / "korpus"
+PROG_REGRESJI = 1.10  # porownaj: oznacz wzrost czasu/pamięci o ponad 10%
+
+
+@dataclass(frozen=True)
+class Korpus:
+    """Dane wejściowe benchmarków (ścieżki – przekazywane do procesu pomiarowego)."""
+
+    nazwa: str
+    rzis: List[str] = field(default_factory=list)
+    wykaz: Optional[Path] = None
+    gus_base: Optional[Path] = None
+    gus_teryt: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    nazwa: str
+    wymaga: str  # "rzis" / "wykaz" / "gus_base" – pole korpusu, bez którego benchmark jest pomijany
+    przygotuj: Callable[[Korpus], Any]
+    uruchom: Callable[[Any], Any]
+
+
+def _pliki_rzis(korpus: Korpus):
+    return korpus.rzis
+
+
+def _parse_all(files):
+    import analyze_financials
+
+    return [analyze_financials.parse_rzis_pdf(path) for path in files]
+
+
+def _analyze(files):
+    import analyze_financials
+
+    return analyze_financials.analyze(files, {"przedszkole": {}, "szkola_podstawowa": {}, "zsp": {}, "zlobek": None})
+
+
+def _sciezka_wykazu(korpus: Korpus):
+    return korpus.wykaz
+
+
+def _registry_index(path):
+    import analyze_financials
+
+    return analyze_financials.load_registry_index(path=path)
+
+
+def _wczytany_wykaz(korpus: Korpus):
+    import process_registry
+
+    return process_registry.load_registry(korpus.wykaz)
+
+
+def _registry_tables(df):
+    import process_registry
+
+    return process_registry.registry_tables(df)
+
+
+def _zsp_report(df):
+    import process_zsp_report
+
+    return process_zsp_report.build_report(df)
+
+
+def _jednostka_gus(korpus: Korpus):
+    return korpus.gus_teryt, korpus.gus_base
+
+
+def _load_powiat(args):
+    import extract_gus_children
+
+    teryt, base = args
+    return extract_gus_children.load_powiat(teryt, f"Powiat {teryt}", base=base)
+
+
+def _dane_zestawienia(korpus: Korpus):
+    return _analyze(korpus.rzis), Path(tempfile.mkdtemp()) / "raport.xlsx"
+
+
+def _write_summary(args):
+    import analyze_financials
+
+    (summary_df, tables), path = args
+    analyze_financials.write_summary_xlsx(summary_df, tables, path)
+
+
+def _dane_demografii(korpus: Korpus):
+    powiat = _load_powiat(_jednostka_gus(korpus))
+    # zapis nie zależy od typu jednostki – dane gminy zastępuje kopia powiatu
+    return powiat, powiat.assign(jednostka="Gmina", typ="gmina"), Path(tempfile.mkdtemp()) / "demografia.xlsx"
+
+
+def _write_demografia(args):
+    import extract_gus_children
+
+    extract_gus_children.write_demografia(*args)
+
+
+BENCHMARKI = [
+    Benchmark("parse_rzis_pdf", "rzis", _pliki_rzis, _parse_all),
+    Benchmark("analyze", "rzis", _pliki_rzis, _analyze),
+    Benchmark("load_registry_index", "wykaz", _sciezka_wykazu, _registry_index),
+    Benchmark("registry_tables", "wykaz", _wczytany_wykaz, _registry_tables),
+    Benchmark("zsp_build_report", "wykaz", _wczytany_wykaz, _zsp_report),
+    Benchmark("load_powiat", "gus_base", _jednostka_gus, _load_powiat),
+    Benchmark("write_summary_xlsx", "rzis", _dane_zestawienia, _write_summary),
+    Benchmark("write_demografia", "gus_base", _dane_demografii, _write_demografia),
+]
+
+
+def _reset_peak() -> bool:
+    """Wyzeruj VmHWM (Linux ≥ 4.0); False – szczyt liczony od startu procesu (ru_maxrss)."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _measure(nazwa: str, korpus: Korpus, powtorzenia: int) -> Dict[str, Any]:
+    """W procesie pomiarowym: importy i przygotowanie danych poza pomiarem, potem N pomiarów czasu i szczyt RSS."""
+    import openpyxl  # noqa: F401 – biblioteki ładowane leniwie w mierzonych funkcjach
+    import pdfplumber  # noqa: F401
+    import xlsxwriter  # noqa: F401
+
+    bench = next(b for b in BENCHMARKI if b.nazwa == nazwa)
+    dane = bench.przygotuj(korpus)
+    rss_start = instrumentation.rss_kb()
+    reset = _reset_peak()
+    czasy = []
+    for _ in range(powtorzenia):
+        start = time.perf_counter()
+        bench.uruchom(dane)
+        czasy.append(time.perf_counter() - start)
+    peak = instrumentation.peak_rss_kb()
+    return {
+        "benchmark": nazwa,
+        "korpus": korpus.nazwa,
+        "powtorzenia": powtorzenia,
+        "czas_min_s": round(min(czasy), 4),
+        "czas_mediana_s": round(statistics.median(czasy), 4),
+        "rss_start_mb": round(rss_start / 1024, 1) if rss_start is not None else None,
+        "rss_szczyt_mb": round(peak / 1024, 1),
+        "szczyt_od_startu_procesu": not reset,
+    }
+
+
+def build_synthetic_corpus(placowki: int, strony: int, wiersze: int) -> Korpus:
+    """Korpus syntetyczny w cache/benchmarki/korpus (generowany raz dla danych parametrów – deterministyczny)."""
+    import synthetic_corpus
+
+    base = KORPUS_DIR
+    rzis = synthetic_corpus.rzis_corpus(base / "pobrane", placowki, strony)
+    wykaz = base / f"wykaz_{wiersze}.xlsx"
+    if not wykaz.exists():
+        synthetic_corpus.write_registry_xlsx(wykaz, wiersze)
+    teryt = synthetic_corpus.gus_corpus(base / "GUS", 1)[0]
+    return Korpus("syntetyczny", rzis, wykaz, base / "GUS", teryt)
+
+
+def real_corpus() -> Optional[Korpus]:
+    """Prawdziwe pobrane/ (to, co jest na dysku); None, gdy nie ma żadnych danych."""
+    import analyze_financials
+    import extract_gus_children
+    import gus_source
+
+    try:
+        rzis = analyze_financials.collect_rzis_files()
+    except SystemExit:
+        rzis = []
+    wykaz = analyze_financials.REGISTRY_FILE if analyze_financials.REGISTRY_FILE.exists() else None
+    try:
+        gus_source.find(extract_gus_children.POWIAT_TERYT)
+        gus_base, teryt = gus_source.BASE_DIR, extract_gus_children.POWIAT_TERYT
+    except FileNotFoundError:
+        gus_base, teryt = None, None
+    if not rzis and wykaz is None and gus_base is None:
+        return None
+    return Korpus("pobrane", rzis, wykaz, gus_base, teryt)
+
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "nieznany"
+    return sha.strip() + ("-zmiany" if dirty.stdout.strip() else "")
+
+
+def run(korpusy: List[Korpus], powtorzenia: int = 3, wybrane: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    wyniki = []
+    for korpus in korpusy:
+        for bench in BENCHMARKI:
+            if wybrane and bench.nazwa not in wybrane:
+                continue
+            if not getattr(korpus, bench.wymaga):
+                print(f"  {bench.nazwa} [{korpus.nazwa}]: pominięty (brak danych: {bench.wymaga})")
+                continue
+            # świeży proces na benchmark – importy i pamięć innych benchmarków nie zawyżają szczytu RSS
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                wynik = pool.submit(_measure, bench.nazwa, korpus, powtorzenia).result()
+            print(
+                f"  {bench.nazwa} [{korpus.nazwa}]: {wynik['czas_mediana_s']:.3f} s (min {wynik['czas_min_s']:.3f} s), "
+                f"szczyt RSS {wynik['rss_szczyt_mb']:.0f} MB"
+            )
+            wyniki.append(wynik)
+    return wyniki
+
+
+def save(wyniki: List[Dict[str, Any]], parametry: Dict[str, Any], korpusy: List[Korpus], out_dir: Path = OUT_DIR) -> Path:
+    commit = git_commit()
+    path = out_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "commit": commit,
+        "czas": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platforma": platform.platform(),
+        "parametry": parametry,
+        "korpusy": [{**asdict(k), "rzis": len(k.rzis)} for k in korpusy],
+        "wyniki": wyniki,
+    }
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    return path
+
+
+def compare(stary: Path, nowy: Path, prog: float = PROG_REGRESJI) -> List[Dict[str, Any]]:
+    """Zestawienie dwóch plików wyników: iloraz nowy/stary dla mediany czasu i szczytu RSS."""
+    a, b = (json.loads(Path(p).read_text(encoding="utf-8")) for p in (stary, nowy))
+    poprzednie = {(w["benchmark"], w["korpus"]): w for w in a["wyniki"]}
+    print(f"{a['commit']} -> {b['commit']}")
+    wiersze = []
+    for w in b["wyniki"]:
+        old = poprzednie.get((w["benchmark"], w["korpus"]))
+        if old is None:
+            continue
+        czas = w["czas_mediana_s"] / old["czas_mediana_s"] if old["czas_mediana_s"] else float("nan")
+        rss = w["rss_szczyt_mb"] / old["rss_szczyt_mb"] if old["rss_szczyt_mb"] else float("nan")
+        uwaga = "REGRESJA" if czas > prog or rss > prog else ""
+        print(f"  {w['benchmark']:<22} [{w['korpus']}]  czas ×{czas:.2f}  RSS ×{rss:.2f}  {uwaga}")
+        wiersze.append({"benchmark": w["benchmark"], "korpus": w["korpus"], "czas": czas, "rss": rss, "regresja": bool(uwaga)})
+    return wiersze
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["porownaj"]:
+        parser = argparse.ArgumentParser(prog="benchmarks.py porownaj", description="Porównanie dwóch przebiegów.")
+        parser.add_argument("stary", type=Path)
+        parser.add_argument("nowy", type=Path)
+        parser.add_argument("--prog", type=float, default=PROG_REGRESJI)
+        args = parser.parse_args(argv[1:])
+        compare(args.stary, args.nowy, args.prog)
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmarki gorących ścieżek (czas, szczyt RSS) -> JSON.")
+    parser.add_argument("--korpus", choices=("syntetyczny", "pobrane", "oba"), default="oba")
+    parser.add_argument("--placowki", type=int, default=20, help="liczba syntetycznych PDF-ów RZiS")
+    parser.add_argument("--strony", type=int, default=1, help="strony w syntetycznym PDF-ie")
+    parser.add_argument("--wiersze", type=int, default=20000, help="wiersze syntetycznego wykazu")
+    parser.add_argument("--powtorzenia", type=int, default=3)
+    parser.add_argument("--tylko", action="append", choices=[b.nazwa for b in BENCHMARKI], help="wybrane benchmarki")
+    parser.add_argument("--katalog", type=Path, default=OUT_DIR, help="katalog plików wyników")
+    args = parser.parse_args(argv)
+
+    korpusy = []
+    if args.korpus in ("syntetyczny", "oba"):
+        korpusy.append(build_synthetic_corpus(args.placowki, args.strony, args.wiersze))
+    if args.korpus in ("pobrane", "oba"):
+        real = real_corpus()
+        if real is None:
+            print("Brak danych w pobrane/ – pomijam korpus rzeczywisty")
+        else:
+            korpusy.append(real)
+
+    wyniki = run(korpusy, args.powtorzenia, args.tylko)
+    parametry = {k: v for k, v in vars(args).items() if k != "katalog"}
+    path = save(wyniki, parametry, korpusy, args.katalog)
+    print(f"Zapisano {path}")
+
+
+if __name__ == "__main__":
+    main()
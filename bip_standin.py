@@ -0,0 +1,241 @@
+"""
+Lokalna atrapa BIP (bez sieci) do sprawdzania pobierania z wstrzykiwanymi awariami:
+- strona z listą "Sprawozdanie finansowe za rok 2024 <placówka>" (/bipkod/40495541), strony placówek
+  (/bipkod/<id>) i załączniki PDF (/res/serwisy/pliki/<id>/<plik>.pdf; syntetyczne RZiS z synthetic_corpus),
+- awarie losowane deterministycznie (ziarno) per zapytanie: 503, 429 z Retry-After, zerwanie połączenia bez
+  odpowiedzi, zawieszenie w połowie treści (dłużej niż limit odczytu klienta); `pierwsze`: każdy adres zawodzi
+  przy pierwszych N próbach (powtarzalny scenariusz ponowień),
+- liczniki zapytań per ścieżka (server.hits) do sprawdzenia, że pobrane pliki nie są pobierane ponownie,
+- check_resume(): przebieg z awariami, potem wznowienie bez awarii – z asercjami (sprawozdania.py sprawdz pobieranie).
+
+  python bip_standin.py --port 8765 --placowki 5 --awarie 0.3
+  python sprawozdania.py download --url http://127.0.0.1:8765/bipkod/40495541 --katalog /tmp/bip
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Tuple
+
+import synthetic_corpus
+
+LISTA = "/bipkod/40495541"
+PREFIKS = "Sprawozdanie finansowe za rok 2024"
+
+
+@dataclass(frozen=True)
+class Awarie:
+    p_503: float = 0.0
+    p_429: float = 0.0
+    p_zerwanie: float = 0.0
+    p_zawieszenie: float = 0.0
+    zawieszenie_s: float = 5.0
+    pierwsze: int = 0  # każda ścieżka odpowiada błędem 503 przy pierwszych N zapytaniach
+    seed: int = 0
+
+    @classmethod
+    def rowno(cls, p: float, **kwargs) -> "Awarie":
+        """Łączne prawdopodobieństwo awarii p rozłożone po równo na cztery rodzaje."""
+        return cls(p_503=p / 4, p_429=p / 4, p_zerwanie=p / 4, p_zawieszenie=p / 4, **kwargs)
+
+
+def build_site(placowki: int = 5, pliki: int = 2) -> Dict[str, Tuple[str, bytes]]:
+    """Ścieżka -> (typ treści, treść): lista, strony placówek i PDF-y (pierwszy plik placówki to RZiS)."""
+    site: Dict[str, Tuple[str, bytes]] = {}
+    links = []
+    for i, name in enumerate(synthetic_corpus.facility_names(placowki)):
+        page = f"/bipkod/{41000000 + i}"
+        links.append(f'<li><a href="{page}">{PREFIKS} {name}</a></li>')
+        attachments = []
+        for k in range(pliki):
+            title = "RACHUNEK ZYSKOW I STRAT 2024.pdf" if k == 0 else f"INFORMACJA DODATKOWA 2024 cz {k}.pdf"
+            href = f"/res/serwisy/pliki/{41000000 + i}/{k}.pdf"
+            attachments.append(f'<li><a href="{href}">{title}</a></li>')
+            site[href] = ("application/pdf", synthetic_corpus.rzis_pdf_bytes(name, seed=i * 10 + k))
+        site[page] = ("text/html; charset=utf-8", f"<html><body><h1>{name}</h1><ul>{''.join(attachments)}</ul></body></html>".encode())
+    site[LISTA] = ("text/html; charset=utf-8", f"<html><body><ul>{''.join(links)}</ul></body></html>".encode())
+    return site
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, site: Dict[str, Tuple[str, bytes]], awarie: Awarie):
+        super().__init__(address, Handler)
+        self.site = site
+        self.awarie = awarie
+        self.rng = random.Random(awarie.seed)
+        self.hits: Counter = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{LISTA}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    server: StandInServer
+
+    def log_message(self, format, *args):  # bez logu każdego zapytania na stderr
+        pass
+
+    def do_GET(self):
+        srv = self.server
+        with srv.lock:
+            srv.hits[self.path] += 1
+            n = srv.hits[self.path]
+            los = srv.rng.random()
+        a = srv.awarie
+        if self.path not in srv.site:
+            self.send_error(404)
+            return
+        if n <= a.pierwsze:
+            self.send_error(503)
+            return
+        kind, body = srv.site[self.path]
+        if los < a.p_zerwanie:
+            self.close_connection = True
+            self.connection.close()  # bez odpowiedzi – klient widzi zerwane połączenie
+            return
+        los -= a.p_zerwanie
+        if los < a.p_503:
+            self.send_error(503)
+            return
+        los -= a.p_503
+        if los < a.p_429:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        los -= a.p_429
+        self.send_response(200)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if los < a.p_zawieszenie:
+            # połowa treści, potem cisza dłuższa niż limit odczytu klienta
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            time.sleep(a.zawieszenie_s)
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def serve(port: int = 0, placowki: int = 5, awarie: Awarie = Awarie()) -> StandInServer:
+    """Uruchom atrapę w wątku tła (port 0 = wolny port); zatrzymanie: server.shutdown()."""
+    server = StandInServer(("127.0.0.1", port), build_site(placowki), awarie)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _expect(condition: bool, message: str):
+    if not condition:
+        raise SystemExit(f"BŁĄD: {message}")
+    print(f"  ok: {message}")
+
+
+def check_resume(placowki: int = 4, awarie: float = 0.4, seed: int = 3):
+    """
+    Wznowienie pobierania po awariach: przebiegi przez atrapę z awariami (krótkie limity, mało prób) kończą się
+    błędami części adresów; przebieg bez awarii na tej samej kolejce musi pobrać resztę, nie pobierając ponownie
+    plików już zapisanych. Pliki porównywane bajt w bajt z atrapą.
+    """
+    import crawl_scheduler
+    import download_reports
+
+    fetcher = crawl_scheduler.Fetcher(
+        policy=crawl_scheduler.RetryPolicy(proby=2, baza_s=0.01, max_s=0.1),
+        na_sekunde=100.0,
+        zapas=100.0,
+        read_timeout=0.3,
+        seed=seed,
+    )
+    server = serve(placowki=placowki, awarie=Awarie.rowno(awarie, zawieszenie_s=1.0, seed=seed))
+    with tempfile.TemporaryDirectory() as tmp:
+        katalog = Path(tmp) / "bip"
+        queue_file = download_reports.queue_path(katalog)
+        try:
+            # przebiegi z awariami, aż część plików jest zapisana, a część adresów ma błąd (ziarno – powtarzalnie)
+            pdfs = {path for path in server.site if path.endswith(".pdf")}
+            for przebieg in range(1, 11):
+                print(f"Przebieg {przebieg}: awarie {awarie:.0%} zapytań")
+                try:
+                    download_reports.main(server.url, katalog, od_nowa=przebieg == 1, fetcher=fetcher)
+                except SystemExit as exc:
+                    print(f"  (oczekiwane) {exc}")
+                queue = crawl_scheduler.WorkQueue(queue_file)
+                saved = {
+                    urllib.parse.urlsplit(url).path: Path(cel)
+                    for url, cel in queue.conn.execute(
+                        "SELECT url, cel FROM zadania WHERE rodzaj = 'plik' AND stan = ?", (crawl_scheduler.GOTOWE,)
+                    )
+                }
+                failed = queue.counts().get(crawl_scheduler.BLAD, 0)
+                queue.close()
+                if saved and failed:
+                    break
+            _expect(bool(saved) and failed > 0, f"przebiegi z awariami: {len(saved)} plików zapisanych, {failed} adresów z błędem")
+            hits_before = {path: server.hits[path] for path in saved}
+
+            print("Wznowienie bez awarii")
+            server.awarie = Awarie()
+            download_reports.main(server.url, katalog, fetcher=fetcher)
+
+            queue = crawl_scheduler.WorkQueue(queue_file)
+            files = {
+                urllib.parse.urlsplit(url).path: Path(cel)
+                for url, cel in queue.conn.execute("SELECT url, cel FROM zadania WHERE rodzaj = 'plik'")
+            }
+            counts = queue.counts()
+            queue.close()
+            _expect(not counts.get(crawl_scheduler.BLAD) and not counts.get(crawl_scheduler.OCZEKUJE), "kolejka zakończona bez błędów")
+            _expect(set(files) == pdfs, f"w kolejce wszystkie {len(pdfs)} PDF-y atrapy")
+            _expect(
+                all(files[path].read_bytes() == server.site[path][1] for path in pdfs), "pliki zgodne bajt w bajt z atrapą"
+            )
+            _expect(not list(katalog.rglob("*.part")), "brak niedokończonych plików .part")
+            _expect(
+                all(server.hits[path] == hits_before[path] for path in saved),
+                f"{len(saved)} plików z przebiegów z awariami nie pobrano ponownie",
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+            queue_file.unlink(missing_ok=True)
+    print("Wznowienie pobierania: OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokalna atrapa BIP z wstrzykiwanymi awariami.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--placowki", type=int, default=5)
+    parser.add_argument("--awarie", type=float, default=0.3, help="łączne prawdopodobieństwo awarii zapytania")
+    parser.add_argument("--pierwsze", type=int, default=0, help="każdy adres zawodzi przy pierwszych N zapytaniach")
+    parser.add_argument("--zawieszenie", type=float, default=5.0, help="czas zawieszenia odpowiedzi [s]")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    awarie = Awarie.rowno(args.awarie, zawieszenie_s=args.zawieszenie, pierwsze=args.pierwsze, seed=args.seed)
+    server = StandInServer(("127.0.0.1", args.port), build_site(args.placowki), awarie)
+    print(f"Atrapa BIP: {server.url} (Ctrl+C kończy)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Zapytania: {sum(server.hits.values())} ({len(server.hits)} adresów)")
+
+
+if __name__ == "__main__":
+    main()
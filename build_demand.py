@@ -1,19 +1,23 @@
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 import pandas as pd
-from pptx import Presentation
-from pptx.chart.data import CategoryChartData
-from pptx.enum.chart import XL_CHART_TYPE
-from pptx.util import Inches, Pt
+
+import instrumentation
+
+# python-pptx importowany w funkcjach slajdów: tabele zapotrzebowania (pipeline, cohort_projection) go nie potrzebują
 
 GUS_FILE = Path("raporty") / "demografia_dzieci.xlsx"
 OUT_XLSX = Path("raporty") / "zapotrzebowanie_miejsc_2023_2060.xlsx"
 OUT_PPTX = Path("raporty") / "prezentacja_demografia_placowki.pptx"
 
 
-def load_powiat():
-    df = pd.read_excel(GUS_FILE, sheet_name="powiat_raciborski")
+def load_powiat(source: Path = GUS_FILE):
+    return pivot_powiat(pd.read_excel(source, sheet_name="powiat_raciborski"))
+
+
+def pivot_powiat(df: pd.DataFrame):
+    """Długi format demografii powiatu (jednostka, typ, rok, grupa, liczba) -> zapotrzebowanie per rok."""
     pivot = df.pivot_table(index="rok", columns="grupa", values="liczba", aggfunc="sum").reset_index()
     pivot = pivot.rename(columns={"zlobek_0_2": "dzieci_0_2", "przedszkole_3_6": "dzieci_3_6", "szkolne_7_18": "dzieci_7_18"})
     for col in ["dzieci_0_2", "dzieci_3_6", "dzieci_7_18"]:
@@ -28,26 +32,31 @@ def load_powiat():
     return pivot.sort_values("rok")
 
 
-def load_miasto():
-    df = pd.read_excel(GUS_FILE, sheet_name="miasto_raciborz")
+def load_miasto(source: Path = GUS_FILE):
+    return pivot_miasto(pd.read_excel(source, sheet_name="miasto_raciborz"))
+
+
+def pivot_miasto(df: pd.DataFrame):
+    """Długi format demografii miasta -> zapotrzebowanie per rok (tylko dostępne grupy)."""
     pivot = df.pivot_table(index="rok", columns="grupa", values="liczba", aggfunc="sum").reset_index()
     # kolumny dostępne: dzieci_0_9 (brak rozbicia 0-2/3-6), mlodziez_10_19, dzieci_0_17, ogolem
     # Uwaga: brak dokładnego podziału 0-2 / 3-6, pozostawiamy NaN w zapotrzebowaniu szczegółowym
-    pivot["dzieci_0_2"] = pd.NA
-    pivot["dzieci_3_6"] = pd.NA
+    # (plik cohort_projection.py ma rozbicie dla całego horyzontu, także 2023-2040)
+    pivot["dzieci_0_2"] = pivot.get("zlobek_0_2", pd.NA)
+    pivot["dzieci_3_6"] = pivot.get("przedszkole_3_6", pd.NA)
     pivot["dzieci_7_18_przybl"] = pivot.get("mlodziez_10_19 (przybliżenie grupy szkolnej)", pivot.get("mlodziez_10_19 (przybliżenie grupy szkolnej)", pd.NA))
     pivot["dzieci_0_17"] = pivot.get("dzieci_0_17 (brak rozbicia na 0-2/3-6/7-17)", pd.NA)
     pivot["dzieci_0_9"] = pivot.get("dzieci_0_9 (brak rozbicia 0-2/3-6)", pivot.get("dzieci_0_9 (brak rozbicia 0-2/3-6)", pd.NA))
     pivot["dzieci_lacznie"] = pivot["dzieci_0_17"].fillna(pivot["dzieci_0_9"])
-    pivot["miejsca_zlobek"] = pd.NA
-    pivot["miejsca_przedszkole"] = pd.NA
+    pivot["miejsca_zlobek"] = pivot["dzieci_0_2"]
+    pivot["miejsca_przedszkole"] = pivot["dzieci_3_6"]
     pivot["miejsca_szkola"] = pivot["dzieci_7_18_przybl"]
     pivot["miejsca_lacznie"] = pivot["dzieci_lacznie"]
     return pivot.sort_values("rok")
 
 
-def save_excel(powiat: pd.DataFrame, miasto: pd.DataFrame):
-    with pd.ExcelWriter(OUT_XLSX, engine="openpyxl") as writer:
+def save_excel(powiat: pd.DataFrame, miasto: pd.DataFrame, path: Path = OUT_XLSX):
+    with instrumentation.span("zapis.xlsx", plik=path), pd.ExcelWriter(path, engine="openpyxl") as writer:
         powiat.to_excel(writer, sheet_name="powiat_raciborski", index=False)
         miasto.to_excel(writer, sheet_name="miasto_raciborz", index=False)
         # zestawienie
@@ -67,6 +76,8 @@ def add_slide_title(prs, title, subtitle=None):
 
 
 def add_bullet_slide(prs, title, bullets: List[str]):
+    from pptx.util import Pt
+
     layout = prs.slide_layouts[1]
     slide = prs.slides.add_slide(layout)
     slide.shapes.title.text = title
@@ -78,7 +89,14 @@ def add_bullet_slide(prs, title, bullets: List[str]):
     return slide
 
 
-def add_chart_slide(prs, title, categories, series_dict, chart_type=XL_CHART_TYPE.COLUMN_CLUSTERED, pos="B2"):
+def add_chart_slide(prs, title, categories, series_dict, chart_type=None, pos="B2"):
+    """Slajd z wykresem (domyślnie kolumnowym grupowanym) serii series_dict nad kategoriami."""
+    from pptx.chart.data import CategoryChartData
+    from pptx.enum.chart import XL_CHART_TYPE
+    from pptx.util import Inches
+
+    if chart_type is None:
+        chart_type = XL_CHART_TYPE.COLUMN_CLUSTERED
     layout = prs.slide_layouts[5]
     slide = prs.slides.add_slide(layout)
     slide.shapes.title.text = title
@@ -91,7 +109,10 @@ def add_chart_slide(prs, title, categories, series_dict, chart_type=XL_CHART_TYP
     return slide
 
 
-def build_ppt(powiat: pd.DataFrame, miasto: pd.DataFrame):
+def build_ppt(powiat: pd.DataFrame, miasto: pd.DataFrame, path: Path = OUT_PPTX):
+    from pptx import Presentation
+    from pptx.enum.chart import XL_CHART_TYPE
+
     prs = Presentation()
     add_slide_title(prs, "Demografia i zapotrzebowanie miejsc", "Racibórz i powiat raciborski, prognoza GUS 2023–2060")
     add_bullet_slide(
@@ -150,16 +171,19 @@ def build_ppt(powiat: pd.DataFrame, miasto: pd.DataFrame):
             "Kolejne kroki: zestawić z pojemnością placówek (żłobki, przedszkola, szkoły) i kosztami/ucznia.",
         ],
     )
-    prs.save(OUT_PPTX)
-
-
-def main():
-    powiat = load_powiat()
-    miasto = load_miasto()
-    save_excel(powiat, miasto)
-    build_ppt(powiat, miasto)
-    print(f"Zapisano {OUT_XLSX}")
-    print(f"Zapisano {OUT_PPTX}")
+    instrumentation.count("slajdy", len(prs.slides))
+    with instrumentation.span("zapis.pptx", plik=path):
+        prs.save(path)
+
+
+def main(source: Path = GUS_FILE, out_xlsx: Path = OUT_XLSX, out_pptx: Optional[Path] = OUT_PPTX):
+    powiat = load_powiat(source)
+    miasto = load_miasto(source)
+    save_excel(powiat, miasto, out_xlsx)
+    print(f"Zapisano {out_xlsx}")
+    if out_pptx is not None:
+        build_ppt(powiat, miasto, out_pptx)
+        print(f"Zapisano {out_pptx}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+"""
+Stan przyrostowej przebudowy raportów (cache/build):
+- skróty SHA-256 plików źródłowych i artefaktów; przeliczane tylko po zmianie rozmiaru/mtime (stamps.json),
+- skróty kodu (pliki modułów razem z importowanymi przez nie modułami projektu, źródło funkcji etapu),
+- state.json: dla każdego etapu końcowego klucz (wejścia + kod + klucze etapów nadrzędnych) i skróty zapisanych plików,
+- wyjścia etapów pośrednich jako pickle pod kluczem etapu (przebudowa jednego artefaktu nie liczy gałęzi od nowa),
+- cache jednostkowy (np. jeden PDF RZiS) jako JSON pod skrótem pliku i kodu parsera.
+"""
+
+import ast
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import instrumentation
+from rocznik_cache import file_hash
+
+BUILD_DIR = Path("cache/build")
+STATE_FILE = BUILD_DIR / "state.json"
+STAMPS_FILE = BUILD_DIR / "stamps.json"
+OUTPUTS_DIR = BUILD_DIR / "etapy"
+UNITS_DIR = BUILD_DIR / "jednostki"
+PROJECT_DIR = Path(__file__).resolve().parent
+
+
+def _read_json(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def _write_atomic(path: Path, data: bytes):
+    # zapis przez plik tymczasowy: równoległe procesy nie widzą niepełnych plików
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _write_json(path: Path, data: dict):
+    _write_atomic(path, json.dumps(data, indent=2, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+
+
+def load_stamps() -> Dict[str, dict]:
+    return _read_json(STAMPS_FILE)
+
+
+def save_stamps(stamps: Dict[str, dict]):
+    _write_json(STAMPS_FILE, stamps)
+
+
+def stamped_hash(path: Path, stamps: Dict[str, dict]) -> Optional[str]:
+    """Skrót pliku (None, gdy nie istnieje); przeliczany tylko, gdy zmienił się rozmiar lub mtime."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    entry = stamps.get(str(path))
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+    digest = file_hash(path)
+    stamps[str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    return digest
+
+
+@lru_cache(maxsize=None)
+def module_hash(name: str) -> str:
+    """Skrót pliku źródłowego modułu (wersja kodu)."""
+    return file_hash(Path(importlib.util.find_spec(name).origin))
+
+
+@lru_cache(maxsize=None)
+def project_imports(name: str) -> Tuple[str, ...]:
+    """Moduły projektu (pliki *.py obok tego modułu) importowane przez moduł – także leniwie, w funkcjach."""
+    tree = ast.parse(Path(importlib.util.find_spec(name).origin).read_text(encoding="utf-8"))
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return tuple(sorted(n for n in names if n != name and (PROJECT_DIR / f"{n}.py").exists()))
+
+
+def code_modules(names: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Moduły z ich przechodnimi importami z projektu: etap zależny od extract_gus_children jest nieaktualny
+    także po zmianie gus_source. Nadmiarowo (np. instrumentation) – lepiej przeliczyć za dużo niż podać stary wynik.
+    Klucze cache jednostkowego (memo) wymieniają swoje moduły jawnie i tej funkcji nie używają.
+    """
+    seen = set()
+    todo = list(names)
+    while todo:
+        name = todo.pop()
+        if name not in seen:
+            seen.add(name)
+            todo.extend(project_imports(name))
+    return tuple(sorted(seen))
+
+
+def function_hash(func: Callable) -> str:
+    return hashlib.sha256(inspect.getsource(func).encode("utf-8")).hexdigest()
+
+
+def digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def load_state() -> Dict[str, dict]:
+    return _read_json(STATE_FILE)
+
+
+def save_state(state: Dict[str, dict]):
+    _write_json(STATE_FILE, state)
+
+
+def _outputs_path(stage: str, key: str) -> Path:
+    return OUTPUTS_DIR / f"{stage}-{key[:16]}.pkl"
+
+
+def load_outputs(stage: str, key: str) -> Optional[dict]:
+    path = _outputs_path(stage, key)
+    if not path.exists():
+        instrumentation.count("cache.etapy.chybienia")
+        return None
+    instrumentation.count("cache.etapy.trafienia")
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_outputs(stage: str, key: str, values: dict):
+    """Zapisz wyjścia etapu pod jego kluczem; starsze wersje tego etapu są usuwane."""
+    path = _outputs_path(stage, key)
+    for old in OUTPUTS_DIR.glob(f"{stage}-*.pkl"):
+        if old != path:
+            old.unlink()
+    _write_atomic(path, pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_unit(namespace: str, key: str):
+    """Wpis cache jednostkowego albo None (liczniki cache.<namespace>.trafienia / chybienia)."""
+    path = UNITS_DIR / namespace / f"{key}.json"
+    if not path.exists():
+        instrumentation.count(f"cache.{namespace}.chybienia")
+        return None
+    instrumentation.count(f"cache.{namespace}.trafienia")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_unit(namespace: str, key: str, value):
+    _write_atomic(UNITS_DIR / namespace / f"{key}.json", json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def memo(namespace: str, key: str, compute: Callable[[], object]):
+    """Cache jednostkowy (JSON): wynik compute() zapamiętany pod kluczem, np. skrótem PDF i kodu parsera."""
+    value = load_unit(namespace, key)
+    if value is None:
+        value = compute()
+        save_unit(namespace, key, value)
+    return value
+
+
+def prune_units(namespace: str, keep: Iterable[str]):
+    """Usuń wpisy cache jednostkowego spoza podanych kluczy (np. po usunięciu PDF-a)."""
+    keep = set(keep)
+    for path in (UNITS_DIR / namespace).glob("*.json"):
+        if path.stem not in keep:
+            path.unlink()
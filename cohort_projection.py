@@ -0,0 +1,399 @@
+"""
+Projekcja kohortowo-składnikowa (macierz Lesliego) zasilana Rocznikiem Demograficznym 2025:
+- płodność (Tabl. 61) i umieralność (Tabl. 90) według województw, struktura wieku z Tabl. 16
+  (odczyt z cache Parquet, zob. rocznik_cache.py),
+- migracje jako rezydualne, wiekowe współczynniki netto skalibrowane na prognozie GUS jednostki,
+- projekcja jednorocznych roczników po horyzoncie GUS (powiaty 2060, gminy 2040) jako wsadowe
+  iloczyny macierzy, jednocześnie dla wszystkich jednostek i wariantów scenariusza.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import gus_source
+import rocznik_cache
+from extract_gus_children import group_age
+
+OUTPUT_XLSX = Path("raporty/demografia_dzieci_projekcja.xlsx")
+
+# jednostki raportu (TERYT): powiat raciborski i miasto Racibórz
+JEDNOSTKI = {"2411": ("Powiat raciborski", "powiat_raciborski"), "2411011": ("Miasto Racibórz", "miasto_raciborz")}
+HORYZONT = 2080
+OKNO_KALIBRACJI = 5
+N_WIEK = 91  # roczniki 0-89 + grupa otwarta 90+ (jak w Tabl. 1 prognozy powiatów)
+PLCIE = ("kobiety", "mezczyzni")  # kolejność bloków w wektorze stanu
+
+WOJEWODZTWA = {
+    "02": "Dolnośląskie",
+    "04": "Kujawsko-pomorskie",
+    "06": "Lubelskie",
+    "08": "Lubuskie",
+    "10": "Łódzkie",
+    "12": "Małopolskie",
+    "14": "Mazowieckie",
+    "16": "Opolskie",
+    "18": "Podkarpackie",
+    "20": "Podlaskie",
+    "22": "Pomorskie",
+    "24": "Śląskie",
+    "26": "Świętokrzyskie",
+    "28": "Warmińsko-mazurskie",
+    "30": "Wielkopolskie",
+    "32": "Zachodniopomorskie",
+}
+
+# grupy wieku tablic Rocznika (Tabl. 16 / Tabl. 90): 0, 1-4, 5-9, ..., 80-84, 85+
+GRUPY_ROCZNIK = [(0, 0), (1, 4)] + [(lo, lo + 4) for lo in range(5, 85, 5)] + [(85, N_WIEK - 1)]
+ETYKIETY_ROCZNIK = ["0", "1-4"] + [f"{lo}-{lo + 4}" for lo in range(5, 85, 5)] + ["85+"]
+# grupy wieku matki (Tabl. 61): <=19, 20-24, ..., 40-44, 45+
+GRUPY_MATKI = [(15, 19), (20, 24), (25, 29), (30, 34), (35, 39), (40, 44), (45, 49)]
+ETYKIETY_MATKI = ["<=19"] + [f"{lo}-{lo + 4}" for lo in range(20, 45, 5)] + ["45+"]
+# grupy 10-letnie prognozy gmin (Tabl. 1): 0-9, ..., 70-79, 80+
+GRUPY_GMINY = [(lo, lo + 9) for lo in range(0, 80, 10)] + [(80, N_WIEK - 1)]
+
+
+def _expand(values: np.ndarray, groups: List[Tuple[int, int]]) -> np.ndarray:
+    """Rozpisz wartości grupowe na jednoroczne roczniki (ta sama wartość w całej grupie)."""
+    out = np.zeros(N_WIEK)
+    for value, (lo, hi) in zip(values, groups):
+        out[lo : hi + 1] = value
+    return out
+
+
+def _by_age(df: pd.DataFrame, labels: List[str]) -> np.ndarray:
+    return df.set_index("age")["value"].reindex(labels).fillna(0).to_numpy(dtype=float)
+
+
+def load_rocznik_rates(wojewodztwo: str) -> Dict[str, np.ndarray]:
+    """Współczynniki płodności i zgonów (jednoroczne) dla województwa z Rocznika 2025 (przez rocznik_cache)."""
+    # bloki miasta/wieś mają w measure prefiks obszaru, więc '^W wieku' wybiera tylko wiersze ogółem
+    struktura = rocznik_cache.query("03", "Tabl. 16", region=wojewodztwo, measure="^W wieku")
+    pop_all = _by_age(struktura[struktura["sex"].isna()], ETYKIETY_ROCZNIK)
+    pop_m = _by_age(struktura[struktura["sex"] == "M"], ETYKIETY_ROCZNIK)
+    pop = np.stack([pop_all - pop_m, pop_m])
+
+    deaths = []
+    for plec in ("K", "M"):
+        zgony = rocznik_cache.query("09", "Tabl. 90 (114)", region=wojewodztwo, sex=plec, measure="^W wieku")
+        # kolumny: 0-4 razem, w tym 0 lat, 5-9, ..., 85+ -> 0, 1-4, 5-9, ..., 85+
+        values = _by_age(zgony, ["0-4"] + ETYKIETY_ROCZNIK)
+        deaths.append(np.concatenate([[values[1], values[0] - values[1]], values[3:]]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mortality = np.where(pop > 0, np.stack(deaths) / pop, 0.0)
+
+    urodzenia = rocznik_cache.query("08", "Tabl. 61 (85)", region=wojewodztwo, measure="^Wiek matki")
+    births = _by_age(urodzenia, ETYKIETY_MATKI)
+    asfr = births / pop[0, 4:11]  # kobiety 15-19 ... 45-49
+
+    plec = rocznik_cache.query("08", "Tabl. 56 (80)", region=wojewodztwo, measure=r"^URODZENIA ŻYWE[^|]*\| (?:Chłopcy|Dziew)")
+    chlopcy = plec.loc[plec["sex"] == "M", "value"].iloc[0]
+    dziewczeta = plec.loc[plec["sex"] == "K", "value"].iloc[0]
+
+    return {
+        "plodnosc": _expand(asfr, GRUPY_MATKI),
+        "zgony": np.stack([_expand(m, GRUPY_ROCZNIK) for m in mortality]),
+        "udzial_dziewczat": np.array(dziewczeta / (chlopcy + dziewczeta)),
+    }
+
+
+def build_leslie(rates: List[Dict[str, np.ndarray]]) -> np.ndarray:
+    """Zbuduj macierze przejścia (U, 2A, 2A): przeżycie + płodność, bez migracji."""
+    n = len(rates)
+    a = N_WIEK
+    mortality = np.stack([r["zgony"] for r in rates])  # (U, 2, A)
+    fertility = np.stack([r["plodnosc"] for r in rates])  # (U, A)
+    share_f = np.stack([r["udzial_dziewczat"] for r in rates])  # (U,)
+    survival = np.exp(-mortality)
+
+    leslie = np.zeros((n, 2 * a, 2 * a))
+    ages = np.arange(a - 1)
+    for k in range(2):
+        off = k * a
+        leslie[:, off + ages + 1, off + ages] = survival[:, k, :-1]
+        leslie[:, off + a - 1, off + a - 1] = survival[:, k, -1]
+
+    # urodzenia w ciągu roku od kobiet w wieku a (średnia z wieku a i a+1), dożycie do 31 XII
+    next_fertility = np.concatenate([fertility[:, 1:], np.zeros((n, 1))], axis=1)
+    births = 0.5 * (fertility + survival[:, 0, :] * next_fertility)
+    newborn_survival = np.exp(-mortality[:, :, 0] / 2)  # (U, 2)
+    leslie[:, 0, :a] += (share_f * newborn_survival[:, 0])[:, None] * births
+    leslie[:, a, :a] += ((1 - share_f) * newborn_survival[:, 1])[:, None] * births
+    return leslie
+
+
+def calibrate_migration(leslie: np.ndarray, observed: np.ndarray) -> np.ndarray:
+    """Wiekowe współczynniki migracji netto (U, 2A) jako rezydua obserwacji względem modelu bez migracji."""
+    model = np.einsum("uij,utj->uti", leslie, observed[:, :-1])
+    model_sum = model.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(model_sum > 0, observed[:, 1:].sum(axis=1) / model_sum - 1, 0.0)
+
+
+def project(matrices: np.ndarray, start: np.ndarray, steps: int) -> np.ndarray:
+    """Wsadowa projekcja: (..., 2A, 2A) x (..., 2A) -> (..., steps + 1, 2A)."""
+    out = np.empty(start.shape[:-1] + (steps + 1, start.shape[-1]))
+    out[..., 0, :] = start
+    for t in range(steps):
+        out[..., t + 1, :] = np.matmul(matrices, out[..., t, :, None])[..., 0]
+    return out
+
+
+def _read_tabl1(teryt: str, wariant: str, n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Wczytaj Tabl. 1 prognozy GUS: lata i liczebności (Y, 2, n_rows) dla kobiet i mężczyzn."""
+    table = gus_source.read_tables(teryt, ("Tabl. 1",), wariant, bloki=("kobiety", "mezczyzni"))["Tabl. 1"]
+    blocks = []
+    for blok in ("kobiety", "mezczyzni"):
+        _, values = table["bloki"][blok]
+        # pierwszy wiersz bloku to 'Ogółem Total'
+        blocks.append(np.nan_to_num(values[1 : 1 + n_rows]).T)
+    return table["lata"], np.stack(blocks, axis=1)
+
+
+def load_powiat_single_years(teryt: str, wariant: str = "bazowy") -> Tuple[np.ndarray, np.ndarray]:
+    """Prognoza GUS dla powiatu: lata i populacja (Y, 2A) w układzie [kobiety | mężczyźni]."""
+    years, pop = _read_tabl1(teryt, wariant, N_WIEK)
+    return years, pop.reshape(len(years), 2 * N_WIEK)
+
+
+def load_gmina_groups(teryt: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Prognoza GUS dla gminy (2023-2040): lata i populacja (Y, 2, 9) w grupach 10-letnich."""
+    return _read_tabl1(teryt, "bazowy", len(GRUPY_GMINY))
+
+
+def _group_matrix() -> np.ndarray:
+    """Macierz agregacji (2*9, 2A): jednoroczne roczniki -> grupy 10-letnie gmin, per płeć."""
+    agg = np.zeros((2 * len(GRUPY_GMINY), 2 * N_WIEK))
+    for k in range(2):
+        for g, (lo, hi) in enumerate(GRUPY_GMINY):
+            agg[k * len(GRUPY_GMINY) + g, k * N_WIEK + lo : k * N_WIEK + hi + 1] = 1
+    return agg
+
+
+def split_groups(groups: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Rozbij grupy gminy (..., 2*9) na roczniki (..., 2A) wg struktury wieku powiatu (..., 2A)."""
+    agg = _group_matrix()
+    ref_groups = reference @ agg.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = np.where(ref_groups > 0, groups / ref_groups, 0.0)
+    return reference * (factor @ agg)
+
+
+def prepare_units(teryty: List[str], warianty: List[str], rok_startu: int = None) -> Dict[int, dict]:
+    """Przygotuj wsady (wg roku startu): macierze (V, U, 2A, 2A) i populacje startowe (V, U, 2A)."""
+    rates_cache: Dict[str, Dict[str, np.ndarray]] = {}
+    batches: Dict[int, dict] = {}
+    agg = _group_matrix()
+    for teryt in teryty:
+        woj = WOJEWODZTWA[teryt[:2]]
+        if woj not in rates_cache:
+            rates_cache[woj] = load_rocznik_rates(woj)
+        leslie = build_leslie([rates_cache[woj]])[0]
+
+        matrices, starts = [], []
+        for wariant in warianty:
+            years, pop = load_powiat_single_years(teryt[:4], wariant)
+            if len(teryt) == 4:
+                start_year = rok_startu or int(years[-1])
+                j = int(np.where(years == start_year)[0][0])
+                window = pop[max(j - OKNO_KALIBRACJI, 0) : j + 1]
+                mig = calibrate_migration(leslie[None], window[None])[0]
+                start = pop[j]
+            else:
+                g_years, g_pop = load_gmina_groups(teryt)
+                start_year = rok_startu or int(g_years[-1])
+                j = int(np.where(g_years == start_year)[0][0])
+                p = np.searchsorted(years, g_years[max(j - OKNO_KALIBRACJI, 0) : j + 1])
+                window = pop[p]
+                mig = calibrate_migration(leslie[None], window[None])[0]
+                # korekta poziomu: migracja gminy względem powiatu, osobno dla płci i grup 10-letnich
+                g_flat = g_pop[max(j - OKNO_KALIBRACJI, 0) : j + 1].reshape(len(p), -1)
+                single = split_groups(g_flat, window)
+                model = (single[:-1] @ ((1 + mig)[:, None] * leslie).T) @ agg.T
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ratio = np.where(model.sum(0) > 0, g_flat[1:].sum(0) / model.sum(0), 1.0)
+                mig = (1 + mig) * (ratio @ agg) - 1
+                start = single[-1]
+            matrices.append((1 + mig)[:, None] * leslie)
+            starts.append(start)
+
+        batch = batches.setdefault(start_year, {"teryty": [], "macierze": [], "start": []})
+        batch["teryty"].append(teryt)
+        batch["macierze"].append(np.stack(matrices))
+        batch["start"].append(np.stack(starts))
+
+    for batch in batches.values():
+        batch["macierze"] = np.stack(batch["macierze"], axis=1)
+        batch["start"] = np.stack(batch["start"], axis=1)
+    return batches
+
+
+def run_projection(
+    teryty: List[str], warianty: List[str] = None, horyzont: int = HORYZONT, rok_startu: int = None
+) -> pd.DataFrame:
+    """Projekcja dla listy TERYT i wariantów; wynik długi: teryt, wariant, rok, plec, wiek, liczba."""
+    warianty = warianty or list(gus_source.WARIANTY)
+    frames = []
+    for start_year, batch in prepare_units(teryty, warianty, rok_startu).items():
+        steps = horyzont - start_year
+        result = project(batch["macierze"], batch["start"], steps)  # (V, U, T, 2A)
+        v, u, t, _ = result.shape
+        index = pd.MultiIndex.from_product(
+            [warianty, batch["teryty"], range(start_year, horyzont + 1), PLCIE, range(N_WIEK)],
+            names=["wariant", "teryt", "rok", "plec", "wiek"],
+        )
+        frames.append(pd.DataFrame({"liczba": result.reshape(-1)}, index=index).reset_index())
+    return pd.concat(frames, ignore_index=True)
+
+
+def to_demografia_format(projection: pd.DataFrame, wariant: str = "bazowy") -> pd.DataFrame:
+    """Sprowadź projekcję do formatu demografia_dzieci.xlsx (jednostka, typ, rok, grupa, liczba, uwaga)."""
+    df = projection[projection["wariant"] == wariant].copy()
+    df["grupa"] = df["wiek"].map(group_age)
+    df = df[df["grupa"] != "poza_zakresem"]
+    agg = df.groupby(["teryt", "rok", "grupa"], as_index=False)["liczba"].sum()
+    agg["liczba"] = agg["liczba"].round()
+    agg["jednostka"] = agg["teryt"].map(lambda t: JEDNOSTKI.get(t, (t, None))[0])
+    agg["typ"] = np.where(agg["teryt"].str.len() == 4, "powiat", "gmina")
+    agg["uwaga"] = f"Projekcja kohortowa (Rocznik 2025, wariant {wariant})"
+    return agg[["jednostka", "typ", "rok", "grupa", "liczba", "uwaga"]]
+
+
+def _coarse_city_groups(projection: pd.DataFrame, wariant: str = "bazowy") -> pd.DataFrame:
+    """Grupy miasta w układzie build_demand.load_miasto (0-9, 10-19, 0-17) z projekcji jednorocznej."""
+    df = projection[(projection["wariant"] == wariant) & (projection["teryt"].str.len() == 7)]
+    labels = {
+        "dzieci_0_9 (brak rozbicia 0-2/3-6)": (0, 9),
+        "mlodziez_10_19 (przybliżenie grupy szkolnej)": (10, 19),
+        "dzieci_0_17 (brak rozbicia na 0-2/3-6/7-17)": (0, 17),
+    }
+    frames = []
+    for label, (lo, hi) in labels.items():
+        part = df[df["wiek"].between(lo, hi)].groupby(["teryt", "rok"], as_index=False)["liczba"].sum()
+        part["grupa"] = label
+        frames.append(part)
+    out = pd.concat(frames, ignore_index=True)
+    out["liczba"] = out["liczba"].round()
+    out["jednostka"] = out["teryt"].map(lambda t: JEDNOSTKI.get(t, (t, None))[0])
+    out["typ"] = "gmina"
+    out["uwaga"] = f"Projekcja kohortowa (Rocznik 2025, wariant {wariant})"
+    return out[["jednostka", "typ", "rok", "grupa", "liczba", "uwaga"]]
+
+
+def validate_against_gus(teryty: List[str], warianty: List[str] = None, rok_startu: int = 2028) -> pd.DataFrame:
+    """Porównaj projekcję (start rok_startu, kalibracja na latach wcześniejszych) z prognozą GUS powiatów."""
+    warianty = warianty or list(gus_source.WARIANTY)
+    powiaty = [t for t in teryty if len(t) == 4]
+    projection = run_projection(powiaty, warianty, horyzont=2060, rok_startu=rok_startu)
+    projection["grupa"] = projection["wiek"].map(group_age)
+    rows = []
+    for wariant in warianty:
+        for teryt in powiaty:
+            years, pop = load_powiat_single_years(teryt, wariant)
+            ages = np.tile(np.arange(N_WIEK), 2)
+            for grupa in ("zlobek_0_2", "przedszkole_3_6", "szkolne_7_18", "ogolem"):
+                mask = np.ones_like(ages, dtype=bool) if grupa == "ogolem" else np.array([group_age(a) == grupa for a in ages])
+                gus = pd.Series(pop[:, mask].sum(axis=1), index=years, name="gus")
+                sel = projection[(projection["wariant"] == wariant) & (projection["teryt"] == teryt)]
+                if grupa != "ogolem":
+                    sel = sel[sel["grupa"] == grupa]
+                model = sel.groupby("rok")["liczba"].sum().rename("projekcja")
+                both = pd.concat([gus, model], axis=1, join="inner").reset_index(names="rok")
+                both.insert(0, "grupa", grupa)
+                both.insert(0, "wariant", wariant)
+                both.insert(0, "teryt", teryt)
+                rows.append(both)
+    out = pd.concat(rows, ignore_index=True)
+    out["blad_proc"] = (out["projekcja"] - out["gus"]) / out["gus"] * 100
+    return out
+
+
+def _gus_powiat_groups(teryt: str) -> pd.DataFrame:
+    """Grupy dzieci powiatu z Tabl. 1 GUS (bloki kobiet i mężczyzn), format demografia_dzieci."""
+    years, pop = load_powiat_single_years(teryt)
+    ages = np.tile(np.arange(N_WIEK), 2)
+    frames = []
+    for grupa in ("zlobek_0_2", "przedszkole_3_6", "szkolne_7_18"):
+        mask = np.array([group_age(a) == grupa for a in ages])
+        frames.append(pd.DataFrame({"rok": years, "grupa": grupa, "liczba": pop[:, mask].sum(axis=1)}))
+    out = pd.concat(frames, ignore_index=True)
+    out["jednostka"] = JEDNOSTKI.get(teryt, (teryt, None))[0]
+    out["typ"] = "powiat"
+    out["uwaga"] = "Prognoza GUS 2023-2060 (Tabl. 1, kobiety + mężczyźni)"
+    return out[["jednostka", "typ", "rok", "grupa", "liczba", "uwaga"]]
+
+
+def _gus_gmina_single_years(teryt: str) -> pd.DataFrame:
+    """Prognoza GUS gminy (2023-2040) rozbita na roczniki wg struktury wieku powiatu, w układzie run_projection."""
+    g_years, g_pop = load_gmina_groups(teryt)
+    years, pop = load_powiat_single_years(teryt[:4])
+    single = split_groups(g_pop.reshape(len(g_years), -1), pop[np.searchsorted(years, g_years)])
+    index = pd.MultiIndex.from_product(
+        [["bazowy"], [teryt], g_years, PLCIE, range(N_WIEK)], names=["wariant", "teryt", "rok", "plec", "wiek"]
+    )
+    return pd.DataFrame({"liczba": single.reshape(-1)}, index=index).reset_index()
+
+
+def _gus_gmina_groups(teryt: str) -> pd.DataFrame:
+    """Grupy gminy z Tabl. 1 GUS w tym samym układzie co projekcja (0-9, 10-19, 0-17 i grupy placówek)."""
+    single = _gus_gmina_single_years(teryt)
+    out = pd.concat([to_demografia_format(single), _coarse_city_groups(single)], ignore_index=True)
+    # sumy 0-9 i 10-19 są wprost z GUS; rozbicie wewnątrz grup 10-letnich wg struktury wieku powiatu
+    out["uwaga"] = "Prognoza GUS gmin 2023-2040 (Tabl. 1, grupy 10-letnie rozbite wg struktury wieku powiatu)"
+    return out
+
+
+def check_city_boundary(miasto: pd.DataFrame, rok: int, prog: float = 0.05) -> None:
+    """Sprawdź, że zapotrzebowanie miasta nie ma skoku na styku prognozy GUS i projekcji (rok -> rok + 1)."""
+    import build_demand
+
+    demand = build_demand.pivot_miasto(miasto).set_index("rok")
+    for col in ("miejsca_lacznie", "miejsca_zlobek", "miejsca_przedszkole", "miejsca_szkola"):
+        before, after = pd.to_numeric(demand[col], errors="coerce").reindex([rok, rok + 1])
+        if pd.isna(before) or pd.isna(after):
+            raise SystemExit(f"BŁĄD: brak {col} na styku {rok}/{rok + 1} ({before} -> {after})")
+        if abs(after / before - 1) > prog:
+            raise SystemExit(f"BŁĄD: skok {col} na styku {rok}/{rok + 1}: {before:.0f} -> {after:.0f}")
+
+
+def main():
+    teryty = list(JEDNOSTKI)
+    projection = run_projection(teryty)
+    validation = validate_against_gus(teryty)
+
+    powiat_teryt, miasto_teryt = teryty
+    proj = to_demografia_format(projection)
+    powiat_gus = _gus_powiat_groups(powiat_teryt)
+    miasto_gus = _gus_gmina_groups(miasto_teryt)
+    # projekcja zaczyna się w ostatnim roku GUS – do tego roku zostają dane GUS
+    powiat = pd.concat(
+        [powiat_gus, proj[(proj["typ"] == "powiat") & (proj["rok"] > powiat_gus["rok"].max())]], ignore_index=True
+    )
+    miasto_proj = pd.concat([proj[proj["typ"] == "gmina"], _coarse_city_groups(projection)], ignore_index=True)
+    miasto = pd.concat(
+        [miasto_gus, miasto_proj[miasto_proj["rok"] > miasto_gus["rok"].max()]], ignore_index=True
+    ).sort_values(["rok", "grupa"])
+    check_city_boundary(miasto, int(miasto_gus["rok"].max()))
+    combined = pd.concat([powiat, miasto], ignore_index=True).sort_values(["jednostka", "rok", "grupa"])
+
+    OUTPUT_XLSX.parent.mkdir(parents=True, exist_ok=True)
+    with pd.ExcelWriter(OUTPUT_XLSX, engine="openpyxl") as writer:
+        powiat.to_excel(writer, sheet_name=JEDNOSTKI[powiat_teryt][1], index=False)
+        miasto.to_excel(writer, sheet_name=JEDNOSTKI[miasto_teryt][1], index=False)
+        combined.to_excel(writer, sheet_name="zestawienie", index=False)
+        validation.to_excel(writer, sheet_name="walidacja", index=False)
+        warianty = pd.concat(
+            [to_demografia_format(projection, w).assign(wariant=w) for w in gus_source.WARIANTY], ignore_index=True
+        )
+        warianty.to_excel(writer, sheet_name="warianty", index=False)
+
+    mape = validation.assign(abs_err=validation["blad_proc"].abs()).groupby(["wariant", "grupa"])["abs_err"].mean()
+    print("Walidacja względem prognozy GUS (średni |błąd| %, start 2028):")
+    print(mape.round(2).to_string())
+    print(f"Zapisano {OUTPUT_XLSX}")
+
+
+if __name__ == "__main__":
+    main()
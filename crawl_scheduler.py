@@ -0,0 +1,277 @@
+"""
+Odporne pobieranie stron i plików (BIP):
+- osobne limity czasu połączenia i odczytu (zawieszona odpowiedź kończy się błędem, a nie wiecznym czekaniem),
+- ponawianie błędów przejściowych (przekroczenie czasu, zerwane połączenie, 408/429/5xx) z wykładniczym
+  odstępem i losowym rozrzutem (full jitter); nagłówek Retry-After ma pierwszeństwo, gdy jest dłuższy –
+  ale najwyżej RetryPolicy.max_s: dłuższy oznacza błąd zadania, ponawianego dopiero w następnym przebiegu,
+- limit zapytań per host (kubełek żetonów: średnio `na_sekunde` zapytań, chwilowo do `zapas`),
+- trwała kolejka adresów (SQLite): każde zadanie ma stan oczekuje / gotowe / blad zapisywany od razu,
+  więc przerwany przebieg po ponownym uruchomieniu kontynuuje od pierwszego niezakończonego adresu.
+Obsługa treści (strona z listą, strona placówki, plik) należy do wywołującego – crawl() dostaje słownik
+rodzaj zadania -> funkcja(zadanie, treść, kolejka), która może dopisywać do kolejki kolejne adresy.
+"""
+
+import http.client
+import random
+import sqlite3
+import ssl
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import instrumentation
+
+QUEUE_DIR = Path("cache/pobieranie")
+USER_AGENT = "Mozilla/5.0"
+CONNECT_TIMEOUT = 10.0  # s
+READ_TIMEOUT = 30.0  # s – maksymalna przerwa między kolejnymi porcjami odpowiedzi
+MAX_REDIRECTS = 5
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+OCZEKUJE, GOTOWE, BLAD = "oczekuje", "gotowe", "blad"
+
+
+class TransientError(Exception):
+    """Błąd, który warto ponowić (timeout, zerwane połączenie, 429/5xx)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PermanentError(Exception):
+    """Błąd, którego ponawianie nic nie da (np. 404) – zadanie od razu oznaczane jako błędne."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    proby: int = 5  # łączna liczba prób jednego adresu
+    baza_s: float = 0.5
+    max_s: float = 30.0
+
+    def delay(self, attempt: int, rng: random.Random) -> float:
+        """Odstęp przed próbą attempt+1: losowo z [0, min(max, baza·2^attempt)] (full jitter)."""
+        return rng.uniform(0, min(self.max_s, self.baza_s * 2**attempt))
+
+
+class TokenBucket:
+    """Kubełek żetonów: średnio `rate` zapytań/s, chwilowo do `burst` bez czekania."""
+
+    def __init__(self, rate: float, burst: float = 1.0, clock: Callable[[], float] = time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Pobierz żeton (czekając, gdy kubełek pusty); zwraca czas oczekiwania [s]."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            self.tokens -= 1  # żeton "pożyczony" na czas czekania – kolejne wywołania czekają dłużej
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After w sekundach albo jako data HTTP."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def http_get(url: str, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT) -> bytes:
+    """GET z osobnym limitem połączenia i odczytu, przekierowaniami; błędy jako Transient/PermanentError."""
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme == "https":
+            conn = http.client.HTTPSConnection(parts.netloc, timeout=connect_timeout, context=ssl.create_default_context())
+        elif parts.scheme == "http":
+            conn = http.client.HTTPConnection(parts.netloc, timeout=connect_timeout)
+        else:
+            raise PermanentError(f"nieobsługiwany adres: {url}")
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        try:
+            conn.connect()
+            conn.sock.settimeout(read_timeout)
+            conn.request("GET", path, headers={"User-Agent": USER_AGENT})
+            resp = conn.getresponse()
+            body = resp.read()
+        except (OSError, http.client.HTTPException) as exc:
+            # timeout połączenia/odczytu, zerwane połączenie, niepełna odpowiedź, DNS – zwykle chwilowe
+            raise TransientError(f"{type(exc).__name__}: {exc}") from exc
+        finally:
+            conn.close()
+        if 200 <= resp.status < 300:
+            return body
+        if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+            url = urllib.parse.urljoin(url, resp.getheader("Location"))
+            continue
+        if resp.status in RETRY_STATUS:
+            raise TransientError(f"HTTP {resp.status}", _retry_after(resp.getheader("Retry-After")))
+        raise PermanentError(f"HTTP {resp.status}")
+    raise PermanentError(f"za dużo przekierowań: {url}")
+
+
+class Fetcher:
+    """Pobieranie z limitem zapytań per host i ponawianiem błędów przejściowych."""
+
+    def __init__(
+        self,
+        policy: RetryPolicy = RetryPolicy(),
+        na_sekunde: float = 2.0,
+        zapas: float = 4.0,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+        seed: Optional[int] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.policy = policy
+        self.na_sekunde = na_sekunde
+        self.zapas = zapas
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.rng = random.Random(seed)
+        self.sleep = sleep
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.na_sekunde, self.zapas, sleep=self.sleep)
+        return self.buckets[host]
+
+    def get(self, url: str) -> bytes:
+        attempt = 0
+        while True:
+            self.bucket(url).acquire()
+            try:
+                with instrumentation.span("pobieranie", url=url, proba=attempt + 1):
+                    return http_get(url, self.connect_timeout, self.read_timeout)
+            except TransientError as exc:
+                attempt += 1
+                if attempt >= self.policy.proby:
+                    raise
+                if exc.retry_after is not None and exc.retry_after > self.policy.max_s:
+                    # serwer każe czekać dłużej, niż pozwala polityka – nie wstrzymujemy przebiegu
+                    raise TransientError(
+                        f"{exc}, Retry-After {exc.retry_after:g} s > {self.policy.max_s:g} s – do następnego przebiegu"
+                    ) from exc
+                delay = max(exc.retry_after or 0.0, self.policy.delay(attempt - 1, self.rng))
+                instrumentation.count("pobieranie.ponowienia")
+                print(f"    ! {exc} – ponawiam za {delay:.1f} s ({attempt + 1}/{self.policy.proby})")
+                self.sleep(delay)
+
+
+class Task(NamedTuple):
+    url: str
+    rodzaj: str
+    cel: str  # katalog lub plik docelowy
+    opis: str
+
+
+class WorkQueue:
+    """Trwała kolejka adresów w SQLite; kolejność = kolejność dodania, adres jest kluczem (bez duplikatów)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS zadania (
+                url TEXT PRIMARY KEY, rodzaj TEXT NOT NULL, cel TEXT NOT NULL DEFAULT '', opis TEXT NOT NULL DEFAULT '',
+                stan TEXT NOT NULL DEFAULT 'oczekuje', proby INTEGER NOT NULL DEFAULT 0, blad TEXT, zmieniono REAL)"""
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, url: str, rodzaj: str, cel: str = "", opis: str = "") -> bool:
+        """Dodaj adres (False, gdy już jest w kolejce – niezależnie od stanu)."""
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO zadania (url, rodzaj, cel, opis, zmieniono) VALUES (?, ?, ?, ?, ?)",
+                (url, rodzaj, str(cel), opis, time.time()),
+            )
+        return cur.rowcount == 1
+
+    def next(self) -> Optional[Task]:
+        row = self.conn.execute(
+            "SELECT url, rodzaj, cel, opis FROM zadania WHERE stan = ? ORDER BY rowid LIMIT 1", (OCZEKUJE,)
+        ).fetchone()
+        return Task(*row) if row else None
+
+    def _mark(self, url: str, stan: str, blad: Optional[str] = None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE zadania SET stan = ?, proby = proby + 1, blad = ?, zmieniono = ? WHERE url = ?",
+                (stan, blad, time.time(), url),
+            )
+
+    def done(self, url: str):
+        self._mark(url, GOTOWE)
+
+    def failed(self, url: str, error: str):
+        self._mark(url, BLAD, error)
+
+    def targets(self) -> set:
+        """Pliki docelowe już przydzielone zadaniom (unikalne nazwy bez względu na stan pobrania)."""
+        return {row[0] for row in self.conn.execute("SELECT cel FROM zadania WHERE rodzaj = 'plik'")}
+
+    def resume(self, odswiez: Iterable[str] = ()) -> int:
+        """
+        Przed przebiegiem: zadania z błędem wracają do kolejki; gdy poprzedni przebieg się zakończył
+        (nic nie oczekuje), zadania rodzajów `odswiez` (strony z listami) są powtarzane, by znaleźć nowe pliki.
+        Zwraca liczbę zadań oczekujących.
+        """
+        with self.conn:
+            self.conn.execute("UPDATE zadania SET stan = ?, blad = NULL WHERE stan = ?", (OCZEKUJE, BLAD))
+            if not self.counts().get(OCZEKUJE):
+                for rodzaj in odswiez:
+                    self.conn.execute("UPDATE zadania SET stan = ? WHERE rodzaj = ?", (OCZEKUJE, rodzaj))
+        return self.counts().get(OCZEKUJE, 0)
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM zadania")
+
+    def counts(self) -> Counter:
+        return Counter(dict(self.conn.execute("SELECT stan, COUNT(*) FROM zadania GROUP BY stan").fetchall()))
+
+    def errors(self) -> List[tuple]:
+        return self.conn.execute("SELECT url, blad FROM zadania WHERE stan = ? ORDER BY rowid", (BLAD,)).fetchall()
+
+
+def crawl(
+    queue: WorkQueue, fetcher: Fetcher, handlers: Dict[str, Callable[[Task, bytes, WorkQueue], None]]
+) -> Counter:
+    """Przetwarzaj kolejkę do wyczerpania; zadanie, które nie powiodło się po wszystkich próbach, nie przerywa przebiegu."""
+    while (task := queue.next()) is not None:
+        try:
+            body = fetcher.get(task.url)
+            handlers[task.rodzaj](task, body, queue)
+        except (TransientError, PermanentError) as exc:
+            print(f"  ✗ {task.url}: {exc}")
+            instrumentation.count("pobieranie.bledy")
+            queue.failed(task.url, str(exc))
+            continue
+        queue.done(task.url)
+    return queue.counts()
@@ -2,10 +2,12 @@ import os
 import re
 import unicodedata
 import urllib.parse
-import urllib.request
 from html import unescape
 from html.parser import HTMLParser
 from pathlib import Path
+from typing import Optional
+
+import crawl_scheduler
 
 BASE_URL = "https://zopo.bipraciborz.pl"
 MAIN_URL = f"{BASE_URL}/bipkod/40495541"
@@ -49,85 +51,122 @@ class AnchorParser(HTMLParser):
             self._text_parts.append(data)
 
 
-def fetch(url: str) -> str:
-    """Fetch URL content as text with a simple User-Agent."""
-    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    with urllib.request.urlopen(req) as resp:
-        return resp.read().decode("utf-8", errors="ignore")
+def fetch(url: str, fetcher: Optional[crawl_scheduler.Fetcher] = None) -> str:
+    """Fetch URL content as text (timeouts, retries of transient errors, per-host rate limit)."""
+    return (fetcher or crawl_scheduler.Fetcher()).get(url).decode("utf-8", errors="ignore")
 
 
-def extract_institution_links(html: str):
+def extract_institution_links(html: str, main_url: str = MAIN_URL):
     """Return list of (name, url) for 2024 institution report pages."""
     parser = AnchorParser()
     parser.feed(html)
     links = []
     prefix = "Sprawozdanie finansowe za rok 2024"
     for href, text in parser.results:
-        if href and "bipkod/" in href and prefix in text and href != MAIN_URL:
+        if href and "bipkod/" in href and prefix in text and href != main_url:
             name = text.replace(prefix, "").strip()
-            links.append((name, urllib.parse.urljoin(BASE_URL, href)))
+            links.append((name, urllib.parse.urljoin(main_url, href)))
     return links
 
 
-def extract_attachment_links(html: str):
+def extract_attachment_links(html: str, page_url: str = BASE_URL):
     """Return list of (file_title, absolute_url) for attachments on a page."""
     parser = AnchorParser()
     parser.feed(html)
     attachments = []
     for href, text in parser.results:
         if href and "/res/serwisy/pliki/" in href:
-            url = urllib.parse.urljoin(BASE_URL, href)
+            url = urllib.parse.urljoin(page_url, href)
             attachments.append((text or os.path.basename(href), url))
     return attachments
 
 
-def ensure_unique_path(directory: str, filename: str) -> str:
-    """Ensure file path is unique by appending counter when needed."""
+def ensure_unique_path(directory: str, filename: str, taken: frozenset = frozenset()) -> str:
+    """Ensure file path is unique (on disk and among `taken` paths) by appending counter when needed."""
     base, ext = os.path.splitext(filename)
     candidate = os.path.join(directory, filename)
     counter = 2
-    while os.path.exists(candidate):
+    while os.path.exists(candidate) or candidate in taken:
         candidate = os.path.join(directory, f"{base}_{counter}{ext}")
         counter += 1
     return candidate
 
 
-def download_file(url: str, dest_path: str):
+def download_file(url: str, dest_path: str, fetcher: Optional[crawl_scheduler.Fetcher] = None):
+    write_atomic(dest_path, (fetcher or crawl_scheduler.Fetcher()).get(url))
+
+
+def write_atomic(dest_path: str, data: bytes):
+    """Write via a temporary file, so an interrupted run never leaves a truncated PDF behind."""
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    with urllib.request.urlopen(req) as resp, open(dest_path, "wb") as f:
-        f.write(resp.read())
-
-
-def main():
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-    print("Pobieram stronę główną:", MAIN_URL)
-    main_html = fetch(MAIN_URL)
-    institutions = extract_institution_links(main_html)
-    if not institutions:
-        raise SystemExit("Nie znaleziono linków do sprawozdań 2024.")
-
-    print(f"Znaleziono {len(institutions)} placówek.")
-    for name, url in institutions:
-        folder = OUTPUT_DIR / slugify(name)
-        print(f"\nPlacówka: {name} -> katalog '{folder}'")
-        print("  Pobieram stronę:", url)
-        html = fetch(url)
-        attachments = extract_attachment_links(html)
+    tmp = f"{dest_path}.part"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, dest_path)
+
+
+def queue_path(output_dir: Path) -> Path:
+    """Persistent work queue of one output directory (cache/pobieranie/<slug>.sqlite)."""
+    return crawl_scheduler.QUEUE_DIR / f"{slugify(str(output_dir))}.sqlite"
+
+
+def crawl_handlers(output_dir: Path, main_url: str):
+    """Handlers of queued tasks: list page -> institution pages -> attachment files."""
+
+    def lista(task, body, queue):
+        institutions = extract_institution_links(body.decode("utf-8", errors="ignore"), main_url)
+        if not institutions:
+            raise SystemExit("Nie znaleziono linków do sprawozdań 2024.")
+        print(f"Znaleziono {len(institutions)} placówek.")
+        for name, url in institutions:
+            queue.add(url, "strona", output_dir / slugify(name), name)
+
+    def strona(task, body, queue):
+        print(f"\nPlacówka: {task.opis} -> katalog '{task.cel}'")
+        attachments = extract_attachment_links(body.decode("utf-8", errors="ignore"), task.url)
         if not attachments:
             print("  Brak załączników na stronie.")
-            continue
-
+        taken = frozenset(queue.targets())
         for title, file_url in attachments:
             base, ext = os.path.splitext(title)
-            ext = ext or ".bin"
-            safe_name = f"{slugify(base)}{ext}"
-            dest = ensure_unique_path(folder, safe_name)
-            print(f"  - zapisuję {safe_name} z {file_url}")
-            download_file(file_url, dest)
-
-    print("\\nZakończono pobieranie.")
+            dest = ensure_unique_path(task.cel, f"{slugify(base)}{ext or '.bin'}", taken)
+            if queue.add(file_url, "plik", dest, title):
+                taken |= {dest}
+
+    def plik(task, body, queue):
+        print(f"  - zapisuję {os.path.basename(task.cel)} z {task.url}")
+        write_atomic(task.cel, body)
+
+    return {"lista": lista, "strona": strona, "plik": plik}
+
+
+def main(
+    main_url: str = MAIN_URL,
+    output_dir: Path = OUTPUT_DIR,
+    od_nowa: bool = False,
+    fetcher: Optional[crawl_scheduler.Fetcher] = None,
+):
+    """
+    Crawl the list page, institution pages and attachments through a persistent queue: an interrupted
+    run continues where it stopped; a finished one re-reads only the pages and downloads new files.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    queue = crawl_scheduler.WorkQueue(queue_path(output_dir))
+    try:
+        if od_nowa:
+            queue.clear()
+        pending = queue.resume(odswiez=("lista", "strona"))
+        if queue.add(main_url, "lista", output_dir):
+            pending += 1
+        print(f"Pobieram stronę główną: {main_url} (w kolejce: {pending})")
+        counts = crawl_scheduler.crawl(queue, fetcher or crawl_scheduler.Fetcher(), crawl_handlers(output_dir, main_url))
+        errors = queue.errors()
+    finally:
+        queue.close()
+
+    print(f"\nZakończono pobieranie: gotowe {counts.get(crawl_scheduler.GOTOWE, 0)}, błędy {len(errors)}.")
+    if errors:
+        raise SystemExit(f"Nie pobrano {len(errors)} adresów (np. {errors[0][0]}: {errors[0][1]}) – uruchom ponownie, aby dokończyć.")
 
 
 if __name__ == "__main__":
@@ -1,21 +1,41 @@
+import re
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from typing import List
+
+import gus_source
+import instrumentation
 
-BASE_DIR = Path("pobrane/GUS")
+BASE_DIR = gus_source.BASE_DIR
 OUTPUT_XLSX = Path("raporty/demografia_dzieci.xlsx")
 
-# Ścieżki do plików źródłowych
-POWIAT_FILE = BASE_DIR / "2023_2060_4-powiaty" / "Powiaty" / "24 ÿlÑskie" / "2411 raciborski.xlsx"
-MIASTO_FILE = (
-    BASE_DIR
-    / "2023_2040_8_prognoza_ludnosci_dla_gmin_na_lata_2023-2040_2"
-    / "24 śląskie"
-    / "2411 powiat raciborski"
-    / "2411011 Racibórz (M).xlsx"
-)
+# Jednostki źródłowe (TERYT); pliki wyszukuje gus_source – także wewnątrz archiwów .zip
+POWIAT_TERYT = "2411"
+MIASTO_TERYT = "2411011"
 TABLICA_ZBIORCZA = BASE_DIR / "2023_2040_9_gminy_ludnosc_-_tablica_zbiorcza_2.xlsx"
 
 
+def unit_label(teryt: str) -> str:
+    """
+    Etykieta jednostki w konwencji domyślnych etykiet ("Powiat raciborski", "Miasto Racibórz") z nazwy pliku GUS:
+    'raciborski' -> 'Powiat raciborski', 'm. Katowice' -> 'Miasto Katowice', 'Racibórz (M)' -> 'Miasto Racibórz',
+    'Kuźnia Raciborska (M-W)' / '... (W)' -> 'Gmina ...'.
+    """
+    nazwa = gus_source.unit_name(teryt)
+    if len(teryt) == 2:
+        return nazwa if nazwa == "Polska" else f"Województwo {nazwa}"
+    if nazwa.startswith("m."):  # miasto na prawach powiatu (plik powiatu i gminy)
+        return f"Miasto {nazwa[2:].strip()}"
+    if len(teryt) == 4:
+        return f"Powiat {nazwa}"
+    match = re.fullmatch(r"(.*?)\s*\((M|W|M-W)\)", nazwa)
+    if match:
+        return f"{'Miasto' if match.group(2) == 'M' else 'Gmina'} {match.group(1)}"
+    return nazwa
+
+
 def group_age(age: int) -> str:
     if 0 <= age <= 2:
         return "zlobek_0_2"
@@ -26,40 +46,45 @@ def group_age(age: int) -> str:
     return "poza_zakresem"
 
 
-def load_powiat():
-    df = pd.read_excel(POWIAT_FILE, sheet_name="Tabl. 1", skiprows=6)
-    df = df[df["Wiek Age"].apply(lambda x: pd.api.types.is_number(x))]
-    # szeroki -> długi
-    year_cols = [c for c in df.columns if isinstance(c, (int, float)) or str(c).startswith("202")]
-    melted = df.melt(id_vars=["Wiek Age"], value_vars=year_cols, var_name="rok", value_name="liczba")
-    # normalizujemy nagłówek 2022*
-    melted["rok"] = melted["rok"].replace({"2022*": 2022})
-    melted = melted[melted["liczba"].notna()]
-    melted["wiek"] = melted["Wiek Age"].astype(int)
-    melted["rok"] = melted["rok"].astype(int)
-    melted["grupa"] = melted["wiek"].apply(group_age)
-    agg = (
-        melted[melted["grupa"] != "poza_zakresem"]
-        .groupby(["rok", "grupa"], as_index=False)["liczba"]
-        .sum()
+def _long(lata: np.ndarray, labels: List[str], values: np.ndarray) -> pd.DataFrame:
+    """Tablica (etykiety x lata) z gus_source.read_tables -> długi format (etykieta, rok, liczba)."""
+    df = pd.DataFrame(
+        {
+            "etykieta": np.tile(labels, len(lata)),
+            "rok": np.repeat(lata, len(labels)),
+            "liczba": values.T.reshape(-1),
+        }
     )
-    agg["jednostka"] = "Powiat raciborski"
+    return df[df["liczba"].notna()]
+
+
+def load_powiat(teryt: str = POWIAT_TERYT, jednostka: str = "Powiat raciborski", base: Path = BASE_DIR):
+    # jeden strumieniowy odczyt Tabl. 1: blok "Ogółem" (bez sumowania z blokami płci), roczniki 0-18
+    table = gus_source.read_tables(
+        teryt, ("Tabl. 1",), bloki=("ogolem",), wiek=[str(a) for a in range(19)], base=base
+    )["Tabl. 1"]
+    with instrumentation.span("gus.agregacja", teryt=teryt):
+        melted = _long(table["lata"], *table["bloki"]["ogolem"])
+        melted["grupa"] = melted["etykieta"].astype(int).apply(group_age)
+        agg = (
+            melted[melted["grupa"] != "poza_zakresem"]
+            .groupby(["rok", "grupa"], as_index=False)["liczba"]
+            .sum()
+        )
+    agg["jednostka"] = jednostka
     agg["typ"] = "powiat"
     agg["uwaga"] = "Dokładne wartości z Tablica 1 (jednoroczne wieki 0-100)"
     return agg[["jednostka", "typ", "rok", "grupa", "liczba", "uwaga"]]
 
 
-def load_miasto():
-    # Dane z pliku gminnego (zakres 0-9, 10-19)
-    df = pd.read_excel(MIASTO_FILE, sheet_name="Tabl. 1", skiprows=6)
-    child_rows = df[df["Grupa wieku   Age group"].isin(["0-9", "10-19", "Ogółem Total"])]
-    year_cols = [c for c in child_rows.columns if isinstance(c, (int, float)) or str(c).startswith("202")]
-    melted = child_rows.melt(
-        id_vars=["Grupa wieku   Age group"], value_vars=year_cols, var_name="rok", value_name="liczba"
+def load_miasto(teryt: str = MIASTO_TERYT, jednostka: str = "Miasto Racibórz", base: Path = BASE_DIR):
+    # Dane z pliku gminnego (zakres 0-9, 10-19) i 0-17 z Tabl. 2 – skoroszyt otwierany raz, blok "Ogółem"
+    tables = gus_source.read_tables(
+        teryt, ("Tabl. 1", "Tabl. 2"), bloki=("ogolem",), wiek=("Ogółem Total", "0-9", "10-19", "0-17"), base=base
     )
-    melted["rok"] = melted["rok"].replace({"2022*": 2022})
-    melted = melted[melted["liczba"].notna()]
-    melted["rok"] = melted["rok"].astype(int)
+    tabl1 = tables["Tabl. 1"]
+    melted = _long(tabl1["lata"], *tabl1["bloki"]["ogolem"])
+
     # Mapowanie na nasze grupy (uwaga: brak rozbicia na 0-2 i 3-6)
     def map_group(label: str) -> str:
         if label == "0-9":
@@ -70,34 +95,26 @@ def load_miasto():
             return "ogolem"
         return label
 
-    melted["grupa"] = melted["Grupa wieku   Age group"].apply(map_group)
-    melted["jednostka"] = "Miasto Racibórz"
+    melted["grupa"] = melted["etykieta"].apply(map_group)
+    melted["jednostka"] = jednostka
     melted["typ"] = "gmina"
     melted["uwaga"] = "Dane dostępne tylko w grupach 0-9 i 10-19 (Tabl.1 prognoza gmin 2023-2040)"
 
     # Dodaj 0-17 z Tabl. 2 (bliżej definicji wieku szkolnego)
-    df2 = pd.read_excel(MIASTO_FILE, sheet_name="Tabl. 2", skiprows=6)
-    row_0_17 = df2[df2["Grupa wieku   Age group"] == "0-17"]
-    if not row_0_17.empty:
-        melted_0_17 = row_0_17.melt(
-            id_vars=["Grupa wieku   Age group"],
-            value_vars=[c for c in row_0_17.columns if isinstance(c, (int, float)) or str(c).startswith("202")],
-            var_name="rok",
-            value_name="liczba",
-        )
-        melted_0_17 = melted_0_17[melted_0_17["liczba"].notna()]
-        melted_0_17["rok"] = melted_0_17["rok"].replace({"2022*": 2022})
-        melted_0_17["rok"] = melted_0_17["rok"].astype(int)
+    tabl2 = tables["Tabl. 2"]
+    melted_0_17 = _long(tabl2["lata"], *tabl2["bloki"]["ogolem"])
+    melted_0_17 = melted_0_17[melted_0_17["etykieta"] == "0-17"]
+    if not melted_0_17.empty:
         melted_0_17["grupa"] = "dzieci_0_17 (brak rozbicia na 0-2/3-6/7-17)"
-        melted_0_17["jednostka"] = "Miasto Racibórz"
+        melted_0_17["jednostka"] = jednostka
         melted_0_17["typ"] = "gmina"
         melted_0_17["uwaga"] = "Zakres 0-17 z Tabl.2 (prognoza gmin 2023-2040)"
         melted = pd.concat([melted, melted_0_17], ignore_index=True)
 
     # (opcjonalnie) uzupełnij danymi z tablicy zbiorczej jeśli potrzebne
     try:
-        zb = pd.read_excel(TABLICA_ZBIORCZA, sheet_name="Tabela zbiorcza")
-        zb_rac = zb[(zb["Kod_TERYT"] == 2411011) & (zb["Płeć"] == "Ogółem") & (zb["Wiek"] == "0-17")]
+        zb = gus_source.read_summary_rows(TABLICA_ZBIORCZA, int(teryt))
+        zb_rac = zb[(zb["Płeć"] == "Ogółem") & (zb["Wiek"] == "0-17")]
         if not zb_rac.empty:
             zb_melt = zb_rac.melt(
                 id_vars=["Wiek"], value_vars=[c for c in zb_rac.columns if isinstance(c, (int, float)) or str(c).startswith("202")],
@@ -105,7 +122,7 @@ def load_miasto():
             )
             zb_melt["rok"] = zb_melt["rok"].astype(int)
             zb_melt["grupa"] = "dzieci_0_17 (tablica zbiorcza)"
-            zb_melt["jednostka"] = "Miasto Racibórz"
+            zb_melt["jednostka"] = jednostka
             zb_melt["typ"] = "gmina"
             zb_melt["uwaga"] = "Dane z tablicy zbiorczej gmin (0-17)"
             melted = pd.concat([melted, zb_melt], ignore_index=True)
@@ -115,22 +132,22 @@ def load_miasto():
     return melted[["jednostka", "typ", "rok", "grupa", "liczba", "uwaga"]]
 
 
-def main():
-    powiat = load_powiat()
-    miasto = load_miasto()
-
+def write_demografia(powiat: pd.DataFrame, miasto: pd.DataFrame, path: Path = OUTPUT_XLSX):
     # Zbiorcza tabela (long)
     combined = pd.concat([powiat, miasto], ignore_index=True)
     combined = combined[
         ["jednostka", "typ", "rok", "grupa", "liczba", "uwaga"]
     ].sort_values(["jednostka", "rok", "grupa"])
 
-    OUTPUT_XLSX.parent.mkdir(parents=True, exist_ok=True)
-    with pd.ExcelWriter(OUTPUT_XLSX, engine="openpyxl") as writer:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with instrumentation.span("zapis.xlsx", plik=path), pd.ExcelWriter(path, engine="openpyxl") as writer:
         powiat.to_excel(writer, sheet_name="powiat_raciborski", index=False)
         miasto.to_excel(writer, sheet_name="miasto_raciborz", index=False)
         combined.to_excel(writer, sheet_name="zestawienie", index=False)
 
+
+def main():
+    write_demografia(load_powiat(), load_miasto())
     print(f"Zapisano {OUTPUT_XLSX}")
 
 
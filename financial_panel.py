@@ -0,0 +1,220 @@
+"""
+Wieloletni panel finansowy placówka × rok z przyrostowym zasilaniem (tylko dopisywanie):
+- każdy PDF RZiS wczytywany raz: pozycje zestawienia (bieżący i poprzedni rok) trafiają do
+  cache/panel_rzis/rok=<rok>/<sha256>-<placówka>.parquet, a wpis do rejestru manifest.jsonl;
+  plik o znanym skrócie (dla tej samej placówki) jest pomijany, więc dodanie sprawozdań 2025 czyta tylko
+  nowe PDF-y; po zmianie parsera lub silnika OCR znane pliki są wczytywane ponownie i podmieniane,
+- poprawiony PDF za ten sam rok jest dopisywany obok – w panelu obowiązuje najnowszy wpis,
+- walidacja krzyżowa: kolumna "rok poprzedni" sprawozdania N vs kolumna "rok bieżący" sprawozdania N-1,
+- rok N-1 bez własnego sprawozdania uzupełniany z kolumny "rok poprzedni" sprawozdania N,
+- zmiany r/r i CAGR liczone wektorowo na tablicy (placówka, pozycja) × rok.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import analyze_financials
+import build_state
+import text_layer
+
+PANEL_DIR = Path("cache/panel_rzis")
+MANIFEST = PANEL_DIR / "manifest.jsonl"
+OUT_XLSX = Path("raporty/panel_finansowy.xlsx")
+# tolerancja walidacji krzyżowej (PLN) – zaokrąglenia groszowe w sprawozdaniach
+TOLERANCJA = 0.01
+
+
+def read_manifest() -> List[dict]:
+    if not MANIFEST.exists():
+        return []
+    with open(MANIFEST, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def statement_frame(pdf_path: str, rok: int, digest: str, rows: List[Dict[str, Optional[float]]]) -> pd.DataFrame:
+    """Pozycje zestawienia jednego sprawozdania w długim formacie (rok bieżący i poprzedni obok siebie)."""
+    placowka = analyze_financials.normalize_name_from_dir(str(Path(pdf_path).parent))
+    current = analyze_financials.build_summary(rows)
+    previous = analyze_financials.build_summary(rows, "prev_year")
+    return pd.DataFrame(
+        {
+            "placowka": placowka,
+            "rok": rok,
+            "pozycja": list(current),
+            "current_year": pd.array(list(current.values()), dtype="Float64"),
+            "prev_year": pd.array(list(previous.values()), dtype="Float64"),
+            "sha256": digest,
+        }
+    )
+
+
+def parser_version() -> str:
+    """Wersja odczytu RZiS: kod parsera + triage/OCR (jak klucz pipeline._rzis_key)."""
+    return f"{build_state.module_hash('analyze_financials')[:16]}-{text_layer.version()}"
+
+
+def _write_manifest(entries: List[dict]):
+    tmp = MANIFEST.with_name(f".{MANIFEST.name}.{os.getpid()}.tmp")
+    tmp.write_text("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries), encoding="utf-8")
+    os.replace(tmp, MANIFEST)
+
+
+def ingest(pdf_files: Optional[List[str]] = None, parse=analyze_financials.parse_rzis_pdf) -> List[str]:
+    """
+    Dopisz do panelu sprawozdania, których (skrótu, placówki) nie ma w rejestrze; sprawozdania wczytane
+    inną wersją parsera (np. skan sprzed instalacji OCR) są wczytywane ponownie, a ich wpis i plik Parquet
+    podmieniane w miejscu (kolejność rejestru – a więc "najnowszy wpis" – się nie zmienia).
+    Skróty PDF-ów przez build_state.stamped_hash – znane pliki o niezmienionym rozmiarze i mtime nie są czytane.
+    Zwraca wczytane pliki.
+    """
+    files = pdf_files if pdf_files is not None else analyze_financials.collect_rzis_files(rok=None)
+    stamps = build_state.load_stamps()
+    entries = read_manifest()
+    known = {(entry["sha256"], entry["placowka"]): i for i, entry in enumerate(entries)}
+    wersja = parser_version()
+    added = []
+    for pdf_path in files:
+        rok = analyze_financials.statement_year(pdf_path)
+        if rok is None:
+            continue
+        digest = build_state.stamped_hash(Path(pdf_path), stamps)
+        placowka = analyze_financials.normalize_name_from_dir(str(Path(pdf_path).parent))
+        i = known.get((digest, placowka))
+        if i is not None and entries[i].get("parser") == wersja:
+            continue
+        frame = statement_frame(pdf_path, rok, digest, parse(pdf_path))
+        # te same bajty pod dwiema placówkami = dwa wpisy
+        out = PANEL_DIR / f"rok={rok}" / f"{digest[:16]}-{build_state.digest(placowka)[:8]}.parquet"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(f".{out.name}.{os.getpid()}.tmp")
+        frame.to_parquet(tmp, index=False)
+        os.replace(tmp, out)
+        entry = {
+            "sha256": digest,
+            "plik": str(pdf_path),
+            "placowka": placowka,
+            "rok": rok,
+            "parquet": str(out),
+            "parser": wersja,
+            "wczytano": datetime.now().isoformat(timespec="seconds"),
+        }
+        if i is None:
+            known[(digest, placowka)] = len(entries)
+            entries.append(entry)
+        else:
+            if entries[i]["parquet"] != str(out):
+                Path(entries[i]["parquet"]).unlink(missing_ok=True)
+            entries[i] = entry
+        added.append(pdf_path)
+    if added:
+        _write_manifest(entries)
+    build_state.save_stamps(stamps)
+    return added
+
+
+def load_statements() -> pd.DataFrame:
+    """Aktualne sprawozdania: dla każdej pary (placówka, rok) najnowszy wpis rejestru."""
+    manifest = pd.DataFrame(read_manifest())
+    if manifest.empty:
+        return pd.DataFrame(columns=["placowka", "rok", "pozycja", "current_year", "prev_year", "sha256"])
+    latest = manifest.drop_duplicates(["placowka", "rok"], keep="last")
+    return pd.concat([pd.read_parquet(path) for path in latest["parquet"]], ignore_index=True)
+
+
+def cross_validate(statements: pd.DataFrame, tolerance: float = TOLERANCJA) -> pd.DataFrame:
+    """Rozbieżności: "rok poprzedni" ze sprawozdania N vs "rok bieżący" ze sprawozdania N-1 (join wektorowy)."""
+    prev = statements[["placowka", "rok", "pozycja", "prev_year"]].assign(rok=lambda d: d["rok"] - 1)
+    curr = statements[["placowka", "rok", "pozycja", "current_year"]]
+    joined = prev.merge(curr, on=["placowka", "rok", "pozycja"], how="inner")
+    joined["roznica"] = joined["prev_year"] - joined["current_year"]
+    mismatch = joined["roznica"].abs().gt(tolerance) | (joined["prev_year"].isna() != joined["current_year"].isna())
+    out = joined[mismatch.fillna(False)].rename(
+        columns={"prev_year": "w_sprawozdaniu_nastepnym", "current_year": "w_sprawozdaniu_za_rok"}
+    )
+    return out.sort_values(["placowka", "rok", "pozycja"]).reset_index(drop=True)
+
+
+def panel_values(statements: pd.DataFrame) -> pd.DataFrame:
+    """
+    Długi panel (placowka, pozycja, rok, wartosc, zrodlo): wartość z własnego sprawozdania za rok,
+    a dla lat bez sprawozdania – z kolumny "rok poprzedni" sprawozdania z roku następnego.
+    """
+    own = statements[["placowka", "pozycja", "rok", "current_year"]].rename(columns={"current_year": "wartosc"})
+    own = own.assign(zrodlo="sprawozdanie")
+    derived = statements[["placowka", "pozycja", "rok", "prev_year"]].rename(columns={"prev_year": "wartosc"})
+    derived = derived.assign(rok=derived["rok"] - 1, zrodlo="rok_poprzedni_w_nastepnym")
+    panel = pd.concat([own, derived], ignore_index=True)
+    # własne sprawozdanie ma pierwszeństwo przed wartością z roku następnego
+    return panel.drop_duplicates(["placowka", "pozycja", "rok"], keep="first").sort_values(["placowka", "pozycja", "rok"])
+
+
+def growth(panel: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Zmiany r/r (kwotowe i %) oraz CAGR – wektorowo na tablicy (placówka, pozycja) × rok."""
+    wide = panel.pivot_table(index=["placowka", "pozycja"], columns="rok", values="wartosc", aggfunc="first", dropna=False)
+    if wide.columns.empty:
+        # pusty rejestr albo żaden rok nieodczytany z nazwy pliku – puste arkusze zamiast int(nan)
+        empty = pd.DataFrame(columns=["placowka", "pozycja"])
+        cagr_columns = ["placowka", "pozycja", "rok_od", "rok_do", "wartosc_od", "wartosc_do", "cagr"]
+        return {"wartosci": empty, "zmiana_rr": empty, "zmiana_rr_proc": empty, "cagr": pd.DataFrame(columns=cagr_columns)}
+    wide = wide.reindex(columns=range(int(wide.columns.min()), int(wide.columns.max()) + 1)).astype(float)
+    values = wide.to_numpy()
+    prev = np.roll(values, 1, axis=1)
+    prev[:, 0] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        yoy_pct = np.where(np.abs(prev) > 0, (values - prev) / np.abs(prev), np.nan)
+
+    # CAGR między pierwszym i ostatnim dostępnym rokiem wiersza (tylko wartości dodatnie na obu końcach)
+    years = wide.columns.to_numpy()
+    valid = ~np.isnan(values)
+    has_any = valid.any(axis=1)
+    first = np.where(has_any, valid.argmax(axis=1), 0)
+    last = np.where(has_any, values.shape[1] - 1 - valid[:, ::-1].argmax(axis=1), 0)
+    rows = np.arange(len(values))
+    start, end = values[rows, first], values[rows, last]
+    span = (years[last] - years[first]).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = np.where((span > 0) & (start > 0) & (end > 0), (end / start) ** (1 / span) - 1, np.nan)
+
+    cagr_df = pd.DataFrame(
+        {"rok_od": years[first], "rok_do": years[last], "wartosc_od": start, "wartosc_do": end, "cagr": cagr},
+        index=wide.index,
+    )
+    cagr_df.loc[~has_any, ["rok_od", "rok_do"]] = np.nan
+    return {
+        "wartosci": wide.reset_index(),
+        "zmiana_rr": pd.DataFrame(values - prev, index=wide.index, columns=wide.columns).reset_index(),
+        "zmiana_rr_proc": pd.DataFrame(yoy_pct, index=wide.index, columns=wide.columns).reset_index(),
+        "cagr": cagr_df.reset_index(),
+    }
+
+
+def build_panel() -> Dict[str, pd.DataFrame]:
+    statements = load_statements()
+    panel = panel_values(statements)
+    return {"panel": panel.reset_index(drop=True), **growth(panel), "walidacja": cross_validate(statements)}
+
+
+def write_panel(tables: Dict[str, pd.DataFrame], path: Path = OUT_XLSX):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for sheet_name, df in tables.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def main():
+    added = ingest()
+    print(f"Wczytano nowych sprawozdań: {len(added)} (rejestr: {MANIFEST})")
+    tables = build_panel()
+    write_panel(tables)
+    print(f"Rozbieżności rok poprzedni vs bieżący: {len(tables['walidacja'])}")
+    print(f"Zapisano {OUT_XLSX}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+"""
+Skrypt zgodności dla raport_finansowy_2024.xlsx zapisanych starszą wersją analyze_financials.py (sprzed
+zapisu xlsxwriter): formuły/formaty koszt_na_ucznia, pivot per placówka i wykresy. Nowe raporty mają to
+od razu; potok i inne moduły z tego skryptu nie korzystają.
+"""
+
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment
@@ -0,0 +1,255 @@
+"""
+Warstwa źródłowa prognoz GUS (pobrane/GUS):
+- skoroszyty czytane bezpośrednio z archiwów .zip (strumień w pamięci, bez rozpakowywania),
+- nazwy plików w archiwach GUS są w CP852 bez flagi UTF-8 – dekodujemy je poprawnie
+  (to samo dotyczy katalogów już rozpakowanych, np. '24 ÿlÑskie' -> '24 śląskie'),
+- wyszukiwanie jednostki po kodzie TERYT (2 cyfry: województwo, 4: powiat, 7: gmina) i wariancie,
+- strumieniowy odczyt tablic 'Tabl. N' (iterparse XML arkusza, bez stylów i obiektów komórek openpyxl):
+  skoroszyt otwierany raz, tylko potrzebne arkusze, wczesne filtrowanie bloków płci i etykiet wieku,
+  przerwanie odczytu po ostatnim potrzebnym bloku, wynik jako tablice NumPy.
+Rozpakowane katalogi są obsługiwane tylko jako uzupełnienie: plik z archiwum ma pierwszeństwo.
+"""
+
+import io
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+BASE_DIR = Path("pobrane/GUS")
+WARIANTY = ("bazowy", "niski", "wysoki")
+BLOKI = {"ogółem": "ogolem", "mężczyźni": "mezczyzni", "kobiety": "kobiety"}
+
+# (archiwum .zip albo None dla pliku na dysku, nazwa członka / ścieżka, zdekodowana ścieżka)
+Entry = Tuple[Optional[Path], str, str]
+
+
+def fix_name(name: str) -> str:
+    """Napraw nazwę zapisaną w CP852, a odczytaną jako CP437 (mojibake GUS)."""
+    try:
+        return name.encode("cp437").decode("cp852")
+    except UnicodeError:
+        return name
+
+
+def _member_name(info: zipfile.ZipInfo) -> str:
+    # bit 11 = nazwa w UTF-8; bez niego zipfile dekoduje jako CP437
+    return info.filename if info.flag_bits & 0x800 else fix_name(info.filename)
+
+
+def _classify(decoded: str) -> Optional[Tuple[str, str]]:
+    """(wariant, TERYT) dla ścieżki skoroszytu jednostki albo None."""
+    match = re.match(r"(\d{2}|\d{4}|\d{7}) ", Path(decoded).name)
+    if not match or not decoded.lower().endswith(".xlsx"):
+        return None
+    lowered = decoded.lower()
+    wariant = next((w for w in ("niski", "wysoki") if f"/{w}/" in lowered), "bazowy")
+    return wariant, match.group(1)
+
+
+@lru_cache(maxsize=None)
+def build_index(base: Path = BASE_DIR) -> Dict[Tuple[str, str], Entry]:
+    """Indeks (wariant, TERYT) -> położenie skoroszytu: najpierw archiwa, potem pliki rozpakowane."""
+    index: Dict[Tuple[str, str], Entry] = {}
+    for archive in sorted(base.rglob("*.zip")):
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                decoded = f"{archive.stem}/{_member_name(info)}"
+                key = _classify(decoded)
+                if key and key not in index:
+                    index[key] = (archive, info.filename, decoded)
+    for path in sorted(base.rglob("*.xlsx")):
+        decoded = fix_name(path.relative_to(base).as_posix())
+        key = _classify(decoded)
+        if key and key not in index:
+            index[key] = (None, str(path), decoded)
+    return index
+
+
+def find(teryt: str, wariant: str = "bazowy", base: Path = BASE_DIR) -> Entry:
+    entry = build_index(base).get((wariant, str(teryt)))
+    if entry is None:
+        raise FileNotFoundError(f"Brak prognozy GUS dla TERYT {teryt} (wariant {wariant}) w {base}")
+    return entry
+
+
+def open_workbook(teryt: str, wariant: str = "bazowy", base: Path = BASE_DIR) -> BinaryIO:
+    """Strumień skoroszytu jednostki (z archiwum – w pamięci, bez zapisu na dysk)."""
+    archive, member, _ = find(teryt, wariant, base)
+    if archive is None:
+        return open(member, "rb")
+    with zipfile.ZipFile(archive) as zf:
+        return io.BytesIO(zf.read(member))
+
+
+def unit_name(teryt: str, wariant: str = "bazowy", base: Path = BASE_DIR) -> str:
+    """Nazwa jednostki z nazwy pliku, np. '2411' -> 'raciborski'."""
+    return Path(find(teryt, wariant, base)[2]).stem.split(" ", 1)[1]
+
+
+def read_excel(teryt: str, sheet_name="Tabl. 1", wariant: str = "bazowy", base: Path = BASE_DIR, **kwargs):
+    """pd.read_excel dla skoroszytu jednostki wskazanej kodem TERYT."""
+    with open_workbook(teryt, wariant, base) as stream:
+        return pd.read_excel(stream, sheet_name=sheet_name, **kwargs)
+
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def _sheet_paths(zf: zipfile.ZipFile) -> Dict[str, str]:
+    """Nazwa arkusza -> ścieżka XML w paczce xlsx."""
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+    paths = {}
+    for sheet in ET.fromstring(zf.read("xl/workbook.xml")).iter(f"{_NS}sheet"):
+        target = targets[sheet.get(f"{_REL_NS}id")]
+        paths[sheet.get("name")] = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+    return paths
+
+
+def _shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    root = ET.fromstring(zf.read("xl/sharedStrings.xml"))
+    return ["".join(t.text or "" for t in si.iter(f"{_NS}t")) for si in root.iter(f"{_NS}si")]
+
+
+def _column(ref: str) -> int:
+    idx = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        idx = idx * 26 + ord(ch.upper()) - 64
+    return idx - 1
+
+
+def iter_rows(zf: zipfile.ZipFile, sheet: str, strings: List[str]) -> Iterator[tuple]:
+    """Wiersze arkusza jako krotki wartości (float/str/None), czytane strumieniowo z XML."""
+    with zf.open(_sheet_paths(zf)[sheet]) as xml:
+        for _, elem in ET.iterparse(xml):
+            if elem.tag != f"{_NS}row":
+                continue
+            cells = {}
+            for c in elem.iter(f"{_NS}c"):
+                kind = c.get("t")
+                if kind == "inlineStr":
+                    value = "".join(t.text or "" for t in c.iter(f"{_NS}t"))
+                else:
+                    v = c.find(f"{_NS}v")
+                    if v is None or v.text is None:
+                        continue
+                    value = strings[int(v.text)] if kind == "s" else v.text if kind in ("str", "e") else float(v.text)
+                cells[_column(c.get("r"))] = value
+            elem.clear()
+            width = max(cells) + 1 if cells else 1
+            yield tuple(cells.get(i) for i in range(width))
+
+
+def _label(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value is not None else ""
+
+
+def _block_key(value) -> Optional[str]:
+    text = _label(value).lower()
+    return next((key for prefix, key in BLOKI.items() if text.startswith(prefix)), None)
+
+
+def _year(value) -> Optional[int]:
+    match = re.match(r"\s*(\d{4})", _label(value))
+    return int(match.group(1)) if match else None
+
+
+def _stream_sheet(rows_iter: Iterator[tuple], bloki: Optional[Iterable[str]], wiek: Optional[Iterable[str]]) -> dict:
+    """Przejdź wiersze arkusza raz; zatrzymaj się, gdy wszystkie żądane bloki są już wczytane."""
+    wanted = set(bloki) if bloki is not None else set(BLOKI.values())
+    labels_wanted = {str(w) for w in wiek} if wiek is not None else None
+    years: List[int] = []
+    year_cols = slice(2, 2)
+    rows: Dict[str, Tuple[List[str], List[tuple]]] = {}
+    block = None
+    for row in rows_iter:
+        row = row + (None,) * max(0, 2 - len(row))
+        if not years:
+            if _label(row[0]).startswith("Płeć"):
+                found = [(i, _year(v)) for i, v in enumerate(row) if i >= 2 and _year(v)]
+                years = [y for _, y in found]
+                year_cols = slice(found[0][0], found[-1][0] + 1)
+            continue
+        if _label(row[0]):
+            # nowy blok (albo przypisy pod tabelą): po ostatnim żądanym bloku nie czytamy dalej
+            if wanted <= set(rows):
+                break
+            block = _block_key(row[0])
+            if block in wanted:
+                rows[block] = ([], [])
+        if block not in rows:
+            continue
+        label = _label(row[1])
+        if not label or (labels_wanted is not None and label not in labels_wanted):
+            continue
+        rows[block][0].append(label)
+        values = row[year_cols]
+        rows[block][1].append(values + (None,) * (len(years) - len(values)))
+    bloki_out = {
+        key: (labels, np.array(values, dtype=float).reshape(len(labels), len(years)))
+        for key, (labels, values) in rows.items()
+    }
+    return {"lata": np.array(years, dtype=int), "bloki": bloki_out}
+
+
+def read_tables(
+    teryt: str,
+    sheets: Iterable[str] = ("Tabl. 1",),
+    wariant: str = "bazowy",
+    bloki: Optional[Iterable[str]] = None,
+    wiek: Optional[Iterable[str]] = None,
+    base: Path = BASE_DIR,
+) -> Dict[str, dict]:
+    """
+    Tablice ludności GUS jednostki jako NumPy: {arkusz: {"lata": (Y,), "bloki": {blok: (etykiety, (N, Y))}}}.
+    bloki: podzbiór ("ogolem", "mezczyzni", "kobiety"); wiek: etykiety wierszy do zachowania
+    (np. {"0", "1", "90+", "Ogółem Total"} albo {"0-9", "0-17"}); pozostałe wiersze są pomijane w trakcie odczytu.
+    """
+    instrumentation.count("gus.skoroszyty")
+    with instrumentation.span("gus.read_tables", teryt=teryt, wariant=wariant), open_workbook(
+        teryt, wariant, base
+    ) as stream, zipfile.ZipFile(stream) as zf:
+        strings = _shared_strings(zf)
+        return {sheet: _stream_sheet(iter_rows(zf, sheet, strings), bloki, wiek) for sheet in sheets}
+
+
+def read_summary_rows(path: Path, kod: int, sheet_name: str = "Tabela zbiorcza", column: str = "Kod_TERYT") -> pd.DataFrame:
+    """Wiersze tablicy zbiorczej dla jednego kodu TERYT (strumieniowo, bez wczytywania całego arkusza)."""
+    with zipfile.ZipFile(path) as zf:
+        rows = iter_rows(zf, sheet_name, _shared_strings(zf))
+        header = [_label(v) for v in next(rows)]
+        idx = header.index(column)
+        matched = [row + (None,) * (len(header) - len(row)) for row in rows if len(row) > idx and _label(row[idx]) == str(kod)]
+    df = pd.DataFrame(matched, columns=header)
+    # nagłówki lat są liczbami (2023, 2024, ...) – jak w pd.read_excel
+    return df.rename(columns={h: int(h) for h in header if h.isdigit()})
+
+
+def main():
+    index = build_index()
+    for wariant in WARIANTY:
+        keys = [t for w, t in index if w == wariant]
+        counts = {n: sum(len(t) == n for t in keys) for n in (2, 4, 7)}
+        print(f"{wariant}: województwa {counts[2]}, powiaty {counts[4]}, gminy {counts[7]}")
+    archived = sum(1 for archive, _, _ in index.values() if archive is not None)
+    print(f"Z archiwów zip: {archived} z {len(index)} skoroszytów")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Pomiary etapów przetwarzania (domyślnie wyłączone – wtedy span() i count() nic nie robią):
+- span(nazwa, **argumenty): mierzony odcinek (etap, plik, strona); zagnieżdżenia widoczne w przeglądarce śladów,
+- count(licznik, n): liczniki (strony, tabele, wiersze, trafienia/chybienia cache),
+- pamięć: RSS na końcu każdego odcinka i szczyt (VmHWM / ru_maxrss) per proces,
+- zapis w formacie Trace Event (JSON) – do otwarcia w chrome://tracing lub https://ui.perfetto.dev,
+- profiled(nazwa): cProfile wokół wybranego etapu (--profile) -> cache/profile/<nazwa>.prof + najdroższe funkcje.
+Włączenie: enable(ścieżka, profile) albo zmienne środowiskowe SPRAWOZDANIA_TRACE / SPRAWOZDANIA_PROFILE
+(dowolny skrypt: SPRAWOZDANIA_TRACE=cache/trace.json python analyze_financials.py). Procesy potomne (pule
+procesów potoku i prezentacji) dziedziczą zmienne i dopisują swoje zdarzenia do pliku głównego przy zakończeniu.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from multiprocessing import util
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+TRACE_ENV = "SPRAWOZDANIA_TRACE"
+TRACE_PID_ENV = "SPRAWOZDANIA_TRACE_PID"  # proces, który włączył ślad (pozostałe to procesy potomne)
+PROFILE_ENV = "SPRAWOZDANIA_PROFILE"
+PROFILE_DIR = Path("cache/profile")
+TOP_FUNKCJE = 20
+
+_NIC = nullcontext()  # zwracany przy wyłączonych pomiarach – brak alokacji na gorącej ścieżce
+
+
+def rss_kb(pole: str = "VmRSS") -> Optional[int]:
+    """VmRSS / VmHWM bieżącego procesu w kB (None bez /proc)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(pole + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def peak_rss_kb() -> int:
+    """Szczyt RSS procesu w kB: VmHWM, a bez /proc – ru_maxrss."""
+    hwm = rss_kb("VmHWM")
+    if hwm is not None:
+        return hwm
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class Recorder:
+    """Zdarzenia i liczniki jednego procesu; proces główny scala pliki procesów potomnych w finish()."""
+
+    def __init__(self, path: Path, glowny: bool = True):
+        self.path = Path(path)
+        self.glowny = glowny
+        self.pid = os.getpid()
+        self.events: List[dict] = []
+        self.counters: Counter = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def parts_dir(self) -> Path:
+        return self.path.with_name(self.path.name + ".procesy")
+
+    def add(self, event: dict):
+        with self.lock:
+            self.events.append(event)
+
+    def process_events(self) -> List[dict]:
+        """Zdarzenia procesu + nazwa procesu, liczniki i szczyt pamięci (zdarzenia 'M' i 'C')."""
+        now = time.perf_counter_ns() // 1000
+        name = "główny" if self.glowny else f"proces {self.pid}"
+        meta = [
+            {"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": name}},
+            {"name": "pamiec", "ph": "C", "pid": self.pid, "tid": 0, "ts": now, "args": {"szczyt_mb": round(peak_rss_kb() / 1024, 1)}},
+        ]
+        if self.counters:
+            meta.append({"name": "liczniki", "ph": "C", "pid": self.pid, "tid": 0, "ts": now, "args": dict(self.counters)})
+        return meta + self.events
+
+    def flush_part(self):
+        """Proces potomny: zdarzenia do <ślad>.procesy/<pid>.json (scalane przez proces główny)."""
+        if not self.events and not self.counters:
+            return
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        part = self.parts_dir / f"{self.pid}.json"
+        part.write_text(json.dumps(self.process_events(), ensure_ascii=False), encoding="utf-8")
+
+    def finish(self) -> Path:
+        """Proces główny: scal zdarzenia wszystkich procesów w jeden plik Trace Event i wypisz podsumowanie."""
+        events = self.process_events()
+        if self.parts_dir.exists():
+            for part in sorted(self.parts_dir.glob("*.json")):
+                events.extend(json.loads(part.read_text(encoding="utf-8")))
+                part.unlink()
+            self.parts_dir.rmdir()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"traceEvents": events, "displayTimeUnit": "ms", "otherData": summary(events)}
+        self.path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        print_summary(payload["otherData"])
+        print(f"Zapisano ślad: {self.path}")
+        return self.path
+
+
+def summary(events: Iterable[dict]) -> dict:
+    """Łączny czas odcinków wg nazwy, sumy liczników i szczyt pamięci ze wszystkich procesów."""
+    czasy: Dict[str, dict] = {}
+    liczniki: Counter = Counter()
+    szczyt = 0.0
+    for e in events:
+        if e["ph"] == "X":
+            entry = czasy.setdefault(e["name"], {"liczba": 0, "czas_s": 0.0})
+            entry["liczba"] += 1
+            entry["czas_s"] += e["dur"] / 1e6
+        elif e["ph"] == "C" and e["name"] == "liczniki":
+            liczniki.update(e["args"])
+        elif e["ph"] == "C" and e["name"] == "pamiec":
+            szczyt = max(szczyt, e["args"]["szczyt_mb"])
+    czasy = dict(sorted(czasy.items(), key=lambda kv: -kv[1]["czas_s"]))
+    return {"odcinki": czasy, "liczniki": dict(liczniki), "szczyt_rss_mb": szczyt}
+
+
+def print_summary(podsumowanie: dict, top: int = 15):
+    for nazwa, entry in list(podsumowanie["odcinki"].items())[:top]:
+        print(f"  {entry['czas_s']:8.2f} s  {entry['liczba']:5d}×  {nazwa}")
+    if podsumowanie["liczniki"]:
+        print("  liczniki: " + ", ".join(f"{k}={v}" for k, v in sorted(podsumowanie["liczniki"].items())))
+    print(f"  szczyt RSS: {podsumowanie['szczyt_rss_mb']:.0f} MB (największy proces)")
+
+
+_recorder: Optional[Recorder] = None
+_profile: frozenset = frozenset()
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+@contextmanager
+def _span(name: str, args: dict):
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        rss = rss_kb()
+        if rss is not None:
+            args["rss_mb"] = round(rss / 1024, 1)
+        _recorder.add(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start // 1000,
+                "dur": (end - start) // 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+def span(name: str, **args):
+    """Mierzony odcinek: `with span("strona", nr=3): ...`; przy wyłączonych pomiarach – pusty kontekst."""
+    if _recorder is None:
+        return _NIC
+    return _span(name, {k: str(v) if isinstance(v, Path) else v for k, v in args.items()})
+
+
+def count(name: str, n: int = 1):
+    """Zwiększ licznik (np. strony, wiersze, cache trafienia/chybienia); bez pomiarów – nic."""
+    if _recorder is not None:
+        _recorder.counters[name] += n
+
+
+@contextmanager
+def _profiled(name: str):
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"{name}.prof"
+        profiler.dump_stats(path)
+        print(f"Profil {name}: {path} (najdroższe funkcje wg czasu łącznego)")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(TOP_FUNKCJE)
+
+
+def profiled(name: str):
+    """cProfile wokół etapu, gdy jego nazwa jest na liście --profile (albo lista zawiera 'wszystkie')."""
+    if name not in _profile and "wszystkie" not in _profile:
+        return _NIC
+    return _profiled(name)
+
+
+def enable(trace: Optional[Path] = None, profile: Iterable[str] = ()):
+    """Włącz ślad (plik Trace Event) i/lub profilowanie etapów; ustawienia przechodzą do procesów potomnych."""
+    global _recorder, _profile
+    if profile:
+        _profile = frozenset(profile)
+        os.environ[PROFILE_ENV] = ",".join(sorted(_profile))
+    if trace is not None and _recorder is None:
+        _recorder = Recorder(Path(trace))
+        os.environ[TRACE_ENV] = str(trace)
+        os.environ[TRACE_PID_ENV] = str(os.getpid())
+        atexit.register(finish)
+
+
+def finish() -> Optional[Path]:
+    """Zapisz ślad (proces główny; wywoływane też przy wyjściu) i wyłącz pomiary."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is None:
+        return None
+    os.environ.pop(TRACE_ENV, None)
+    os.environ.pop(TRACE_PID_ENV, None)
+    return recorder.finish()
+
+
+def _child_recorder():
+    """Proces potomny (pula procesów): własny rejestrator zapisywany przy zakończeniu procesu."""
+    global _recorder
+    _recorder = Recorder(Path(os.environ[TRACE_ENV]), glowny=False)
+    # Finalize z priorytetem działa przy wyjściu procesu roboczego (atexit nie jest wywoływany po fork)
+    util.Finalize(None, _recorder.flush_part, exitpriority=10)
+
+
+def _after_fork(_module):
+    # proces puli po fork dziedziczy zdarzenia rodzica – zaczyna od pustego rejestratora
+    # (wywoływane przez multiprocessing po wyczyszczeniu finalizatorów odziedziczonych po rodzicu)
+    if _recorder is not None:
+        _child_recorder()
+
+
+util.register_after_fork(sys.modules[__name__], _after_fork)
+
+if os.environ.get(PROFILE_ENV):
+    _profile = frozenset(os.environ[PROFILE_ENV].split(","))
+if os.environ.get(TRACE_ENV):
+    if os.environ.get(TRACE_PID_ENV, str(os.getpid())) == str(os.getpid()):
+        enable(Path(os.environ[TRACE_ENV]))
+    else:
+        _child_recorder()
@@ -0,0 +1,570 @@
+"""
+Parsowanie RZiS całego korpusu (tysiące PDF-ów) kolejką zadań na wspólnym dysku:
+- kolejka: SQLite w katalogu kolejki (domyślnie cache/kolejka_rzis; dla kilku maszyn – katalog na wspólnym
+  dysku, ścieżki PDF-ów muszą być takie same na każdej maszynie). Tryb dziennika DELETE, a nie WAL – WAL
+  wymaga pamięci współdzielonej jednego hosta,
+- dowolna liczba procesów roboczych (na jednej lub kilku maszynach) przejmuje zadania paczkami w jednej
+  transakcji (BEGIN IMMEDIATE), więc dwa procesy nie dostaną tego samego pliku,
+- proces roboczy co HEARTBEAT_S odświeża znacznik życia swoich zadań; zadanie bez znacznika przez LEASE_S
+  (proces zabity, maszyna padła) wraca do puli i przejmuje je inny proces; po MAX_PROB przejęciach
+  albo błędach parsowania zadanie kończy się stanem blad (uszkodzony PDF nie zatrzymuje całej kolejki),
+- wyniki: jeden plik JSON na PDF (wyniki/<skrót ścieżki>.json, zapis atomowy) z rozmiarem/mtime PDF-a
+  i wersją parsera – powtórne wykonanie zadania (po odzyskaniu albo ponownym przebiegu) zapisuje to samo,
+  a aktualny wynik nie jest liczony drugi raz,
+- wersja parsera (kod analyze_financials + text_layer i silnik OCR) zapisywana też przy zadaniu: `dodaj`
+  po zmianie parsera przywraca do puli gotowe zadania policzone starszą wersją,
+- reduce: zestawienie i uwagi (jak analyze_financials.build_reports) z wyników kolejki; wyniki nieaktualne
+  (PDF zmieniony po parsowaniu, inna wersja parsera) przerywają zamiast trafić do raportu,
+- sprawdz: syntetyczny korpus, kilka lokalnych procesów, jeden zabity SIGKILL w trakcie paczki – jego zadania
+  muszą przejąć pozostałe; potem reduce porównywany z analyze_financials.build_reports (te same raporty).
+
+  python parse_queue.py dodaj --sprawozdania pobrane --rok 2024
+  python parse_queue.py pracuj --procesy 4 --kolejka /mnt/wspolny/kolejka_rzis   # na każdej maszynie
+  python parse_queue.py stan
+  python parse_queue.py zestaw --xlsx raporty/raport_finansowy_2024.xlsx
+  python parse_queue.py uruchom --procesy 4         # wszystko lokalnie: dodaj + pracuj + zestaw
+  python parse_queue.py sprawdz                     # odzyskiwanie po SIGKILL + zgodność reduce z analyze
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import build_state
+import instrumentation
+
+QUEUE_DIR = Path("cache/kolejka_rzis")
+LEASE_S = 120.0  # zadanie bez znacznika życia dłużej niż tyle wraca do puli
+HEARTBEAT_S = 15.0
+MAX_PROB = 3
+PACZKA = 4  # zadań przejmowanych naraz (mniej transakcji na wspólnej bazie)
+OCZEKUJE, W_TOKU, GOTOWE, BLAD = "oczekuje", "w_toku", "gotowe", "blad"
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def parser_version() -> str:
+    import text_layer
+
+    return f"{build_state.module_hash('analyze_financials')[:16]}-{text_layer.version()}"
+
+
+class ShardQueue:
+    """Kolejka plików do sparsowania (SQLite); każda operacja to krótka transakcja, bezpieczna dla wielu procesów."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # autocommit + jawne BEGIN IMMEDIATE: blokada zapisu od początku transakcji przejmowania
+        self.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS zadania (
+                plik TEXT PRIMARY KEY, rozmiar INTEGER, mtime_ns INTEGER,
+                stan TEXT NOT NULL DEFAULT 'oczekuje', proces TEXT, znacznik REAL,
+                proby INTEGER NOT NULL DEFAULT 0, blad TEXT, zmieniono REAL, parser TEXT)"""
+        )
+        # kolejki założone przed kolumną parser
+        if "parser" not in {row[1] for row in self.conn.execute("PRAGMA table_info(zadania)")}:
+            self.conn.execute("ALTER TABLE zadania ADD COLUMN parser TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # autocommit sqlite3 nie otwiera transakcji sam – BEGIN IMMEDIATE ... COMMIT ręcznie
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def add(self, files: Iterable[str], parser: Optional[str] = None) -> Counter:
+        """
+        Dodaj pliki; plik już w kolejce wraca do puli, gdy zmienił się jego rozmiar lub mtime albo – gdy podano
+        `parser` – gdy gotowe zadanie policzono inną wersją parsera.
+        """
+        wynik: Counter = Counter()
+        now = time.time()
+        with self._transaction() as conn:
+            for plik in files:
+                stat = os.stat(plik)
+                row = conn.execute("SELECT rozmiar, mtime_ns, stan, parser FROM zadania WHERE plik = ?", (plik,)).fetchone()
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO zadania (plik, rozmiar, mtime_ns, zmieniono) VALUES (?, ?, ?, ?)",
+                        (plik, stat.st_size, stat.st_mtime_ns, now),
+                    )
+                    wynik["nowe"] += 1
+                elif tuple(row[:2]) != (stat.st_size, stat.st_mtime_ns):
+                    conn.execute(
+                        "UPDATE zadania SET rozmiar = ?, mtime_ns = ?, stan = ?, proces = NULL, proby = 0, blad = NULL,"
+                        " zmieniono = ? WHERE plik = ?",
+                        (stat.st_size, stat.st_mtime_ns, OCZEKUJE, now, plik),
+                    )
+                    wynik["zmienione"] += 1
+                elif parser is not None and row[2] == GOTOWE and row[3] != parser:
+                    conn.execute(
+                        "UPDATE zadania SET stan = ?, proces = NULL, proby = 0, zmieniono = ? WHERE plik = ?",
+                        (OCZEKUJE, now, plik),
+                    )
+                    wynik["nowy_parser"] += 1
+                else:
+                    wynik["bez_zmian"] += 1
+        return wynik
+
+    def claim(self, proces: str, n: int = PACZKA, lease_s: float = LEASE_S) -> List[str]:
+        """Przejmij do n zadań: oczekujące albo porzucone (znacznik starszy niż lease_s)."""
+        now = time.time()
+        with self._transaction() as conn:
+            # porzucone zbyt wiele razy (np. PDF zabijający proces) – błąd zamiast kolejnego przejęcia
+            conn.execute(
+                "UPDATE zadania SET stan = ?, proces = NULL, blad = 'porzucone ' || proby || ' razy', zmieniono = ?"
+                " WHERE stan = ? AND znacznik < ? AND proby >= ?",
+                (BLAD, now, W_TOKU, now - lease_s, MAX_PROB),
+            )
+            rows = conn.execute(
+                "SELECT plik, stan FROM zadania WHERE stan = ? OR (stan = ? AND znacznik < ?) ORDER BY rowid LIMIT ?",
+                (OCZEKUJE, W_TOKU, now - lease_s, n),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE zadania SET stan = ?, proces = ?, znacznik = ?, proby = proby + 1, zmieniono = ? WHERE plik = ?",
+                [(W_TOKU, proces, now, now, plik) for plik, _ in rows],
+            )
+        odzyskane = sum(stan == W_TOKU for _, stan in rows)
+        if odzyskane:
+            instrumentation.count("kolejka.odzyskane", odzyskane)
+            print(f"  ↺ {proces}: przejęto {odzyskane} porzuconych zadań")
+        return [plik for plik, _ in rows]
+
+    def heartbeat(self, proces: str) -> int:
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE zadania SET znacznik = ? WHERE proces = ? AND stan = ?", (time.time(), proces, W_TOKU)
+            )
+        return cur.rowcount
+
+    def done(self, plik: str, parser: Optional[str] = None):
+        # niezależnie od tego, kto trzyma zadanie: wynik jest ten sam (odzyskane zadanie mogło skończyć się dwa razy);
+        # zadanie zresetowane przez add() (PDF się zmienił) zostaje w puli
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE zadania SET stan = ?, proces = NULL, blad = NULL, parser = ?, zmieniono = ?"
+                " WHERE plik = ? AND stan = ?",
+                (GOTOWE, parser, time.time(), plik, W_TOKU),
+            )
+
+    def failed(self, plik: str, proces: str, error: str):
+        """Błąd parsowania: ponownie do puli (do MAX_PROB prób), potem stan blad; tylko gdy proces wciąż trzyma zadanie."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE zadania SET stan = CASE WHEN proby >= ? THEN ? ELSE ? END, proces = NULL, blad = ?, zmieniono = ?"
+                " WHERE plik = ? AND proces = ? AND stan = ?",
+                (MAX_PROB, BLAD, OCZEKUJE, error, time.time(), plik, proces, W_TOKU),
+            )
+
+    def retry_failed(self) -> int:
+        with self._transaction() as conn:
+            cur = conn.execute("UPDATE zadania SET stan = ?, proby = 0, blad = NULL WHERE stan = ?", (OCZEKUJE, BLAD))
+        return cur.rowcount
+
+    def counts(self) -> Counter:
+        return Counter(dict(self.conn.execute("SELECT stan, COUNT(*) FROM zadania GROUP BY stan").fetchall()))
+
+    def files(self, stan: str = GOTOWE) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT plik FROM zadania WHERE stan = ? ORDER BY plik", (stan,))]
+
+    def errors(self) -> List[tuple]:
+        return self.conn.execute("SELECT plik, blad FROM zadania WHERE stan = ? ORDER BY plik", (BLAD,)).fetchall()
+
+    def workers(self) -> List[tuple]:
+        """Procesy z zadaniami w toku: (proces, liczba zadań, wiek najstarszego znacznika [s])."""
+        return self.conn.execute(
+            "SELECT proces, COUNT(*), ? - MIN(znacznik) FROM zadania WHERE stan = ? GROUP BY proces ORDER BY proces",
+            (time.time(), W_TOKU),
+        ).fetchall()
+
+
+class ResultStore:
+    """Wyniki parsowania: wyniki/<skrót ścieżki>.json; aktualny = ten sam rozmiar/mtime PDF-a i wersja parsera."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def path(self, plik: str) -> Path:
+        return self.directory / f"{build_state.digest(plik)[:24]}.json"
+
+    def _stamp(self, plik: str) -> dict:
+        stat = os.stat(plik)
+        return {"plik": plik, "rozmiar": stat.st_size, "mtime_ns": stat.st_mtime_ns, "parser": parser_version()}
+
+    def _read(self, plik: str) -> Optional[dict]:
+        try:
+            return json.loads(self.path(plik).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    def fresh(self, plik: str) -> bool:
+        entry = self._read(plik)
+        return entry is not None and {k: entry.get(k) for k in ("plik", "rozmiar", "mtime_ns", "parser")} == self._stamp(plik)
+
+    def save(self, plik: str, rows: List[Dict[str, Optional[float]]]):
+        path = self.path(plik)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # nazwa tymczasowa z hostem i PID – dwa procesy (także z różnych maszyn) nie piszą do jednego pliku .tmp
+        tmp = path.with_name(f".{path.name}.{worker_id().replace(':', '-')}.tmp")
+        tmp.write_text(json.dumps({**self._stamp(plik), "wiersze": rows}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def load(self, plik: str) -> List[Dict[str, Optional[float]]]:
+        entry = self._read(plik)
+        if entry is None:
+            raise FileNotFoundError(f"Brak wyniku parsowania dla {plik} ({self.path(plik)})")
+        return entry["wiersze"]
+
+
+def queue_path(directory: Path) -> Path:
+    return Path(directory) / "kolejka.sqlite"
+
+
+def _heartbeat_loop(path: Path, proces: str, every: float, stop: threading.Event):
+    # osobne połączenie: połączenia sqlite3 nie przechodzą między wątkami
+    queue = ShardQueue(path)
+    try:
+        while not stop.wait(every):
+            queue.heartbeat(proces)
+    finally:
+        queue.close()
+
+
+def work(
+    directory: Path = QUEUE_DIR,
+    parse: Optional[Callable[[str], List[Dict[str, Optional[float]]]]] = None,
+    paczka: int = PACZKA,
+    lease_s: float = LEASE_S,
+    heartbeat_s: float = HEARTBEAT_S,
+    czekaj_s: float = 2.0,
+) -> Counter:
+    """
+    Proces roboczy: przejmuj i parsuj zadania, aż kolejka będzie pusta. Gdy nic nie czeka, ale inne procesy
+    mają zadania w toku, czeka (ich zadania mogą zostać porzucone i wrócić do puli).
+    """
+    if parse is None:
+        import analyze_financials
+
+        parse = analyze_financials.parse_rzis_pdf
+    directory = Path(directory)
+    queue = ShardQueue(queue_path(directory))
+    store = ResultStore(directory / "wyniki")
+    proces = worker_id()
+    wersja = parser_version()
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat_loop, args=(queue.path, proces, heartbeat_s, stop), daemon=True)
+    beat.start()
+    wynik: Counter = Counter()
+    try:
+        while True:
+            batch = queue.claim(proces, paczka, lease_s)
+            if not batch:
+                if not queue.counts().get(W_TOKU):
+                    break
+                time.sleep(czekaj_s)
+                continue
+            for plik in batch:
+                with instrumentation.span("kolejka.zadanie", plik=plik):
+                    try:
+                        if store.fresh(plik):
+                            wynik["aktualne"] += 1
+                        else:
+                            store.save(plik, parse(plik))
+                            wynik["sparsowane"] += 1
+                    except Exception as exc:  # uszkodzony PDF itp. – zadanie do ponowienia / błędne, proces działa dalej
+                        print(f"  ✗ {plik}: {type(exc).__name__}: {exc}")
+                        instrumentation.count("kolejka.bledy")
+                        queue.failed(plik, proces, f"{type(exc).__name__}: {exc}")
+                        wynik["bledy"] += 1
+                        continue
+                queue.done(plik, wersja)
+    finally:
+        stop.set()
+        beat.join()
+        queue.close()
+    print(f"{proces}: {dict(wynik)}")
+    return wynik
+
+
+def _work_process(directory: Path, lease_s: float, heartbeat_s: float):
+    work(directory, lease_s=lease_s, heartbeat_s=heartbeat_s)
+
+
+def run_workers(directory: Path = QUEUE_DIR, procesy: int = 2, lease_s: float = LEASE_S, heartbeat_s: float = HEARTBEAT_S):
+    """Uruchom `procesy` lokalnych procesów roboczych i poczekaj na ich zakończenie."""
+    if procesy <= 1:
+        work(directory, lease_s=lease_s, heartbeat_s=heartbeat_s)
+        return
+    workers = [
+        multiprocessing.Process(target=_work_process, args=(directory, lease_s, heartbeat_s)) for _ in range(procesy)
+    ]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+
+
+def reduce(
+    directory: Path = QUEUE_DIR,
+    registry_file: Optional[Path] = None,
+    summary_path: Optional[Path] = None,
+    issues_path: Optional[Path] = None,
+    powiat: Optional[str] = None,
+    miasto: Optional[str] = None,
+    czesciowo: bool = False,
+):
+    """Zestawienie i uwagi z wyników kolejki; niezakończona kolejka lub nieaktualne wyniki przerywają (chyba że czesciowo=True)."""
+    import analyze_financials
+    import peer_anomalies
+
+    directory = Path(directory)
+    queue = ShardQueue(queue_path(directory))
+    try:
+        counts = queue.counts()
+        pending = counts.get(OCZEKUJE, 0) + counts.get(W_TOKU, 0)
+        if pending and not czesciowo:
+            raise SystemExit(f"Kolejka niezakończona: {pending} zadań oczekuje lub jest w toku (--czesciowo pomija).")
+        for plik, blad in queue.errors():
+            print(f"  ! pominięto {plik}: {blad}")
+        files = queue.files(GOTOWE)
+    finally:
+        queue.close()
+    if not files:
+        raise SystemExit("Brak sparsowanych plików w kolejce.")
+    store = ResultStore(directory / "wyniki")
+    # wynik sprzed zmiany PDF-a albo parsera nie trafia do raportu po cichu
+    stale = [plik for plik in files if not store.fresh(plik)]
+    if stale:
+        for plik in stale[:20]:
+            print(f"  ! nieaktualny wynik: {plik}")
+        if not czesciowo:
+            raise SystemExit(
+                f"{len(stale)} wyników nieaktualnych (zmieniony PDF albo parser) – uruchom `dodaj` i `pracuj`"
+                " (--czesciowo pomija)."
+            )
+        stale_set = set(stale)
+        files = [plik for plik in files if plik not in stale_set]
+        if not files:
+            raise SystemExit("Brak aktualnych wyników w kolejce.")
+
+    registry_index = analyze_financials.load_registry_index(
+        path=registry_file or analyze_financials.REGISTRY_FILE,
+        powiat=powiat or analyze_financials.POWIAT_FILTER,
+        miasto=miasto or analyze_financials.MIASTO_FILTER,
+    )
+    with instrumentation.span("analyze", pliki=len(files)):
+        summary_df, tables = analyze_financials.analyze(files, registry_index, parse=store.load)
+
+    summary_path = summary_path or analyze_financials.SUMMARY_XLSX
+    issues_path = issues_path or analyze_financials.ISSUES_DOCX
+    with instrumentation.span("zapis.xlsx", plik=summary_path):
+        analyze_financials.write_summary_xlsx(summary_df, tables, summary_path)
+    with instrumentation.span("zapis.docx", plik=issues_path):
+        # rok z nazw plików (kolejka może mieć sprawozdania z kilku lat – wtedy tytuł bez roku)
+        lata = {analyze_financials.statement_year(plik) for plik in files}
+        analyze_financials.write_issues_docx(
+            peer_anomalies.detect_anomalies(summary_df), summary_df, issues_path, rok=lata.pop() if len(lata) == 1 else None
+        )
+    print(f"Zapisano raport Excel: {summary_path} ({len(files)} plików)")
+    print(f"Zapisano dokument Word: {issues_path}")
+
+
+def enqueue(directory: Path, base_dirs: Optional[List[Path]], rok: Optional[int]) -> Counter:
+    import analyze_financials
+
+    files = analyze_financials.collect_rzis_files(rok, base_dirs)
+    queue = ShardQueue(queue_path(directory))
+    try:
+        wynik = queue.add(files, parser_version())
+    finally:
+        queue.close()
+    print(f"Kolejka {directory}: {dict(wynik)}")
+    return wynik
+
+
+def _expect(condition: bool, message: str):
+    if not condition:
+        raise SystemExit(f"BŁĄD: {message}")
+    print(f"  ok: {message}")
+
+
+def _work_check(directory: Path, lease_s: float, heartbeat_s: float):
+    work(directory, lease_s=lease_s, heartbeat_s=heartbeat_s, czekaj_s=0.2)
+
+
+def check(procesy: int = 3, placowki: int = 16):
+    """
+    Kolejka na syntetycznym korpusie: `procesy` procesów roboczych, pierwszy zabity (SIGKILL), gdy trzyma
+    paczkę zadań; pozostałe muszą je przejąć po upływie dzierżawy. Następnie reduce i build_reports na tych
+    samych PDF-ach muszą dać te same arkusze zestawienia i ten sam dokument uwag.
+    """
+    import pandas as pd
+    from docx import Document
+
+    import analyze_financials
+    import synthetic_corpus
+
+    lease_s, heartbeat_s = 2.0, 0.3
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        files = synthetic_corpus.rzis_corpus(tmp / "pobrane", placowki, pages=2)
+        registry = synthetic_corpus.write_registry_xlsx(tmp / "wykaz.xlsx", rows=2000)
+        directory = tmp / "kolejka"
+        wynik = enqueue(directory, [tmp / "pobrane"], 2024)
+        _expect(wynik["nowe"] == len(files), f"{len(files)} plików w kolejce")
+
+        print(f"Procesy robocze: {procesy}, dzierżawa {lease_s:g} s; pierwszy zabijany SIGKILL")
+        workers = [
+            multiprocessing.Process(target=_work_check, args=(directory, lease_s, heartbeat_s)) for _ in range(procesy)
+        ]
+        for p in workers:
+            p.start()
+        victim = f"{socket.gethostname()}:{workers[0].pid}"
+        queue = ShardQueue(queue_path(directory))
+        try:
+            held: List[str] = []
+            deadline = time.monotonic() + 60
+            while not held and workers[0].is_alive() and time.monotonic() < deadline:
+                held = [row[0] for row in queue.conn.execute("SELECT plik FROM zadania WHERE proces = ? AND stan = ?", (victim, W_TOKU))]
+                time.sleep(0.01)
+            os.kill(workers[0].pid, signal.SIGKILL)
+            for p in workers:
+                p.join()
+            _expect(bool(held) and workers[0].exitcode == -signal.SIGKILL, f"{victim} zabity z {len(held)} zadaniami w toku")
+            counts = queue.counts()
+            proby = dict(queue.conn.execute("SELECT plik, proby FROM zadania"))
+            porzucone = [plik for plik, in queue.conn.execute("SELECT plik FROM zadania WHERE proces = ?", (victim,))]
+        finally:
+            queue.close()
+        _expect(counts.get(GOTOWE) == len(files) and sum(counts.values()) == len(files), "wszystkie zadania gotowe")
+        _expect(not porzucone, "żadne zadanie nie zostało przy zabitym procesie")
+        store = ResultStore(directory / "wyniki")
+        _expect(all(store.fresh(plik) for plik in files), "aktualne wyniki dla wszystkich plików")
+        # zadanie, którego zabity proces nie skończył, musiało zostać przejęte (druga próba)
+        przejete = [plik for plik in held if proby[plik] >= 2]
+        _expect(bool(przejete), f"{len(przejete)} z {len(held)} zadań zabitego procesu przejętych ponownie")
+
+        print("Zgodność reduce z analyze_financials.build_reports")
+        reduce(directory, registry, tmp / "kolejka.xlsx", tmp / "kolejka.docx")
+        analyze_financials.build_reports([tmp / "pobrane"], registry, tmp / "analyze.xlsx", tmp / "analyze.docx")
+        kolejka = pd.read_excel(tmp / "kolejka.xlsx", sheet_name=None)
+        analyze = pd.read_excel(tmp / "analyze.xlsx", sheet_name=None)
+        _expect(sorted(kolejka) == sorted(analyze), f"te same arkusze ({len(analyze)})")
+        rozne = []
+        for name, df in analyze.items():
+            key = list(df.columns)
+            try:
+                pd.testing.assert_frame_equal(
+                    kolejka[name].sort_values(key, ignore_index=True), df.sort_values(key, ignore_index=True), check_like=True
+                )
+            except AssertionError:
+                rozne.append(name)
+        _expect(not rozne, f"arkusze zgodne bez względu na kolejność wierszy{' – różne: ' + ', '.join(rozne) if rozne else ''}")
+        docs = [Document(path) for path in (tmp / "kolejka.docx", tmp / "analyze.docx")]
+        paragraphs = [[p.text for p in doc.paragraphs] for doc in docs]
+        _expect(paragraphs[0] == paragraphs[1], "akapity dokumentu uwag zgodne")
+        # ranking odchyleń i niezgodności są tabelami – nie ma ich w doc.paragraphs
+        tables = [[[[c.text for c in row.cells] for row in t.rows] for t in doc.tables] for doc in docs]
+        _expect(tables[0] == tables[1], f"tabele dokumentu uwag zgodne ({len(tables[1])}, wierszy: {sum(map(len, tables[1]))})")
+    print("Kolejka: OK")
+
+
+def print_status(directory: Path):
+    queue = ShardQueue(queue_path(directory))
+    try:
+        counts = queue.counts()
+        print(", ".join(f"{stan}: {counts.get(stan, 0)}" for stan in (OCZEKUJE, W_TOKU, GOTOWE, BLAD)))
+        for proces, n, wiek in queue.workers():
+            print(f"  {proces}: {n} w toku, znacznik sprzed {wiek:.0f} s")
+        for plik, blad in queue.errors():
+            print(f"  ✗ {plik}: {blad}")
+    finally:
+        queue.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Parsowanie RZiS kolejką zadań (wiele procesów / maszyn).")
+    wspolne = argparse.ArgumentParser(add_help=False)
+    wspolne.add_argument("--kolejka", type=Path, default=QUEUE_DIR, help="katalog kolejki i wyników (wspólny dysk)")
+    sub = parser.add_subparsers(dest="polecenie", required=True)
+
+    def command(name: str, help: str):
+        return sub.add_parser(name, help=help, parents=[wspolne])
+
+    def add_source(p):
+        p.add_argument("--sprawozdania", type=Path, action="append", help="katalog z PDF-ami (można powtórzyć)")
+        p.add_argument("--rok", type=int, default=2024, help="rok sprawozdań (0 = wszystkie lata)")
+
+    def add_work(p):
+        p.add_argument("--procesy", type=int, default=os.cpu_count() or 1)
+        p.add_argument("--lease", type=float, default=LEASE_S, help="po ilu sekundach bez znacznika zadanie wraca do puli")
+        p.add_argument("--znacznik", type=float, default=HEARTBEAT_S, help="co ile sekund odświeżać znacznik życia")
+
+    def add_reduce(p):
+        p.add_argument("--wykaz", type=Path)
+        p.add_argument("--powiat")
+        p.add_argument("--gmina")
+        p.add_argument("--xlsx", type=Path)
+        p.add_argument("--docx", type=Path)
+        p.add_argument(
+            "--czesciowo", action="store_true", help="zestaw mimo niezakończonych zadań (pomija też wyniki nieaktualne)"
+        )
+
+    add_source(command("dodaj", "dodaj (nowe lub zmienione) PDF-y do kolejki"))
+    add_work(command("pracuj", "procesy robocze na tej maszynie"))
+    command("stan", "stan kolejki")
+    command("ponow", "zadania z błędem z powrotem do puli")
+    add_reduce(command("zestaw", "raport z wyników kolejki (reduce)"))
+    p = command("uruchom", "lokalnie: dodaj + pracuj + zestaw")
+    add_source(p)
+    add_work(p)
+    add_reduce(p)
+    p = sub.add_parser("sprawdz", help="odzyskiwanie zadań po SIGKILL i zgodność reduce z analyze (katalog tymczasowy)")
+    p.add_argument("--procesy", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.polecenie == "sprawdz":
+        check(max(2, args.procesy))
+        return
+
+    if args.polecenie in ("dodaj", "uruchom"):
+        enqueue(args.kolejka, args.sprawozdania, args.rok or None)
+    if args.polecenie in ("pracuj", "uruchom"):
+        run_workers(args.kolejka, args.procesy, args.lease, args.znacznik)
+    if args.polecenie == "ponow":
+        queue = ShardQueue(queue_path(args.kolejka))
+        print(f"Ponownie w puli: {queue.retry_failed()}")
+        queue.close()
+    if args.polecenie in ("stan", "pracuj", "uruchom"):
+        print_status(args.kolejka)
+    if args.polecenie in ("zestaw", "uruchom"):
+        reduce(
+            args.kolejka, args.wykaz, args.xlsx, args.docx, args.powiat, args.gmina, czesciowo=args.czesciowo
+        )
+
+
+if __name__ == "__main__":
+    main()
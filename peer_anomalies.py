@@ -0,0 +1,98 @@
+"""
+Wykrywanie odchyleń w grupach porównawczych (zamiast stałych reguł per placówka):
+- wskaźniki struktury kosztów liczone kolumnowo na całym zestawieniu (koszt na ucznia, udział wynagrodzeń,
+  energii, usług obcych, ...),
+- dla każdej grupy typu placówki (classify_facility_type) mediana, kwartyle i MAD w jednym groupby,
+- odporny z-score = (x - mediana) / (1.4826 · MAD), a gdy MAD = 0 – skala z IQR,
+- grupy mniejsze niż MIN_GRUPA porównywane z całą populacją (np. jedyny żłobek),
+- wynik: ranking odchyleń (|z| malejąco) dla wartości poza przedziałem Tukeya [Q1 - 1,5·IQR, Q3 + 1,5·IQR].
+Jeden wektorowy przebieg – niezależnie od liczby placówek i gmin w zestawieniu.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+MIN_GRUPA = 4
+PROG_Z = 2.0
+MNOZNIK_IQR = 1.5
+
+# wskaźnik -> (opis, jednostka)
+WSKAZNIKI: Dict[str, Tuple[str, str]] = {
+    "koszt_na_ucznia": ("Koszt na ucznia", "zł"),
+    "udzial_wynagrodzen": ("Udział wynagrodzeń z pochodnymi w kosztach", "%"),
+    "udzial_energii": ("Udział materiałów i energii w kosztach", "%"),
+    "udzial_uslug_obcych": ("Udział usług obcych w kosztach", "%"),
+    "udzial_amortyzacji": ("Udział amortyzacji w kosztach", "%"),
+    "udzial_pozostalych_kosztow": ("Udział pozostałych kosztów (rodzajowych i operacyjnych)", "%"),
+    "pokrycie_przychodami": ("Pokrycie kosztów przychodami własnymi", "%"),
+}
+
+
+def _share(df: pd.DataFrame, *columns: str) -> pd.Series:
+    costs = df["koszty_operacyjne"].where(df["koszty_operacyjne"] > 0)
+    return df[list(columns)].fillna(0).sum(axis=1) / costs
+
+
+def indicators(summary_df: pd.DataFrame) -> pd.DataFrame:
+    """Wskaźniki per placówka (kolumnowo, bez pętli po wierszach)."""
+    df = summary_df.apply(pd.to_numeric, errors="coerce").assign(placowka=summary_df["placowka"], typ=summary_df["typ"])
+    return pd.DataFrame(
+        {
+            "placowka": df["placowka"],
+            "typ": df["typ"],
+            "koszt_na_ucznia": df["koszt_na_ucznia"],
+            "udzial_wynagrodzen": _share(df, "wynagrodzenia", "ubezpieczenia_i_swiadczenia"),
+            "udzial_energii": _share(df, "materialy_i_energia"),
+            "udzial_uslug_obcych": _share(df, "uslugi_obce"),
+            "udzial_amortyzacji": _share(df, "amortyzacja"),
+            "udzial_pozostalych_kosztow": _share(df, "pozostale_koszty_rodzajowe", "pozostale_koszty_operacyjne"),
+            "pokrycie_przychodami": _share(df, "przychody_netto"),
+        }
+    )
+
+
+def _stats(values: pd.Series, keys) -> pd.DataFrame:
+    grouped = values.groupby(keys)
+    med = grouped.transform("median")
+    return pd.DataFrame(
+        {
+            "n": grouped.transform("count"),
+            "mediana": med,
+            "q1": grouped.transform("quantile", 0.25),
+            "q3": grouped.transform("quantile", 0.75),
+            "mad": (values - med).abs().groupby(keys).transform("median"),
+        }
+    )
+
+
+def detect_anomalies(summary_df: pd.DataFrame, prog_z: float = PROG_Z) -> pd.DataFrame:
+    """Ranking odchyleń od grupy porównawczej: placowka, grupa, wskaznik, wartosc, mediana, q1, q3, z."""
+    long = indicators(summary_df).melt(id_vars=["placowka", "typ"], var_name="wskaznik", value_name="wartosc")
+    long = long[np.isfinite(long["wartosc"].astype(float))].reset_index(drop=True)
+
+    by_group = _stats(long["wartosc"], [long["typ"], long["wskaznik"]])
+    overall = _stats(long["wartosc"], long["wskaznik"])
+    small = by_group["n"] < MIN_GRUPA
+    stats = by_group.mask(small, overall)
+    long["grupa"] = long["typ"].where(~small, "wszystkie placówki")
+
+    iqr = stats["q3"] - stats["q1"]
+    scale = (1.4826 * stats["mad"]).where(stats["mad"] > 0, iqr / 1.349)
+    long["z"] = (long["wartosc"] - stats["mediana"]) / scale.where(scale > 0)
+    long[["n", "mediana", "q1", "q3"]] = stats[["n", "mediana", "q1", "q3"]]
+    outside = (long["wartosc"] < stats["q1"] - MNOZNIK_IQR * iqr) | (long["wartosc"] > stats["q3"] + MNOZNIK_IQR * iqr)
+    findings = long[outside & (long["z"].abs() >= prog_z)].copy()
+    findings["opis"] = findings["wskaznik"].map(lambda w: WSKAZNIKI[w][0])
+    findings["jednostka"] = findings["wskaznik"].map(lambda w: WSKAZNIKI[w][1])
+    findings = findings.reindex(findings["z"].abs().sort_values(ascending=False).index)
+    return findings[
+        ["placowka", "grupa", "wskaznik", "opis", "jednostka", "wartosc", "mediana", "q1", "q3", "n", "z"]
+    ].reset_index(drop=True)
+
+
+def format_value(value: float, unit: str) -> str:
+    if unit == "%":
+        return f"{value * 100:,.1f}%".replace(",", " ").replace(".", ",")
+    return f"{value:,.2f} {unit}".replace(",", " ").replace(".", ",")
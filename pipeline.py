@@ -0,0 +1,644 @@
+"""
+Potok przetwarzania w pamięci (DAG etapów) zamiast przekazywania danych przez pliki XLSX:
+- każdy etap deklaruje nazwane wejścia i wyjścia z typami; dane (DataFrame, słowniki) płyną w pamięci,
+- niezależne gałęzie (finanse / demografia / wykaz placówek) liczone są równolegle w puli procesów,
+- pliki Excel/PPTX/DOCX zapisują wyłącznie etapy końcowe (artefakty),
+- pełna przebudowa czyta każde źródło dokładnie raz (wykaz, PDF-y RZiS, prognozy GUS),
+  a raport finansowy (formuły, formaty, pivot, wykresy) zapisywany jest jednym przebiegiem,
+- `build` przebudowuje przyrostowo: klucz etapu to skrót plików wejściowych, kodu i kluczy etapów
+  nadrzędnych (build_state); uruchamiane są tylko nieaktualne etapy, a PDF-y RZiS czytane są per plik
+  (nowy PDF = jeden odczyt + tania ponowna agregacja).
+"""
+
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import analytics_store
+import analyze_financials
+import build_demand
+import build_state
+import extract_gus_children
+import financial_panel
+import gus_source
+import instrumentation
+import peer_anomalies
+import process_registry
+import process_zsp_report
+import reconciliation
+import text_layer
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    func: Callable[..., Dict[str, object]]
+    inputs: Dict[str, object] = field(default_factory=dict)  # nazwa wejścia -> typ
+    outputs: Dict[str, object] = field(default_factory=dict)  # nazwa wyjścia -> typ
+    artifacts: Tuple[Path, ...] = ()  # pliki zapisywane przez etap końcowy
+    sources: Optional[Callable[[], Iterable[Path]]] = None  # pliki źródłowe czytane przez etap
+    code: Tuple[str, ...] = ()  # moduły, od których zależy wynik etapu (z ich importami z projektu)
+
+
+# --- etapy danych -------------------------------------------------------------------------
+
+
+def wykaz() -> Dict[str, object]:
+    if not process_registry.REGISTRY_FILE.exists():
+        print(f"Brak wykazu placówek ({process_registry.REGISTRY_FILE}) – etapy wykazu zostaną pominięte.")
+        return {"rejestr": None}
+    return {"rejestr": process_registry.load_registry()}
+
+
+def indeks_uczniow(rejestr: Optional[pd.DataFrame]) -> Dict[str, object]:
+    # bez wykazu (plik nie istnieje) load_registry_index zwraca pusty indeks
+    return {"indeks_uczniow": analyze_financials.load_registry_index(rejestr)}
+
+
+def _rzis_key(pdf_path: str) -> str:
+    # text_layer.version(): kod triage/OCR i silnik OCR (doinstalowanie tesseract odczytuje skany od nowa)
+    return (
+        f"{build_state.file_hash(Path(pdf_path))[:16]}-{build_state.module_hash('analyze_financials')[:16]}"
+        f"-{text_layer.version()}"
+    )
+
+
+def parse_rzis_cached(pdf_path: str) -> List[Dict[str, Optional[float]]]:
+    """Wiersze RZiS z cache per plik (skrót PDF + wersja parsera); PDF czytany tylko po zmianie."""
+    return build_state.memo("rzis", _rzis_key(pdf_path), lambda: analyze_financials.parse_rzis_pdf(pdf_path))
+
+
+def finanse(indeks_uczniow: dict) -> Dict[str, object]:
+    files = analyze_financials.collect_rzis_files()
+    summary_df, tables = analyze_financials.analyze(files, indeks_uczniow, parse=parse_rzis_cached)
+    # przestrzeń "rzis" dzieli z etapem panel_finansowy (wszystkie lata, może działać równolegle):
+    # zostają klucze wszystkich sprawozdań, nie tylko roku zestawienia
+    keep = set(files) | set(analyze_financials.collect_rzis_files(rok=None))
+    build_state.prune_units("rzis", [_rzis_key(f) for f in keep])
+    return {"zestawienie": summary_df, "tabele_placowek": tables}
+
+
+def _statement_key(pdf_path: str) -> str:
+    code = build_state.digest(
+        [build_state.module_hash(m) for m in ("reconciliation", "analyze_financials", "text_layer")]
+    )
+    return f"{build_state.file_hash(Path(pdf_path))[:16]}-{code[:16]}"
+
+
+def parse_statement_cached(pdf_path: str) -> List[Dict[str, object]]:
+    """Wiersze bilansu / ZZF z kodami pozycji, z cache per plik (jak parse_rzis_cached)."""
+    return build_state.memo("sprawozdania", _statement_key(pdf_path), lambda: reconciliation.parse_statement_pdf(pdf_path))
+
+
+def sprawozdania(tabele_placowek: dict) -> Dict[str, object]:
+    # RZiS już sparsowane w etapie finanse (tabele placówek) – nie czytamy ich drugi raz
+    def parse(pdf_path: str) -> List[Dict[str, object]]:
+        if reconciliation.statement_kind(pdf_path) != reconciliation.RZIS:
+            return parse_statement_cached(pdf_path)
+        table = tabele_placowek.get(analyze_financials.normalize_name_from_dir(str(Path(pdf_path).parent)))
+        rows = table.to_dict("records") if table is not None else parse_rzis_cached(pdf_path)
+        return reconciliation.rzis_statement_rows(rows)
+
+    files = reconciliation.collect_statement_files()
+    statements = reconciliation.load_statements(files, parse=parse)
+    build_state.prune_units(
+        "sprawozdania",
+        [_statement_key(f) for f in files if reconciliation.statement_kind(f) != reconciliation.RZIS],
+    )
+    return {"pozycje": statements}
+
+
+def uzgodnienia(pozycje: pd.DataFrame) -> Dict[str, object]:
+    checks = reconciliation.check(pozycje)
+    return {"uzgodnienia": checks, "niezgodnosci": reconciliation.violations(checks)}
+
+
+def odchylenia(zestawienie: pd.DataFrame) -> Dict[str, object]:
+    return {"uwagi": peer_anomalies.detect_anomalies(zestawienie)}
+
+
+def demografia_powiat() -> Dict[str, object]:
+    return {"demografia_powiat": extract_gus_children.load_powiat()}
+
+
+def demografia_miasto() -> Dict[str, object]:
+    return {"demografia_miasto": extract_gus_children.load_miasto()}
+
+
+def prognozy_gus() -> Dict[str, object]:
+    return {"prognozy_gus": analytics_store.load_projections()}
+
+
+def zapotrzebowanie(demografia_powiat: pd.DataFrame, demografia_miasto: pd.DataFrame) -> Dict[str, object]:
+    return {
+        "zapotrzebowanie_powiat": build_demand.pivot_powiat(demografia_powiat),
+        "zapotrzebowanie_miasto": build_demand.pivot_miasto(demografia_miasto),
+    }
+
+
+def wykaz_tabele(rejestr: Optional[pd.DataFrame]) -> Dict[str, object]:
+    return {"rejestr_tabele": process_registry.registry_tables(rejestr) if rejestr is not None else None}
+
+
+def zespoly(rejestr: Optional[pd.DataFrame]) -> Dict[str, object]:
+    if rejestr is None:
+        return {"zsp_podsumowanie": None, "zsp_szczegoly": None}
+    summary, details = process_zsp_report.build_report(rejestr)
+    return {"zsp_podsumowanie": summary, "zsp_szczegoly": details}
+
+
+# --- etapy końcowe (artefakty) ------------------------------------------------------------
+
+
+def raport_finansowy(zestawienie: pd.DataFrame, tabele_placowek: dict) -> Dict[str, object]:
+    analyze_financials.write_summary_xlsx(zestawienie, tabele_placowek)
+    return {}
+
+
+def uwagi_docx(uwagi: pd.DataFrame, zestawienie: pd.DataFrame, niezgodnosci: pd.DataFrame) -> Dict[str, object]:
+    analyze_financials.write_issues_docx(uwagi, zestawienie, niezgodnosci=niezgodnosci)
+    return {}
+
+
+def uzgodnienia_xlsx(pozycje: pd.DataFrame, uzgodnienia: pd.DataFrame) -> Dict[str, object]:
+    reconciliation.write_reconciliation(pozycje, uzgodnienia)
+    return {}
+
+
+def demografia_xlsx(demografia_powiat: pd.DataFrame, demografia_miasto: pd.DataFrame) -> Dict[str, object]:
+    extract_gus_children.write_demografia(demografia_powiat, demografia_miasto)
+    return {}
+
+
+def zapotrzebowanie_xlsx(zapotrzebowanie_powiat: pd.DataFrame, zapotrzebowanie_miasto: pd.DataFrame) -> Dict[str, object]:
+    build_demand.save_excel(zapotrzebowanie_powiat, zapotrzebowanie_miasto)
+    return {}
+
+
+def prezentacja(zapotrzebowanie_powiat: pd.DataFrame, zapotrzebowanie_miasto: pd.DataFrame) -> Dict[str, object]:
+    build_demand.build_ppt(zapotrzebowanie_powiat, zapotrzebowanie_miasto)
+    return {}
+
+
+def panel_finansowy() -> Dict[str, object]:
+    # panel ma własny rejestr wczytanych PDF-ów: dopisywane są tylko nowe sprawozdania
+    financial_panel.ingest(analyze_financials.collect_rzis_files(rok=None), parse=parse_rzis_cached)
+    financial_panel.write_panel(financial_panel.build_panel())
+    return {}
+
+
+def baza_analityczna(
+    zestawienie: pd.DataFrame, tabele_placowek: dict, rejestr: Optional[pd.DataFrame], prognozy_gus: pd.DataFrame
+) -> Dict[str, object]:
+    analytics_store.write_store(zestawienie, tabele_placowek, rejestr, prognozy_gus)
+    return {}
+
+
+def wykaz_xlsx(rejestr_tabele: Optional[dict]) -> Dict[str, object]:
+    if rejestr_tabele is not None:
+        process_registry.write_registry(rejestr_tabele)
+    return {}
+
+
+def zespoly_xlsx(zsp_podsumowanie: Optional[pd.DataFrame], zsp_szczegoly: Optional[pd.DataFrame]) -> Dict[str, object]:
+    if zsp_podsumowanie is not None:
+        process_zsp_report.write_report(zsp_podsumowanie, zsp_szczegoly)
+    return {}
+
+
+def _gus_file(teryt: str) -> Path:
+    archive, member, _ = gus_source.find(teryt)
+    return archive if archive is not None else Path(member)
+
+
+OptFrame = Optional[pd.DataFrame]
+
+STAGES: List[Stage] = [
+    Stage(
+        "wykaz",
+        wykaz,
+        outputs={"rejestr": OptFrame},
+        sources=lambda: [process_registry.REGISTRY_FILE],
+        code=("process_registry",),
+    ),
+    Stage(
+        "indeks_uczniow",
+        indeks_uczniow,
+        {"rejestr": OptFrame},
+        {"indeks_uczniow": dict},
+        code=("analyze_financials",),
+    ),
+    Stage(
+        "finanse",
+        finanse,
+        {"indeks_uczniow": dict},
+        {"zestawienie": pd.DataFrame, "tabele_placowek": dict},
+        sources=lambda: [Path(f) for f in analyze_financials.collect_rzis_files()],
+        code=("analyze_financials", "text_layer"),
+    ),
+    Stage(
+        "sprawozdania",
+        sprawozdania,
+        {"tabele_placowek": dict},
+        outputs={"pozycje": pd.DataFrame},
+        sources=lambda: [Path(f) for f in reconciliation.collect_statement_files()],
+        code=("reconciliation", "analyze_financials", "text_layer"),
+    ),
+    Stage(
+        "uzgodnienia",
+        uzgodnienia,
+        {"pozycje": pd.DataFrame},
+        {"uzgodnienia": pd.DataFrame, "niezgodnosci": pd.DataFrame},
+        code=("reconciliation",),
+    ),
+    Stage(
+        "odchylenia",
+        odchylenia,
+        {"zestawienie": pd.DataFrame},
+        {"uwagi": pd.DataFrame},
+        code=("peer_anomalies",),
+    ),
+    Stage(
+        "demografia_powiat",
+        demografia_powiat,
+        outputs={"demografia_powiat": pd.DataFrame},
+        sources=lambda: [_gus_file(extract_gus_children.POWIAT_TERYT)],
+        code=("extract_gus_children", "gus_source"),
+    ),
+    Stage(
+        "demografia_miasto",
+        demografia_miasto,
+        outputs={"demografia_miasto": pd.DataFrame},
+        sources=lambda: [_gus_file(extract_gus_children.MIASTO_TERYT), extract_gus_children.TABLICA_ZBIORCZA],
+        code=("extract_gus_children", "gus_source"),
+    ),
+    Stage(
+        "prognozy_gus",
+        prognozy_gus,
+        outputs={"prognozy_gus": pd.DataFrame},
+        sources=analytics_store.projection_sources,
+        code=("analytics_store", "gus_source"),
+    ),
+    Stage(
+        "zapotrzebowanie",
+        zapotrzebowanie,
+        {"demografia_powiat": pd.DataFrame, "demografia_miasto": pd.DataFrame},
+        {"zapotrzebowanie_powiat": pd.DataFrame, "zapotrzebowanie_miasto": pd.DataFrame},
+        code=("build_demand",),
+    ),
+    Stage(
+        "wykaz_tabele",
+        wykaz_tabele,
+        {"rejestr": OptFrame},
+        {"rejestr_tabele": Optional[dict]},
+        code=("process_registry",),
+    ),
+    Stage(
+        "zespoly",
+        zespoly,
+        {"rejestr": OptFrame},
+        {"zsp_podsumowanie": OptFrame, "zsp_szczegoly": OptFrame},
+        code=("process_zsp_report",),
+    ),
+    Stage(
+        "raport_finansowy",
+        raport_finansowy,
+        {"zestawienie": pd.DataFrame, "tabele_placowek": dict},
+        artifacts=(analyze_financials.SUMMARY_XLSX,),
+        code=("analyze_financials",),
+    ),
+    Stage(
+        "uwagi_docx",
+        uwagi_docx,
+        {"uwagi": pd.DataFrame, "zestawienie": pd.DataFrame, "niezgodnosci": pd.DataFrame},
+        artifacts=(analyze_financials.ISSUES_DOCX,),
+        code=("analyze_financials", "peer_anomalies"),
+    ),
+    Stage(
+        "uzgodnienia_xlsx",
+        uzgodnienia_xlsx,
+        {"pozycje": pd.DataFrame, "uzgodnienia": pd.DataFrame},
+        artifacts=(reconciliation.OUT_XLSX,),
+        code=("reconciliation",),
+    ),
+    Stage(
+        "demografia_xlsx",
+        demografia_xlsx,
+        {"demografia_powiat": pd.DataFrame, "demografia_miasto": pd.DataFrame},
+        artifacts=(extract_gus_children.OUTPUT_XLSX,),
+        code=("extract_gus_children",),
+    ),
+    Stage(
+        "zapotrzebowanie_xlsx",
+        zapotrzebowanie_xlsx,
+        {"zapotrzebowanie_powiat": pd.DataFrame, "zapotrzebowanie_miasto": pd.DataFrame},
+        artifacts=(build_demand.OUT_XLSX,),
+        code=("build_demand",),
+    ),
+    Stage(
+        "prezentacja",
+        prezentacja,
+        {"zapotrzebowanie_powiat": pd.DataFrame, "zapotrzebowanie_miasto": pd.DataFrame},
+        artifacts=(build_demand.OUT_PPTX,),
+        code=("build_demand",),
+    ),
+    Stage(
+        "baza_analityczna",
+        baza_analityczna,
+        {"zestawienie": pd.DataFrame, "tabele_placowek": dict, "rejestr": OptFrame, "prognozy_gus": pd.DataFrame},
+        artifacts=(analytics_store.DB_PATH,),
+        code=("analytics_store",),
+    ),
+    Stage(
+        "panel_finansowy",
+        panel_finansowy,
+        artifacts=(financial_panel.OUT_XLSX,),
+        sources=lambda: [Path(f) for f in analyze_financials.collect_rzis_files(rok=None)],
+        code=("financial_panel", "analyze_financials", "text_layer"),
+    ),
+    Stage(
+        "wykaz_xlsx",
+        wykaz_xlsx,
+        {"rejestr_tabele": Optional[dict]},
+        artifacts=(process_registry.OUT_FILE,),
+        code=("process_registry",),
+    ),
+    Stage(
+        "zespoly_xlsx",
+        zespoly_xlsx,
+        {"zsp_podsumowanie": OptFrame, "zsp_szczegoly": OptFrame},
+        artifacts=(process_zsp_report.OUTPUT_PATH,),
+        code=("process_zsp_report",),
+    ),
+]
+
+
+# --- wykonanie ----------------------------------------------------------------------------
+
+
+def validate(stages: List[Stage]) -> Dict[str, Stage]:
+    """Sprawdź graf: unikalni producenci wyjść, zgodność typów wejść, brak cykli. Zwróć producenta każdej wartości."""
+    producers: Dict[str, Stage] = {}
+    for stage in stages:
+        for name in stage.outputs:
+            if name in producers:
+                raise ValueError(f"Wartość '{name}' produkują dwa etapy: {producers[name].name}, {stage.name}")
+            producers[name] = stage
+    for stage in stages:
+        for name, typ in stage.inputs.items():
+            if name not in producers:
+                raise ValueError(f"Etap {stage.name}: brak producenta wejścia '{name}'")
+            if producers[name].outputs[name] != typ:
+                raise TypeError(f"Etap {stage.name}: wejście '{name}' ma typ {typ}, a producent daje {producers[name].outputs[name]}")
+    order = topological_order(stages, producers)
+    if len(order) != len(stages):
+        raise ValueError("Graf etapów zawiera cykl")
+    return producers
+
+
+def topological_order(stages: List[Stage], producers: Dict[str, Stage]) -> List[Stage]:
+    done: set = set()
+    order: List[Stage] = []
+    remaining = list(stages)
+    while remaining:
+        ready = [s for s in remaining if all(producers[i].name in done for i in s.inputs)]
+        if not ready:
+            break
+        for stage in ready:
+            done.add(stage.name)
+            order.append(stage)
+            remaining.remove(stage)
+    return order
+
+
+def select(stages: List[Stage], targets: Optional[List[str]]) -> List[Stage]:
+    """Etapy potrzebne do policzenia wskazanych etapów (wraz z ich poprzednikami)."""
+    if not targets:
+        return list(stages)
+    producers = validate(stages)
+    by_name = {s.name: s for s in stages}
+    unknown = [t for t in targets if t not in by_name]
+    if unknown:
+        raise SystemExit(f"Nieznane etapy: {', '.join(unknown)} (dostępne: {', '.join(by_name)})")
+    needed: set = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        todo.extend(producers[i].name for i in by_name[name].inputs)
+    return [s for s in stages if s.name in needed]
+
+
+def _check_outputs(stage: Stage, result: Dict[str, object]):
+    missing = set(stage.outputs) - set(result)
+    if missing:
+        raise ValueError(f"Etap {stage.name} nie zwrócił: {', '.join(sorted(missing))}")
+    for name, typ in stage.outputs.items():
+        if not isinstance(result[name], typ):
+            raise TypeError(f"Etap {stage.name}: '{name}' ma typ {type(result[name]).__name__}, oczekiwano {typ}")
+
+
+def _run_stage(name: str, func: Callable[..., Dict[str, object]], kwargs: Dict[str, object]) -> Dict[str, object]:
+    """Etap w procesie puli: odcinek śladu i (dla --profile <etap>) cProfile wokół funkcji etapu."""
+    with instrumentation.span(name, kategoria="etap"), instrumentation.profiled(name):
+        return func(**kwargs)
+
+
+def execute(
+    plan: List[Stage],
+    values: Dict[str, object],
+    workers: int = 4,
+    executor: Optional[Executor] = None,
+    on_done: Optional[Callable[[Stage, Dict[str, object]], None]] = None,
+) -> Dict[str, object]:
+    """Wykonaj etapy planu; etap startuje, gdy wszystkie jego wejścia są w values (gotowe etapy równolegle)."""
+    pending = list(plan)
+    running: Dict[Future, Tuple[Stage, float, float]] = {}
+    own_executor = executor is None
+    pool = executor or ProcessPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            for stage in [s for s in pending if all(i in values for i in s.inputs)]:
+                kwargs = {name: values[name] for name in stage.inputs}
+                running[pool.submit(_run_stage, stage.name, stage.func, kwargs)] = (stage, time.perf_counter(), time.time())
+                pending.remove(stage)
+            if not running:
+                raise ValueError(f"Brak wejść dla etapów: {', '.join(s.name for s in pending)}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, started, wall = running.pop(future)
+                result = future.result()
+                _check_outputs(stage, result)
+                values.update(result)
+                if on_done is not None:
+                    on_done(stage, result)
+                # etapy gałęzi wykazu nic nie zapisują, gdy brak pliku źródłowego
+                written = ", ".join(str(p) for p in stage.artifacts if p.exists() and p.stat().st_mtime >= wall)
+                print(f"[{time.perf_counter() - started:6.2f} s] {stage.name}" + (f" -> {written}" if written else ""))
+    finally:
+        if own_executor:
+            pool.shutdown(cancel_futures=True)
+    return values
+
+
+def run(
+    stages: List[Stage] = STAGES,
+    targets: Optional[List[str]] = None,
+    workers: int = 4,
+    executor: Optional[Executor] = None,
+) -> Dict[str, object]:
+    """Pełne przeliczenie wskazanych etapów (bez cache). Zwraca wszystkie wartości."""
+    stages = select(stages, targets)
+    validate(stages)
+    return execute(stages, {}, workers, executor)
+
+
+def stage_records(stages: List[Stage], producers: Dict[str, Stage], stamps: Dict[str, dict]) -> Dict[str, dict]:
+    """Rekord etapu: skróty plików wejściowych, kodu i kluczy etapów nadrzędnych; 'key' = skrót całości."""
+    records: Dict[str, dict] = {}
+    for stage in topological_order(stages, producers):
+        record = {
+            "sources": {str(p): build_state.stamped_hash(p, stamps) for p in (stage.sources() if stage.sources else [])},
+            "code": {
+                "etap": build_state.function_hash(stage.func),
+                **{name: build_state.module_hash(name) for name in build_state.code_modules(stage.code)},
+            },
+            "upstream": {name: records[producers[name].name]["key"] for name in sorted(stage.inputs)},
+        }
+        record["key"] = build_state.digest(record)
+        records[stage.name] = record
+    return records
+
+
+def stale_stages(stages: List[Stage], records: Dict[str, dict], state: Dict[str, dict], stamps: Dict[str, dict]) -> List[Stage]:
+    """Etapy końcowe do przebudowy: inny klucz niż przy ostatnim zapisie albo artefakt zmieniony/usunięty."""
+    stale = []
+    for stage in stages:
+        if not stage.artifacts:
+            continue
+        saved = state.get(stage.name, {})
+        artifacts = {str(p): build_state.stamped_hash(p, stamps) for p in stage.artifacts}
+        if saved.get("key") != records[stage.name]["key"] or saved.get("artifacts") != artifacts:
+            stale.append(stage)
+    return stale
+
+
+def build(
+    stages: List[Stage] = STAGES,
+    targets: Optional[List[str]] = None,
+    workers: int = 4,
+    executor: Optional[Executor] = None,
+    force: bool = False,
+) -> List[str]:
+    """
+    Przyrostowa przebudowa: uruchom tylko etapy końcowe z nieaktualnym kluczem/artefaktem oraz te etapy
+    nadrzędne, których wyjść nie ma w cache. Zwraca nazwy wykonanych etapów.
+    """
+    stages = select(stages, targets)
+    producers = validate(stages)
+    stamps = build_state.load_stamps()
+    state = build_state.load_state()
+    records = stage_records(stages, producers, stamps)
+    targets_stale = stages if force else stale_stages(stages, records, state, stamps)
+    targets_stale = [s for s in targets_stale if s.artifacts]
+
+    plan: Dict[str, Stage] = {}
+    values: Dict[str, object] = {}
+    cached: set = set()
+    todo = list(targets_stale)
+    while todo:
+        stage = todo.pop()
+        if stage.name in plan:
+            continue
+        plan[stage.name] = stage
+        for name in stage.inputs:
+            producer = producers[name]
+            if producer.name in plan or producer.name in cached:
+                continue
+            outputs = None if force else build_state.load_outputs(producer.name, records[producer.name]["key"])
+            if outputs is not None:
+                values.update(outputs)
+                cached.add(producer.name)
+            else:
+                todo.append(producer)
+
+    if not plan:
+        build_state.save_stamps(stamps)
+        print("Wszystkie artefakty są aktualne.")
+        return []
+    if cached:
+        print(f"Z cache: {', '.join(sorted(cached))}")
+
+    def on_done(stage: Stage, result: Dict[str, object]):
+        key = records[stage.name]["key"]
+        if stage.outputs:
+            build_state.save_outputs(stage.name, key, result)
+        if stage.artifacts:
+            state[stage.name] = {
+                **records[stage.name],
+                "artifacts": {str(p): build_state.stamped_hash(p, stamps) for p in stage.artifacts},
+            }
+            build_state.save_state(state)
+            build_state.save_stamps(stamps)
+
+    order = [s for s in topological_order(stages, producers) if s.name in plan]
+    execute(order, values, workers, executor, on_done)
+    build_state.save_stamps(stamps)
+    return [s.name for s in order]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Przebudowa raportów jako potok etapów w pamięci.")
+    parser.add_argument(
+        "polecenie",
+        nargs="?",
+        default="build",
+        choices=["build", "rebuild", "status", "lista"],
+        help="build – tylko nieaktualne etapy (domyślnie), rebuild – wszystko od nowa, "
+        "status – które artefakty są nieaktualne, lista – graf etapów",
+    )
+    parser.add_argument("etapy", nargs="*", help="etapy docelowe (domyślnie wszystkie)")
+    parser.add_argument("--workers", type=int, default=4, help="liczba procesów (domyślnie 4)")
+    parser.add_argument("--sekwencyjnie", action="store_true", help="wykonaj etapy w jednym wątku")
+    parser.add_argument("--trace", type=Path, help="zapisz ślad czasów etapów/plików/stron (Trace Event JSON)")
+    parser.add_argument("--profile", action="append", default=[], metavar="ETAP", help="cProfile wokół etapu (można powtórzyć)")
+    args = parser.parse_args(argv)
+    instrumentation.enable(args.trace, args.profile)
+
+    if args.polecenie == "lista":
+        producers = validate(STAGES)
+        for stage in topological_order(STAGES, producers):
+            deps = sorted({producers[i].name for i in stage.inputs})
+            print(f"{stage.name:22s} <- {', '.join(deps) or '-'}")
+        return
+
+    if args.polecenie == "status":
+        stages = select(STAGES, args.etapy or None)
+        stamps = build_state.load_stamps()
+        records = stage_records(stages, validate(stages), stamps)
+        stale = {s.name for s in stale_stages(stages, records, build_state.load_state(), stamps)}
+        build_state.save_stamps(stamps)
+        for stage in stages:
+            if stage.artifacts:
+                print(f"{stage.name:22s} {'nieaktualny' if stage.name in stale else 'aktualny'}")
+        return
+
+    started = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=1) if args.sekwencyjnie else None
+    try:
+        build(targets=args.etapy or None, workers=args.workers, executor=executor, force=args.polecenie == "rebuild")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    print(f"Gotowe w {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import pandas as pd
 from pathlib import Path
 
+import instrumentation
+
 REGISTRY_FILE = Path("pobrane/Wykaz_szkół_i_placówek_oświatowych_30.09.2024_.xlsx")
 OUT_FILE = Path("raporty/placowki_registry.xlsx")
 
@@ -26,8 +28,10 @@ def classify_kind(typ_podmiotu: str) -> str:
     return "inne"
 
 
-def load_registry():
-    df = pd.read_excel(REGISTRY_FILE)
+def load_registry(path: Path = REGISTRY_FILE):
+    with instrumentation.span("wykaz.read_excel", plik=path):
+        df = pd.read_excel(path)
+    instrumentation.count("wiersze_wykazu", len(df))
     df["Rodzaj_kategorii"] = df["Typ podmiotu"].apply(classify_kind)
     return df
 
@@ -46,23 +50,32 @@ def summarize(df: pd.DataFrame, label: str) -> dict:
     return agg
 
 
-def main():
-    df = load_registry()
+def registry_tables(df: pd.DataFrame, powiat: str = POWIAT_FILTER, miasto: str = MIASTO_FILTER) -> dict:
+    """Arkusze raportu (nazwa -> DataFrame): detale i podsumowania powiatu i miasta (filtry: fragmenty nazw)."""
     # powiat
-    df_pow = df[df["Powiat"].str.contains(POWIAT_FILTER, case=False, na=False)].copy()
+    df_pow = df[df["Powiat"].str.contains(powiat, case=False, na=False)].copy()
     # miasto
-    df_miasto = df_pow[df_pow["Gmina"].str.contains(MIASTO_FILTER, case=False, na=False)].copy()
+    df_miasto = df_pow[df_pow["Gmina"].str.contains(miasto, case=False, na=False)].copy()
 
     sum_pow = summarize(df_pow, "Powiat raciborski")
     sum_miasto = summarize(df_miasto, "Miasto Racibórz")
+    return {
+        "powiat_raciborski_detailed": df_pow,
+        "miasto_raciborz_detailed": df_miasto,
+        "powiat_raciborski_podsumowanie": sum_pow,
+        "miasto_raciborz_podsumowanie": sum_miasto,
+    }
+
 
-    OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with pd.ExcelWriter(OUT_FILE, engine="openpyxl") as writer:
-        df_pow.to_excel(writer, sheet_name="powiat_raciborski_detailed", index=False)
-        df_miasto.to_excel(writer, sheet_name="miasto_raciborz_detailed", index=False)
-        sum_pow.to_excel(writer, sheet_name="powiat_raciborski_podsumowanie", index=False)
-        sum_miasto.to_excel(writer, sheet_name="miasto_raciborz_podsumowanie", index=False)
+def write_registry(tables: dict, path: Path = OUT_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with instrumentation.span("zapis.xlsx", plik=path), pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for sheet_name, df in tables.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
 
+
+def main():
+    write_registry(registry_tables(load_registry()))
     print(f"Zapisano {OUT_FILE}")
 
 
@@ -6,9 +6,12 @@ Analiza zespołów szkolno-przedszkolnych:
 """
 
 from pathlib import Path
+from typing import Optional
 
 import pandas as pd
 
+import instrumentation
+
 
 def build_address(row: pd.Series) -> str:
     """Składa adres z kolumn ulicy, numeru i poczty."""
@@ -37,11 +40,12 @@ def classify_child(type_name: str) -> str:
     return "inne"
 
 
-def main() -> None:
-    source_path = next(Path("pobrane").glob("Wykaz_szko*2024_.xlsx"))
-    output_path = Path("raporty") / "zespoly_szkolno_przedszkolne_analiza.xlsx"
+OUTPUT_PATH = Path("raporty") / "zespoly_szkolno_przedszkolne_analiza.xlsx"
+
 
-    df = pd.read_excel(source_path)
+def build_report(registry: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Zwraca (podsumowanie zespołów z formułą, szczegóły zespołów i składników)."""
+    df = registry.copy()
     df["adres"] = df.apply(build_address, axis=1)
 
     parent_mask = (
@@ -143,11 +147,26 @@ def main() -> None:
         "dzieci_wyliczone",
     ]
     details = pd.concat([parents, children], ignore_index=True)[details_cols]
+    return summary, details
 
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+
+def write_report(summary: pd.DataFrame, details: pd.DataFrame, output_path: Path = OUTPUT_PATH) -> None:
+    with instrumentation.span("zapis.xlsx", plik=output_path), pd.ExcelWriter(output_path, engine="openpyxl") as writer:
         summary.to_excel(writer, index=False, sheet_name="podsumowanie_zespolow")
         details.to_excel(writer, index=False, sheet_name="szczegoly_zrodlo")
 
+
+def find_registry(base: Path = Path("pobrane")) -> Path:
+    source_path = next(base.glob("Wykaz_szko*2024_.xlsx"), None)
+    if source_path is None:
+        raise SystemExit(f"Nie znaleziono wykazu placówek (Wykaz_szko*2024_.xlsx) w {base}")
+    return source_path
+
+
+def main(source_path: Optional[Path] = None, output_path: Path = OUTPUT_PATH) -> None:
+    summary, details = build_report(pd.read_excel(source_path or find_registry()))
+    write_report(summary, details, output_path)
+
     print(f"Zapisano raport: {output_path}")
     print("Top 5 zespołów (dzieci_wyliczone_wartosc):")
     print(
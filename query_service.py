@@ -0,0 +1,311 @@
+"""
+Lokalna usługa HTTP/JSON (tylko odczyt) nad bazą analityczną cache/analityka.sqlite (pipeline: baza_analityczna):
+  GET /placowki?teryt=2411011&rok=2024&typ=Przedszkole   zestawienia RZiS placówek (TERYT gminy lub prefiks)
+  GET /wykaz?powiat=raciborsk&gmina=Racibórz&wg=gmina     podsumowania wykazu (placówki, uczniowie, oddziały)
+  GET /zapotrzebowanie?teryt=2411&od=2025&do=2040&wariant=bazowy
+                                                          serie zapotrzebowania miejsc (100% grupy wieku) per rok
+  GET /stan                                               stan bazy i statystyki cache
+- odpowiedzi (gotowy JSON) trzymane w ograniczonym cache LRU; przebudowa bazy (atomowa podmiana pliku,
+  inny i-węzeł / mtime) czyści cache i otwiera połączenia od nowa przy najbliższym zapytaniu,
+- połączenie SQLite tylko do odczytu per wątek, HTTP/1.1 z keep-alive (wątek na połączenie).
+
+  python query_service.py [--port 8800]
+  python query_service.py obciazenie --url http://127.0.0.1:8800 --klienci 16 --zapytania 200
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+import urllib.parse
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DB_PATH = Path("cache/analityka.sqlite")  # = analytics_store.DB_PATH (bez importu pandas)
+PORT = 8800
+CACHE_SIZE = 1024  # liczba zapamiętanych odpowiedzi
+WARIANTY = ("bazowy", "niski", "wysoki")
+
+# grupa zapotrzebowania -> przedział wieku (jak kolumny miejsca_* w build_demand; gminy: tylko 0–9 / 10–19)
+GRUPY_POPYTU: Dict[str, Tuple[int, int]] = {
+    "miejsca_zlobek": (0, 2),
+    "miejsca_przedszkole": (3, 6),
+    "miejsca_szkola": (7, 18),
+    "dzieci_0_9": (0, 9),
+    "dzieci_10_19": (10, 19),
+}
+
+
+class BadRequest(ValueError):
+    """Niepoprawne parametry zapytania (odpowiedź 400)."""
+
+
+class Store:
+    """Baza tylko do odczytu: połączenie per wątek, wykrywanie przebudowy pliku (i-węzeł, mtime, rozmiar)."""
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = Path(path)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stamp: Optional[tuple] = None
+        self.generation = 0
+
+    def check(self) -> int:
+        """Generacja bazy; nowa po przebudowie pliku (wtedy cache odpowiedzi jest czyszczony)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Brak bazy {self.path} – uruchom: python pipeline.py build baza_analityczna")
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self.stamp:
+            with self.lock:
+                if stamp != self.stamp:
+                    self.stamp = stamp
+                    self.generation += 1
+                    cached_response.cache_clear()
+        return self.generation
+
+    def connection(self) -> sqlite3.Connection:
+        con, generation = getattr(self.local, "con", None), getattr(self.local, "generation", None)
+        if con is None or generation != self.generation:
+            if con is not None:
+                con.close()
+            con = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self.local.con, self.local.generation = con, self.generation
+        return con
+
+    def rows(self, sql: str, params=()) -> List[dict]:
+        cur = self.connection().execute(sql, params)
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+STORE = Store()
+
+
+def _int(params: Dict[str, str], name: str, default: Optional[int] = None) -> Optional[int]:
+    value = params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f"parametr '{name}' musi być liczbą całkowitą")
+
+
+def placowki(params: Dict[str, str]) -> dict:
+    teryt = params.get("teryt", "")
+    if teryt and not teryt.isdigit():
+        raise BadRequest("teryt: same cyfry (gmina 7, powiat 4 lub prefiks)")
+    sql = """
+        SELECT p.teryt, s.* FROM rzis_podsumowanie s JOIN placowki p USING (placowka)
+        WHERE p.teryt LIKE :teryt || '%' AND (:rok IS NULL OR s.rok = :rok) AND (:typ IS NULL OR s.typ = :typ)
+        ORDER BY s.placowka, s.rok
+    """
+    rows = STORE.rows(sql, {"teryt": teryt, "rok": _int(params, "rok"), "typ": params.get("typ")})
+    return {"liczba": len(rows), "placowki": rows}
+
+
+def wykaz(params: Dict[str, str]) -> dict:
+    wg = params.get("wg", "kategoria")
+    if wg not in ("kategoria", "gmina", "powiat"):
+        raise BadRequest("wg: kategoria / gmina / powiat")
+    sql = f"""
+        SELECT {wg}, COUNT(*) AS placowki, SUM(ucz_ogolem) AS uczniowie, SUM(ucz_dziewczeta) AS dziewczeta,
+               SUM(oddz_przedszk) AS oddzialy_przedszkolne, SUM(lb_oddz) AS oddzialy
+        FROM wykaz
+        WHERE powiat LIKE '%' || :powiat || '%' AND gmina LIKE '%' || :gmina || '%'
+        GROUP BY {wg} ORDER BY placowki DESC
+    """
+    rows = STORE.rows(sql, {"powiat": params.get("powiat", ""), "gmina": params.get("gmina", "")})
+    return {"wg": wg, "grupy": rows}
+
+
+def zapotrzebowanie(params: Dict[str, str]) -> dict:
+    teryt = params.get("teryt", "")
+    if not teryt.isdigit():
+        raise BadRequest("teryt: wymagany kod jednostki (np. 2411 albo 2411011)")
+    wariant = params.get("wariant", "bazowy")
+    if wariant not in WARIANTY:
+        raise BadRequest(f"wariant: {' / '.join(WARIANTY)}")
+    od, do = _int(params, "od", 0), _int(params, "do", 9999)
+    grupy = " UNION ALL ".join("SELECT ?, ?, ?" for _ in GRUPY_POPYTU)
+    # grupa ma wartość tylko, gdy przedziały wieku jednostki pokrywają ją w całości (gminy: brak 0–2 / 3–6)
+    sql = f"""
+        WITH grupy(grupa, lo, hi) AS ({grupy})
+        SELECT p.rok, g.grupa,
+               CASE WHEN SUM(p.wiek_do - p.wiek_od + 1) = g.hi - g.lo + 1 THEN SUM(p.liczba) END AS liczba
+        FROM gus_prognoza p JOIN grupy g ON p.wiek_od >= g.lo AND p.wiek_do <= g.hi
+        WHERE p.teryt = ? AND p.wariant = ? AND p.plec = 'ogolem' AND p.wiek <> 'ogolem' AND p.rok BETWEEN ? AND ?
+        GROUP BY p.rok, g.grupa
+        ORDER BY p.rok
+    """
+    args = [v for grupa, (lo, hi) in GRUPY_POPYTU.items() for v in (grupa, lo, hi)] + [teryt, wariant, od, do]
+    rows = STORE.rows(sql, args)
+    if not rows:
+        raise LookupError(f"Brak prognozy dla TERYT {teryt} ({wariant}) w latach {od}–{do}")
+    lata = sorted({r["rok"] for r in rows})
+    values = {(r["rok"], r["grupa"]): r["liczba"] for r in rows}
+    serie = {g: [values.get((rok, g)) for rok in lata] for g in GRUPY_POPYTU}
+    return {"teryt": teryt, "wariant": wariant, "lata": lata, "serie": {g: v for g, v in serie.items() if any(x is not None for x in v)}}
+
+
+ENDPOINTS = {"/placowki": placowki, "/wykaz": wykaz, "/zapotrzebowanie": zapotrzebowanie}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_response(generation: int, path: str, query: Tuple[Tuple[str, str], ...]) -> bytes:
+    """Gotowa odpowiedź JSON; klucz zawiera generację bazy, a przebudowa i tak czyści cały cache."""
+    return json.dumps(ENDPOINTS[path](dict(query)), ensure_ascii=False).encode("utf-8")
+
+
+def status() -> dict:
+    info = cached_response.cache_info()
+    return {
+        "baza": str(STORE.path),
+        "generacja": STORE.generation,
+        "zmieniono": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(STORE.stamp[1] / 1e9)) if STORE.stamp else None,
+        "cache": {"trafienia": info.hits, "chybienia": info.misses, "rozmiar": info.currsize, "limit": info.maxsize},
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: pulpity wysyłają serie zapytań jednym połączeniem
+    disable_nagle_algorithm = True  # nagłówki i treść to osobne zapisy – bez TCP_NODELAY czekają na opóźnione ACK
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, code: int, body: bytes):
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def error(self, code: int, message: str):
+        self.send_json(code, json.dumps({"blad": message}, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        try:
+            generation = STORE.check()
+            if url.path == "/stan":
+                self.send_json(200, json.dumps(status(), ensure_ascii=False).encode("utf-8"))
+                return
+            if url.path not in ENDPOINTS:
+                self.error(404, f"nieznany adres {url.path}; dostępne: {', '.join([*ENDPOINTS, '/stan'])}")
+                return
+            # kolejność parametrów nie zmienia klucza cache
+            query = tuple(sorted(urllib.parse.parse_qsl(url.query)))
+            self.send_json(200, cached_response(generation, url.path, query))
+        except BadRequest as exc:
+            self.error(400, str(exc))
+        except LookupError as exc:
+            self.error(404, str(exc))
+        except FileNotFoundError as exc:
+            self.error(503, str(exc))
+        except sqlite3.Error as exc:
+            self.error(503, f"baza niedostępna: {exc}")
+
+
+def serve(port: int = PORT, host: str = "127.0.0.1", path: Path = DB_PATH) -> ThreadingHTTPServer:
+    STORE.path = Path(path)
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def load_test(url: str, klienci: int = 16, zapytania: int = 200, adresy: Optional[List[str]] = None) -> dict:
+    """Równoległe zapytania (klient = wątek z własnym połączeniem keep-alive); opóźnienia p50/p99 [ms]."""
+    import http.client
+
+    parts = urllib.parse.urlsplit(url)
+    adresy = adresy or [
+        "/placowki?teryt=2411011&rok=2024",
+        "/placowki?teryt=2411&typ=Przedszkole",
+        "/zapotrzebowanie?teryt=2411&od=2025&do=2040",
+        "/zapotrzebowanie?teryt=2411011",
+        "/zapotrzebowanie?teryt=2412&wariant=niski",
+        "/wykaz?powiat=raciborsk&wg=gmina",
+    ]
+    czasy: List[float] = []
+    bledy: List[str] = []
+    lock = threading.Lock()
+
+    def klient(k: int):
+        conn = http.client.HTTPConnection(parts.netloc, timeout=10)
+        local, errors = [], []
+        for i in range(zapytania):
+            path = adresy[(k + i) % len(adresy)]
+            start = time.perf_counter()
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            local.append((time.perf_counter() - start) * 1000)
+            if resp.status >= 500:
+                errors.append(f"{path}: HTTP {resp.status}")
+        conn.close()
+        with lock:
+            czasy.extend(local)
+            bledy.extend(errors)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=klient, args=(k,)) for k in range(klienci)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    q = statistics.quantiles(czasy, n=100)
+    return {
+        "zapytania": len(czasy),
+        "na_sekunde": round(len(czasy) / elapsed),
+        "p50_ms": round(q[49], 2),
+        "p99_ms": round(q[98], 2),
+        "max_ms": round(max(czasy), 2),
+        "bledy": len(bledy),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokalna usługa JSON: zestawienia placówek, wykaz, zapotrzebowanie.")
+    parser.add_argument("polecenie", nargs="?", default="serwuj", choices=["serwuj", "obciazenie"])
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--baza", type=Path, default=DB_PATH)
+    parser.add_argument("--url", help="obciazenie: adres działającej usługi (domyślnie usługa uruchamiana w tle)")
+    parser.add_argument("--klienci", type=int, default=16)
+    parser.add_argument("--zapytania", type=int, default=200, help="zapytań na klienta")
+    args = parser.parse_args()
+
+    if args.polecenie == "obciazenie":
+        server = None
+        if args.url is None:
+            server = serve(0, args.host, args.baza)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            args.url = f"http://{args.host}:{server.server_address[1]}"
+        print(json.dumps(load_test(args.url, args.klienci, args.zapytania), ensure_ascii=False))
+        if server is not None:
+            print(json.dumps(status()["cache"], ensure_ascii=False))
+            server.shutdown()
+        return
+
+    server = serve(args.port, args.host, args.baza)
+    print(f"Usługa: http://{args.host}:{args.port} (/placowki, /wykaz, /zapotrzebowanie, /stan; Ctrl+C kończy)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
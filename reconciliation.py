@@ -0,0 +1,363 @@
+"""
+Uzgodnienia między sprawozdaniami (RZiS, bilans, zestawienie zmian w funduszu) dla wszystkich placówek naraz:
+- każdy PDF sprowadzany do wierszy (sprawozdanie, pozycja, prev_year, current_year), gdzie pozycja to kod
+  wiersza ("L", "I.2.1", a w bilansie z prefiksem strony: "A:B.I", "P:A.II", "P:SUMA"),
+- reguły są deklaratywne: dwie strony równania jako sumy składników (sprawozdanie, pozycja, kolumna, znak)
+  z tolerancją, np. wynik netto z RZiS = pozycja A.II pasywów bilansu,
+- ocena reguł to złączenia tabel (reguły × sprawozdania placówek × wartości) i jedno groupby – bez pętli
+  po placówkach; brak wiersza w złożonym sprawozdaniu liczy się jako 0, brak sprawozdania wyłącza regułę,
+- wynik: tabela niezgodności (placówka, rok, reguła, obie strony, różnica) dla dokumentu z uwagami.
+W bilansie "prev_year" to stan na początek roku, a "current_year" – na koniec roku.
+RZiS nie jest czytany osobno: wiersze z kodami powstają z wyniku analyze_financials.parse_rzis_pdf (ta sama
+ocena warstwy tekstowej i OCR, ten sam cache w potoku). Sprawozdanie ze stroną bez warstwy tekstowej, której
+nie odczytano, jest pomijane w uzgodnieniach (jak niezłożone) – brakujący wiersz nie udaje zera.
+"""
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import analyze_financials
+import instrumentation
+import text_layer
+
+OUT_XLSX = Path("raporty/uzgodnienia_sprawozdan.xlsx")
+# tolerancja (PLN) – zaokrąglenia groszowe w sprawozdaniach
+TOLERANCJA = 0.01
+
+RZIS = "RZiS"
+BILANS = "Bilans"
+ZZF = "ZZF"
+BO, BZ = "prev_year", "current_year"
+
+KOD_NA_POCZATKU = re.compile(r"^([A-Z]{1,3}(?:\.(?:[IVX]+|\d+))*)\.?(?:\s|$)")
+# etykiety łamane w PDF: kod w środku tekstu, np. "Nieodpłatnie otrzymane ... I.1.6. niematerialne"
+KOD_W_SRODKU = re.compile(r"(?:^|\s)([A-Z]{1,3}(?:\.(?:[IVX]+|\d+))+)\.?(?=\s|$)")
+
+
+Skladnik = Tuple[str, str, str, int]  # (sprawozdanie, pozycja, kolumna, znak)
+
+
+@dataclass(frozen=True)
+class Regula:
+    nazwa: str
+    opis: str
+    lewa: Tuple[Skladnik, ...]
+    prawa: Tuple[Skladnik, ...]
+    tolerancja: float = TOLERANCJA
+
+
+def _s(sprawozdanie: str, pozycja: str, kolumna: str = BZ, znak: int = 1) -> Skladnik:
+    return (sprawozdanie, pozycja, kolumna, znak)
+
+
+REGULY: List[Regula] = [
+    Regula(
+        "wynik_rzis_bilans",
+        "Wynik netto w RZiS = wynik finansowy netto w pasywach bilansu (A.II)",
+        (_s(RZIS, "L"),),
+        (_s(BILANS, "P:A.II"),),
+    ),
+    Regula(
+        "wynik_rzis_bilans_bo",
+        "Wynik netto roku poprzedniego w RZiS = pasywa A.II bilansu na początek roku",
+        (_s(RZIS, "L", BO),),
+        (_s(BILANS, "P:A.II", BO),),
+    ),
+    Regula(
+        "wynik_rzis_zzf",
+        "Wynik netto w RZiS = wynik finansowy netto w zestawieniu zmian w funduszu (III)",
+        (_s(RZIS, "L"),),
+        (_s(ZZF, "III"),),
+    ),
+    Regula(
+        "wynik_ubiegly_zzf",
+        "Zysk (I.1.1) − strata (I.2.1) za rok ubiegły w ZZF = wynik netto roku poprzedniego w RZiS",
+        (_s(ZZF, "I.1.1"), _s(ZZF, "I.2.1", znak=-1)),
+        (_s(RZIS, "L", BO),),
+    ),
+    Regula(
+        "fundusz_bz_bilans",
+        "Fundusz jednostki na koniec okresu w ZZF (II) = pasywa A.I bilansu na koniec roku",
+        (_s(ZZF, "II"),),
+        (_s(BILANS, "P:A.I"),),
+    ),
+    Regula(
+        "fundusz_bo_bilans",
+        "Fundusz jednostki na początek okresu w ZZF (I) = pasywa A.I bilansu na początek roku",
+        (_s(ZZF, "I"),),
+        (_s(BILANS, "P:A.I", BO),),
+    ),
+    Regula(
+        "fundusze_bilans",
+        "Fundusz po wyniku w ZZF (IV) = fundusze w pasywach bilansu (A)",
+        (_s(ZZF, "IV"),),
+        (_s(BILANS, "P:A"),),
+    ),
+    Regula(
+        "zmiany_funduszu",
+        "ZZF: fundusz BO (I) + zwiększenia (I.1) − zmniejszenia (I.2) = fundusz BZ (II)",
+        (_s(ZZF, "I"), _s(ZZF, "I.1"), _s(ZZF, "I.2", znak=-1)),
+        (_s(ZZF, "II"),),
+    ),
+    Regula(
+        "fundusz_po_wyniku",
+        "ZZF: fundusz BZ (II) + wynik netto (III) = fundusz po wyniku (IV)",
+        (_s(ZZF, "II"), _s(ZZF, "III")),
+        (_s(ZZF, "IV"),),
+    ),
+    Regula(
+        "ciaglosc_funduszu",
+        "ZZF: fundusz BO roku bieżącego (I) = fundusz BZ roku poprzedniego (II)",
+        (_s(ZZF, "I"),),
+        (_s(ZZF, "II", BO),),
+    ),
+    Regula(
+        "suma_bilansowa",
+        "Bilans: suma aktywów = suma pasywów (koniec roku)",
+        (_s(BILANS, "A:SUMA"),),
+        (_s(BILANS, "P:SUMA"),),
+    ),
+    Regula(
+        "suma_bilansowa_bo",
+        "Bilans: suma aktywów = suma pasywów (początek roku)",
+        (_s(BILANS, "A:SUMA", BO),),
+        (_s(BILANS, "P:SUMA", BO),),
+    ),
+    Regula(
+        "aktywa_razem",
+        "Bilans: aktywa trwałe (A) + aktywa obrotowe (B) = suma aktywów",
+        (_s(BILANS, "A:A"), _s(BILANS, "A:B")),
+        (_s(BILANS, "A:SUMA"),),
+    ),
+    Regula(
+        "pasywa_razem",
+        "Bilans: fundusze (A) + fundusze placówek (B) + fundusze celowe (C) + zobowiązania (D) = suma pasywów",
+        (_s(BILANS, "P:A"), _s(BILANS, "P:B"), _s(BILANS, "P:C"), _s(BILANS, "P:D")),
+        (_s(BILANS, "P:SUMA"),),
+    ),
+    Regula(
+        "fundusze_struktura",
+        "Bilans: fundusze (A) = fundusz jednostki (A.I) + wynik (A.II) + odpisy z wyniku (A.III) + mienie zlikwidowanych (A.IV)",
+        (_s(BILANS, "P:A.I"), _s(BILANS, "P:A.II"), _s(BILANS, "P:A.III"), _s(BILANS, "P:A.IV")),
+        (_s(BILANS, "P:A"),),
+    ),
+]
+
+
+def statement_kind(path: str) -> Optional[str]:
+    """Rodzaj sprawozdania z nazwy pliku (informacja dodatkowa i inne pliki -> None)."""
+    name = Path(path).name.lower()
+    if "rachunek" in name:
+        return RZIS
+    if "bilans" in name:
+        return BILANS
+    if "zestawienie" in name and "fundusz" in name:
+        return ZZF
+    return None
+
+
+def collect_statement_files(rok: Optional[int] = 2024, base_dirs: Optional[List[Path]] = None) -> List[str]:
+    """PDF-y RZiS, bilansów i zestawień zmian w funduszu za dany rok (None = wszystkie lata)."""
+    return analyze_financials.collect_pdf_files(lambda name: statement_kind(name) is not None, rok, base_dirs)
+
+
+def line_code(label: str) -> Optional[str]:
+    """Kod wiersza sprawozdania z etykiety: 'A.II.1 Środki trwałe' -> 'A.II.1', 'Suma aktywów' -> 'SUMA'."""
+    if label.lower().startswith("suma "):
+        return "SUMA"
+    match = KOD_NA_POCZATKU.match(label) or KOD_W_SRODKU.search(label)
+    return match.group(1) if match else None
+
+
+def _segments(cells: List[Optional[str]]) -> List[Tuple[str, List[str]]]:
+    """
+    Podziel wiersz tabeli na bloki (etykieta, komórki liczbowe): bilans ma obok siebie aktywa i pasywa
+    (etykieta, BO, BZ, etykieta, BO, BZ), pozostałe sprawozdania – jeden blok. None to komórki scalone.
+    """
+    blocks: List[Tuple[str, List[str]]] = []
+    for cell in cells:
+        if cell is None:
+            continue
+        text = cell.strip()
+        if text and analyze_financials.parse_number(text) is None:
+            blocks.append((analyze_financials.clean_label(text), []))
+        elif blocks:
+            blocks[-1][1].append(text)
+    return blocks
+
+
+def rzis_statement_rows(rows: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Wiersze RZiS z parse_rzis_pdf -> wiersze z kodem pozycji; [] gdy któraś strona pozostała nieodczytana."""
+    if any(row.get("zrodlo") == text_layer.NIECZYTELNE for row in rows):
+        instrumentation.count("uzgodnienia.pominiete_skany")
+        return []
+    coded = []
+    for row in rows:
+        code = line_code(row["label"])
+        if code is None:
+            continue
+        coded.append({"pozycja": code, "label": row["label"], "prev_year": row["prev_year"], "current_year": row["current_year"]})
+    return coded
+
+
+def parse_statement_pdf(
+    path: str, parse_rzis: Callable[[str], List[Dict[str, object]]] = analyze_financials.parse_rzis_pdf
+) -> List[Dict[str, object]]:
+    """
+    Wiersze sprawozdania z kodem pozycji: pozycja, label, prev_year, current_year. RZiS przez parse_rzis
+    (wynik może pochodzić z cache potoku); bilans i ZZF ze stroną-skanem -> [] (pominięte w uzgodnieniach).
+    """
+    if statement_kind(path) == RZIS:
+        return rzis_statement_rows(parse_rzis(path))
+
+    import pdfplumber
+
+    bilans = statement_kind(path) == BILANS
+    rows: List[Dict[str, object]] = []
+    with instrumentation.span("sprawozdanie.pdf", plik=path), pdfplumber.open(path) as pdf:
+        for nr, page in enumerate(pdf.pages, 1):
+            if text_layer.triage(page, nr).do_ocr:
+                # tabel bilansu/ZZF z OCR nie składamy – niepełne sprawozdanie dałoby fałszywe niezgodności
+                print(f"  ! {path}: strona {nr} bez warstwy tekstowej – sprawozdanie pominięte w uzgodnieniach")
+                instrumentation.count("uzgodnienia.pominiete_skany")
+                return []
+            with instrumentation.span("sprawozdanie.strona", nr=nr):
+                tables = page.extract_tables()
+            instrumentation.count("strony")
+            instrumentation.count("tabele", len(tables))
+            for table in tables:
+                instrumentation.count("wiersze", len(table))
+                for raw_row in table:
+                    for side, (label, cells) in enumerate(_segments(raw_row or [])):
+                        code = line_code(label)
+                        if code is None or len(cells) < 2:
+                            continue
+                        if bilans:
+                            code = ("A:" if side == 0 else "P:") + code
+                        rows.append(
+                            {
+                                "pozycja": code,
+                                "label": label,
+                                "prev_year": analyze_financials.parse_number(cells[0]),
+                                "current_year": analyze_financials.parse_number(cells[1]),
+                            }
+                        )
+    return rows
+
+
+def load_statements(
+    files: Optional[List[str]] = None, parse: Callable[[str], List[Dict[str, object]]] = parse_statement_pdf
+) -> pd.DataFrame:
+    """Wszystkie sprawozdania w jednej długiej tabeli: placowka, rok, sprawozdanie, pozycja, prev_year, current_year."""
+    files = files if files is not None else collect_statement_files()
+    frames = []
+    for pdf_path in files:
+        rows = pd.DataFrame(parse(pdf_path), columns=["pozycja", "label", "prev_year", "current_year"])
+        frames.append(
+            rows.assign(
+                placowka=analyze_financials.normalize_name_from_dir(str(Path(pdf_path).parent)),
+                rok=analyze_financials.statement_year(pdf_path),
+                sprawozdanie=statement_kind(pdf_path),
+            )
+        )
+    columns = ["placowka", "rok", "sprawozdanie", "pozycja", "label", "prev_year", "current_year"]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    statements = pd.concat(frames, ignore_index=True)[columns]
+    # pierwsze wystąpienie kodu w sprawozdaniu (nagłówki i stopki powtarzane na kolejnych stronach)
+    return statements.drop_duplicates(["placowka", "rok", "sprawozdanie", "pozycja"]).reset_index(drop=True)
+
+
+def rules_frame(rules: List[Regula] = REGULY) -> pd.DataFrame:
+    """Reguły jako tabela składników: regula, strona (lewa/prawa), sprawozdanie, pozycja, kolumna, znak."""
+    return pd.DataFrame(
+        [
+            (rule.nazwa, strona, *term)
+            for rule in rules
+            for strona, terms in (("lewa", rule.lewa), ("prawa", rule.prawa))
+            for term in terms
+        ],
+        columns=["regula", "strona", "sprawozdanie", "pozycja", "kolumna", "znak"],
+    )
+
+
+def check(statements: pd.DataFrame, rules: List[Regula] = REGULY) -> pd.DataFrame:
+    """
+    Oceń wszystkie reguły dla wszystkich placówek i lat: placowka, rok, regula, opis, lewa, prawa, roznica, zgodne.
+    Reguła jest liczona tylko tam, gdzie placówka złożyła wszystkie sprawozdania, których dotyczy.
+    """
+    terms = rules_frame(rules)
+    values = statements.melt(
+        id_vars=["placowka", "rok", "sprawozdanie", "pozycja"],
+        value_vars=[BO, BZ],
+        var_name="kolumna",
+        value_name="wartosc",
+    )
+    filed = statements[["placowka", "rok", "sprawozdanie"]].drop_duplicates()
+
+    # składnik × złożone sprawozdanie placówki; brak wiersza w złożonym sprawozdaniu = 0
+    grid = terms.merge(filed, on="sprawozdanie")
+    grid = grid.merge(values, on=["placowka", "rok", "sprawozdanie", "pozycja", "kolumna"], how="left")
+    grid["wartosc"] = grid["wartosc"].astype(float).fillna(0.0) * grid["znak"]
+
+    keys = ["regula", "placowka", "rok"]
+    required = terms.groupby("regula")["sprawozdanie"].nunique().rename("wymagane")
+    present = grid.groupby(keys)["sprawozdanie"].nunique().rename("zlozone").reset_index()
+    sides = grid.pivot_table(index=keys, columns="strona", values="wartosc", aggfunc="sum", fill_value=0.0).reset_index()
+    result = sides.merge(present, on=keys).merge(required, left_on="regula", right_index=True)
+    result = result[result["zlozone"] == result["wymagane"]].copy()
+
+    meta = pd.DataFrame(
+        [(r.nazwa, r.opis, r.tolerancja) for r in rules], columns=["regula", "opis", "tolerancja"]
+    )
+    result = result.merge(meta, on="regula")
+    result["roznica"] = (result["lewa"] - result["prawa"]).round(2)
+    result["zgodne"] = result["roznica"].abs() <= result["tolerancja"]
+    order = {rule.nazwa: i for i, rule in enumerate(rules)}
+    result = result.sort_values(["placowka", "rok", "regula"], key=lambda s: s.map(order) if s.name == "regula" else s)
+    return result[["placowka", "rok", "regula", "opis", "lewa", "prawa", "roznica", "tolerancja", "zgodne"]].reset_index(
+        drop=True
+    )
+
+
+def violations(checks: pd.DataFrame) -> pd.DataFrame:
+    """Niezgodności (reguły niespełnione w granicach tolerancji), od największej różnicy."""
+    out = checks[~checks["zgodne"]].drop(columns="zgodne")
+    return out.reindex(out["roznica"].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+
+def coverage(checks: pd.DataFrame) -> pd.DataFrame:
+    """Liczba placówek, dla których reguła była sprawdzona, i liczba niezgodności – per reguła."""
+    return (
+        checks.groupby("regula", sort=False)
+        .agg(sprawdzone=("zgodne", "size"), niezgodne=("zgodne", lambda s: int((~s).sum())))
+        .reset_index()
+    )
+
+
+def write_reconciliation(statements: pd.DataFrame, checks: pd.DataFrame, path: Path = OUT_XLSX):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with instrumentation.span("zapis.xlsx", plik=path), pd.ExcelWriter(path, engine="openpyxl") as writer:
+        violations(checks).to_excel(writer, sheet_name="Niezgodnosci", index=False)
+        coverage(checks).to_excel(writer, sheet_name="Reguly", index=False)
+        checks.to_excel(writer, sheet_name="Wszystkie_uzgodnienia", index=False)
+        statements.to_excel(writer, sheet_name="Pozycje", index=False)
+
+
+def main():
+    statements = load_statements()
+    checks = check(statements)
+    write_reconciliation(statements, checks)
+    found = violations(checks)
+    print(f"Sprawdzono uzgodnień: {len(checks)}, niezgodności: {len(found)}")
+    if not found.empty:
+        print(found[["placowka", "regula", "lewa", "prawa", "roznica"]].to_string(index=False))
+    print(f"Zapisano {OUT_XLSX}")
+
+
+if __name__ == "__main__":
+    main()
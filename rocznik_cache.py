@@ -0,0 +1,350 @@
+"""
+Jednorazowe wczytanie tablic Rocznika Demograficznego 2025 (.xls/.xlsx) do długiego formatu Parquet:
+- dla każdej tablicy wykrywa strukturę wielowierszowego, dwujęzycznego nagłówka,
+- zapisuje wiersze: region, sex, age, year, measure, value (jeden plik Parquet na tablicę),
+- cache jest kluczowany skrótem SHA-256 pliku źródłowego i wersją parsera (PARSER_VERSION); kolejne odczyty
+  to tylko odczyt Parquet, a katalogi starszych wersji tego samego skoroszytu są usuwane po udanym wczytaniu.
+"""
+
+import hashlib
+import json
+import re
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+ROCZNIK_DIR = Path("pobrane/Rocznik2025")
+CACHE_DIR = Path("cache/rocznik2025")
+STAMPS_FILE = CACHE_DIR / "stamps.json"
+COLUMNS = ["region", "sex", "age", "year", "measure", "value"]
+# podnieść przy każdej zmianie parse_sheet / formatu Parquet – wymusza ponowne wczytanie skoroszytów
+# (build_state.module_hash nie wchodzi w grę: build_state importuje ten moduł)
+PARSER_VERSION = 1
+
+REGIONY = [
+    "Dolnośląskie",
+    "Kujawsko-pomorskie",
+    "Lubelskie",
+    "Lubuskie",
+    "Łódzkie",
+    "Małopolskie",
+    "Mazowieckie",
+    "Opolskie",
+    "Podkarpackie",
+    "Podlaskie",
+    "Pomorskie",
+    "Śląskie",
+    "Świętokrzyskie",
+    "Warmińsko-mazurskie",
+    "Wielkopolskie",
+    "Zachodniopomorskie",
+]
+_REGION_KEYS = {r.lower(): r for r in REGIONY}
+_MISSING = {"", "-", "–", "—", ".", "x", "nan"}
+
+
+def clean_label(value) -> str:
+    """Zamień wartość komórki na tekst z pojedynczymi spacjami."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return re.sub(r"\s+", " ", str(value).replace("\xa0", " ")).strip()
+
+
+def parse_value(value) -> Optional[float]:
+    """Liczba z komórki; odrzuca kreski/kropki GUS i odcina odnośniki literowe (np. '23767b')."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return None if pd.isna(value) else float(value)
+    text = clean_label(value).replace(" ", "").replace(",", ".")
+    if text.lower() in _MISSING:
+        return None
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)[a-z]*", text)
+    return float(match.group(1)) if match else None
+
+
+def parse_year(text: str) -> Optional[int]:
+    match = re.fullmatch(r"((?:19|20)\d\d)(?:\.0)?[a-z*]*", text.replace(" ", ""))
+    return int(match.group(1)) if match else None
+
+
+def parse_age(text: str, bare_numbers: bool = False) -> Optional[str]:
+    """Znormalizowana etykieta wieku: '0', '1-4', '85+', '<=19' albo None."""
+    norm = text.lower().replace("–", "-").replace("—", "-").replace(" ", "")
+    if m := re.match(r"^(\d{1,3})-(\d{1,3})(lat|lata)?(\b|$|[a-z])", norm):
+        return f"{int(m.group(1))}-{int(m.group(2))}"
+    if m := re.match(r"^(\d{1,3})(lat|lata)?i(więcej|wiecej)", norm):
+        return f"{int(m.group(1))}+"
+    if m := re.match(r"^(\d{1,3})(lat|lata)?imniej", norm):
+        return f"<={int(m.group(1))}"
+    if m := re.match(r"^(\d{1,3})(lat|lata|rok)(?!i)", norm):
+        return str(int(m.group(1)))
+    if m := re.fullmatch(r"(\d{1,3})", norm):
+        if bare_numbers:
+            return str(int(m.group(1)))
+    return None
+
+
+def parse_sex(text: str) -> Optional[str]:
+    norm = text.lower()
+    if re.search(r"kobiet|females|feamles|dziewcz", norm):
+        return "K"
+    if re.search(r"mężczy|males|chłopcy", norm):
+        return "M"
+    return None
+
+
+def parse_region(text: str) -> Optional[str]:
+    norm = text.lower().replace("–", "-").strip()
+    if norm.replace(" ", "").startswith("polska"):
+        return "Polska"
+    return _REGION_KEYS.get(norm)
+
+
+def label_kind(label: str) -> Optional[str]:
+    """Etykiety zmieniające kontekst kolejnych wierszy: podział miasta/wieś, płeć, 'Ogółem'."""
+    norm = label.lower()
+    if norm.startswith(("miasta", "wieś")):
+        return "obszar"
+    if re.match(r"^(w tym )?(mężczyźni|kobiety)", norm):
+        return "plec"
+    if norm.startswith(("ogółem", "razem")):
+        return "ogolem"
+    return None
+
+
+def _is_section(label: str) -> bool:
+    letters = [ch for ch in label if ch.isalpha()]
+    return bool(letters) and all(ch.isupper() for ch in letters)
+
+
+def detect_layout(raw: pd.DataFrame) -> Tuple[str, int, int, List[int]]:
+    """Zwróć (tytuł, pierwszy wiersz nagłówka, pierwszy wiersz danych, kolumny etykiet)."""
+    cells = raw.map(clean_label)
+    col0 = cells[0].tolist()
+    title_row = next((i for i, v in enumerate(col0) if v.upper().startswith("TABL")), 0)
+    title = col0[title_row]
+    back_rows = [i for i, v in enumerate(col0) if v.lower().startswith("return to")]
+    header_start = (back_rows[0] + 1) if back_rows else title_row + 1
+    while header_start < len(cells) and not any(cells.iloc[header_start]):
+        header_start += 1
+
+    data_start = len(cells)
+    for r in range(header_start + 1, len(cells)):
+        row = [v for v in cells.iloc[r] if v]
+        if col0[r] or (len(row) == 1 and _is_section(row[0])):
+            data_start = r
+            break
+
+    header = cells.iloc[header_start:data_start]
+    label_cols = [0]
+    if raw.shape[1] > 2 and not any(header[1]) and any(cells.iloc[data_start:, 1]):
+        label_cols.append(1)
+    return title, header_start, data_start, label_cols
+
+
+def column_labels(cells: pd.DataFrame, value_cols: List[int]) -> Dict[int, List[str]]:
+    """Etykiety kolumn z nagłówka wielowierszowego; komórki scalone rozciągane w prawo w obrębie rodzica."""
+    labels: Dict[int, List[str]] = {c: [] for c in value_cols}
+    boundaries = {value_cols[0]} if value_cols else set()
+    for r in range(len(cells)):
+        carry = ""
+        new_boundaries = set(boundaries)
+        for c in value_cols:
+            if c in boundaries:
+                carry = ""
+            text = cells.iat[r, c]
+            if text:
+                carry = text
+                new_boundaries.add(c)
+            if carry:
+                labels[c].append(carry)
+        boundaries = new_boundaries
+    return labels
+
+
+def parse_sheet(raw: pd.DataFrame) -> Tuple[str, pd.DataFrame]:
+    """Przekształć surowy arkusz tablicy w długą ramkę (COLUMNS)."""
+    title, header_start, data_start, label_cols = detect_layout(raw)
+    cells = raw.map(clean_label)
+    value_cols = [c for c in range(raw.shape[1]) if c not in label_cols]
+    header = cells.iloc[header_start:data_start]
+    col_labels = column_labels(header, value_cols)
+    corner = " ".join(header[0]).lower()
+    ages_in_rows = "wiek" in corner or "age" in corner
+    title_year = re.search(r"W (\d{4}) R", title)
+
+    col_info = {}
+    for c in value_cols:
+        parts = col_labels[c]
+        text = " | ".join(parts)
+        age = None
+        if re.search(r"wiek|age", text, re.I):
+            # od najniższego poziomu nagłówka: 'W wieku | 0–4 | w tym 0 lat' -> '0', '... | razem' -> '0-4'
+            age = next((a for a in (parse_age(re.sub(r"^w tym ", "", p, flags=re.I)) for p in reversed(parts)) if a), None)
+        year = next((y for y in (parse_year(p) for p in parts) if y), None)
+        col_info[c] = (text, age, year, parse_sex(parts[-1]) if parts else None)
+
+    records = []
+    section, area, ctx_sex, ctx_region = "", "", None, None
+    prev_data = False
+    for r in range(data_start, len(cells)):
+        labels = [cells.iat[r, c] for c in label_cols]
+        values = {c: parse_value(raw.iat[r, c]) for c in value_cols}
+        values = {c: v for c, v in values.items() if v is not None}
+        label = labels[0]
+        kind = label_kind(label)
+        if not values:
+            # wiersz bez liczb tuż po danych to zwykle angielskie tłumaczenie etykiety ('POLSKA' / 'POLAND')
+            if label and _is_section(label) and not prev_data:
+                if kind == "obszar":
+                    area, ctx_sex = label, None
+                elif kind == "plec":
+                    ctx_sex = parse_sex(label)
+                elif kind == "ogolem":
+                    section, area, ctx_sex = "", "", None
+                else:
+                    section, area, ctx_sex = label, "", None
+            prev_data = prev_data and bool(label)
+            continue
+        prev_data = True
+
+        if kind == "obszar":
+            area, ctx_sex = label, None
+        elif kind == "plec":
+            ctx_sex = parse_sex(label)
+        elif kind == "ogolem":
+            ctx_sex = None
+        region = parse_region(label)
+        row_age = parse_age(label, bare_numbers=True) if ages_in_rows and label and not region else None
+        if region:
+            ctx_region = region
+        elif row_age is None:
+            ctx_region = None
+        row_year = next((y for y in (parse_year(t) for t in labels) if y), None)
+        parsed = {label} if (kind or region or row_age or parse_year(label)) else set()
+        row_text = " ".join(t for t in labels if t and t not in parsed and not parse_year(t))
+        for c, value in values.items():
+            text, col_age, col_year, col_sex = col_info[c]
+            measure = " | ".join(p for p in (section, area, text, row_text) if p)
+            year = row_year or col_year or (int(title_year.group(1)) if title_year else None)
+            records.append((region or ctx_region, col_sex or ctx_sex, row_age or col_age, year, measure, value))
+
+    df = pd.DataFrame.from_records(records, columns=COLUMNS)
+    df["year"] = df["year"].astype("Int64")
+    return title, df
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stamped_hash(path: Path, stamps: Dict[str, dict]) -> str:
+    """Skrót pliku; przeliczany tylko, gdy zmienił się rozmiar lub mtime."""
+    stat = path.stat()
+    entry = stamps.get(path.name)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+    digest = file_hash(path)
+    stamps[path.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    return digest
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^0-9A-Za-z]+", "_", text).strip("_").lower() or "tablica"
+
+
+def _prune_versions(slug: str, keep: Path):
+    """Usuń katalogi cache tego samego skoroszytu z innym skrótem lub wersją parsera."""
+    pattern = re.compile(rf"{re.escape(slug)}-[0-9a-f]{{16}}(-v\d+)?")
+    for old in CACHE_DIR.iterdir():
+        if old != keep and old.is_dir() and pattern.fullmatch(old.name):
+            shutil.rmtree(old)
+            print(f"Usunięto nieaktualny cache {old}")
+
+
+def ingest_workbook(path: Path, digest: str) -> Path:
+    """Zapisz wszystkie tablice skoroszytu do CACHE_DIR/<stem>-<hash>-v<wersja>/ (jeśli jeszcze nie istnieją)."""
+    slug = slugify(path.stem)
+    target = CACHE_DIR / f"{slug}-{digest[:16]}-v{PARSER_VERSION}"
+    manifest_path = target / "manifest.json"
+    if manifest_path.exists():
+        return target
+
+    target.mkdir(parents=True, exist_ok=True)
+    manifest = {"source": path.name, "sha256": digest, "tables": {}}
+    for sheet, raw in pd.read_excel(path, sheet_name=None, header=None).items():
+        if not sheet.strip().lower().startswith("tabl"):
+            continue
+        title, df = parse_sheet(raw)
+        name = f"{slugify(sheet)}.parquet"
+        df.to_parquet(target / name, index=False)
+        manifest["tables"][sheet.strip()] = {"file": name, "title": title, "rows": len(df)}
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Zapisano cache {path.name}: {len(manifest['tables'])} tablic -> {target}")
+    _prune_versions(slug, target)
+    return target
+
+
+def ensure_cache(source_dir: Path = ROCZNIK_DIR) -> Dict[str, Path]:
+    """Zapewnij aktualny cache dla wszystkich skoroszytów; zwróć mapę prefiks ('08') -> katalog cache."""
+    stamps = json.loads(STAMPS_FILE.read_text(encoding="utf-8")) if STAMPS_FILE.exists() else {}
+    dirs: Dict[str, Path] = {}
+    for path in sorted(source_dir.glob("*.xls*")):
+        digest = _stamped_hash(path, stamps)
+        dirs[path.name.split("_", 1)[0]] = ingest_workbook(path, digest)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    STAMPS_FILE.write_text(json.dumps(stamps, indent=2), encoding="utf-8")
+    return dirs
+
+
+@lru_cache(maxsize=None)
+def _cache_dirs() -> Dict[str, Path]:
+    return ensure_cache()
+
+
+@lru_cache(maxsize=64)
+def _read_table(directory: Path, sheet: str) -> pd.DataFrame:
+    manifest = json.loads((directory / "manifest.json").read_text(encoding="utf-8"))
+    tables = {name.lower(): meta for name, meta in manifest["tables"].items()}
+    meta = tables.get(sheet.strip().lower())
+    if meta is None:
+        raise KeyError(f"Brak tablicy '{sheet}' w {manifest['source']}")
+    return pd.read_parquet(directory / meta["file"])
+
+
+def load_table(workbook: str, sheet: str) -> pd.DataFrame:
+    """Tablica w długim formacie, np. load_table('08', 'Tabl. 61 (85)')."""
+    return _read_table(_cache_dirs()[workbook], sheet).copy()
+
+
+def query(workbook: str, sheet: str, region: str = None, sex: str = None, measure: str = None) -> pd.DataFrame:
+    """Filtrowanie tablicy: region/płeć dokładnie, measure jako wyrażenie regularne (bez wielkości liter)."""
+    df = _read_table(_cache_dirs()[workbook], sheet)
+    mask = pd.Series(True, index=df.index)
+    if region is not None:
+        mask &= df["region"] == region
+    if sex is not None:
+        mask &= df["sex"] == sex
+    if measure is not None:
+        mask &= df["measure"].str.contains(measure, case=False, regex=True, na=False)
+    return df[mask].copy()
+
+
+def main():
+    dirs = ensure_cache()
+    for prefix, directory in dirs.items():
+        manifest = json.loads((directory / "manifest.json").read_text(encoding="utf-8"))
+        rows = sum(meta["rows"] for meta in manifest["tables"].values())
+        print(f"{prefix}: {manifest['source']} – {len(manifest['tables'])} tablic, {rows} wierszy")
+
+
+if __name__ == "__main__":
+    main()
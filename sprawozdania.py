@@ -0,0 +1,231 @@
+"""
+Jedno polecenie dla wszystkich skryptów: python sprawozdania.py <podpolecenie> [opcje].
+
+  download    pobranie PDF-ów sprawozdań z BIP (download_reports)
+  parse       RZiS -> raport_finansowy_2024.xlsx + uwagi_nieprawidlowosci.docx (analyze_financials)
+  demography  liczebności dzieci z prognoz GUS -> demografia_dzieci.xlsx (extract_gus_children)
+  demand      zapotrzebowanie miejsc (+ prezentacja) z demografii (build_demand)
+  registry    podsumowania wykazu placówek (process_registry)
+  zsp         analiza zespołów szkolno-przedszkolnych (process_zsp_report)
+  report      przebudowa raportów potokiem etapów (pipeline: build / rebuild / status / lista)
+  queue       parsowanie RZiS kolejką zadań – wiele procesów / maszyn (parse_queue: dodaj / pracuj / zestaw)
+  serve       lokalna usługa JSON nad bazą analityczną (query_service)
+  sprawdz     sprawdzenia z asercjami na lokalnych atrapach (pobieranie: wznowienie po awariach BIP;
+              kolejka: odzyskanie zadań po SIGKILL i zgodność reduce z analyze)
+
+Moduł importuje na starcie tylko bibliotekę standardową: pandas, pdfplumber, python-docx, python-pptx
+i openpyxl ładowane są dopiero w podpoleceniu, które ich potrzebuje (--help i download startują od razu).
+Ścieżki i filtry (TERYT, fragmenty nazw powiatu/gminy) podawane opcjami; domyślne = stałe modułów.
+Pomiary: `--trace ślad.json` (czasy etapów/plików/stron, liczniki, pamięć) i `--profile` (cProfile) przed podpoleceniem.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import instrumentation
+
+
+def _given(**kwargs) -> dict:
+    """Tylko podane opcje – pozostałe parametry biorą wartości domyślne (stałe) z modułów."""
+    return {name: value for name, value in kwargs.items() if value is not None}
+
+
+def _at_least_one(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"wymagana liczba ≥ 1, podano {value}")
+    return number
+
+
+def cmd_download(args):
+    import crawl_scheduler
+    import download_reports
+
+    fetcher = crawl_scheduler.Fetcher(
+        **_given(na_sekunde=args.na_sekunde, policy=args.proby and crawl_scheduler.RetryPolicy(proby=args.proby))
+    )
+    download_reports.main(**_given(main_url=args.url, output_dir=args.katalog), od_nowa=args.od_nowa, fetcher=fetcher)
+
+
+def cmd_parse(args):
+    import analyze_financials
+
+    analyze_financials.build_reports(
+        **_given(
+            base_dirs=args.sprawozdania,
+            registry_file=args.wykaz,
+            summary_path=args.xlsx,
+            issues_path=args.docx,
+            rok=args.rok,
+            powiat=args.powiat,
+            miasto=args.gmina,
+        )
+    )
+
+
+def cmd_demography(args):
+    import extract_gus_children
+
+    # etykiety jak domyślne ("Powiat raciborski", "Miasto Racibórz"), na których opierają się build_demand i prezentacje
+    powiat = extract_gus_children.load_powiat(
+        **_given(teryt=args.powiat, jednostka=args.powiat and extract_gus_children.unit_label(args.powiat))
+    )
+    miasto = extract_gus_children.load_miasto(
+        **_given(teryt=args.gmina, jednostka=args.gmina and extract_gus_children.unit_label(args.gmina))
+    )
+    path = args.xlsx or extract_gus_children.OUTPUT_XLSX
+    extract_gus_children.write_demografia(powiat, miasto, path)
+    print(f"Zapisano {path}")
+
+
+def cmd_demand(args):
+    import build_demand
+
+    options = _given(source=args.zrodlo, out_xlsx=args.xlsx, out_pptx=args.pptx)
+    if args.bez_prezentacji:
+        options["out_pptx"] = None
+    build_demand.main(**options)
+
+
+def cmd_registry(args):
+    import process_registry
+
+    tables = process_registry.registry_tables(
+        process_registry.load_registry(**_given(path=args.wykaz)), **_given(powiat=args.powiat, miasto=args.gmina)
+    )
+    path = args.xlsx or process_registry.OUT_FILE
+    process_registry.write_registry(tables, path)
+    print(f"Zapisano {path}")
+
+
+def cmd_zsp(args):
+    import process_zsp_report
+
+    process_zsp_report.main(**_given(source_path=args.wykaz, output_path=args.xlsx))
+
+
+def cmd_report(args):
+    import pipeline
+
+    pipeline.main(args.argumenty)
+
+
+def cmd_queue(args):
+    import parse_queue
+
+    parse_queue.main(args.argumenty)
+
+
+def cmd_serve(args):
+    import query_service
+
+    server = query_service.serve(**_given(port=args.port, path=args.baza))
+    print(f"Usługa: http://127.0.0.1:{server.server_address[1]} (Ctrl+C kończy)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def cmd_check(args):
+    import bip_standin
+    import parse_queue
+
+    checks = {"pobieranie": bip_standin.check_resume, "kolejka": parse_queue.check}
+    unknown = set(args.sprawdzenia) - set(checks)
+    if unknown:
+        raise SystemExit(f"Nieznane sprawdzenia: {', '.join(sorted(unknown))} (dostępne: {', '.join(checks)})")
+    for name in args.sprawdzenia or list(checks):
+        print(f"== {name}")
+        checks[name]()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sprawozdania", description="Sprawozdania placówek oświatowych i demografia.")
+    parser.add_argument("--trace", type=Path, help="zapisz ślad czasów etapów/plików/stron (Trace Event JSON)")
+    parser.add_argument(
+        "--profile", action="store_true", help="cProfile wokół podpolecenia (cache/profile/<podpolecenie>.prof)"
+    )
+    sub = parser.add_subparsers(dest="polecenie", required=True, metavar="podpolecenie")
+
+    p = sub.add_parser("download", help="pobierz PDF-y sprawozdań z BIP")
+    p.add_argument("--url", help="strona z listą sprawozdań (domyślnie download_reports.MAIN_URL)")
+    p.add_argument("--katalog", type=Path, help="katalog docelowy (domyślnie pobrane/sprawozdania_2024)")
+    p.add_argument("--na-sekunde", type=float, help="limit zapytań na sekundę per host (domyślnie 2)")
+    p.add_argument("--proby", type=_at_least_one, help="liczba prób jednego adresu (domyślnie 5)")
+    p.add_argument("--od-nowa", action="store_true", help="wyczyść kolejkę pobierania (cache/pobieranie) i zacznij od nowa")
+    p.set_defaults(func=cmd_download)
+
+    p = sub.add_parser("parse", help="RZiS -> raport Excel i dokument z uwagami")
+    p.add_argument(
+        "--sprawozdania", type=Path, action="append", help="katalog z PDF-ami (można powtórzyć; domyślnie jak w analyze_financials)"
+    )
+    p.add_argument("--rok", type=int)
+    p.add_argument("--wykaz", type=Path, help="wykaz placówek (liczby uczniów)")
+    p.add_argument("--powiat", help="fragment nazwy powiatu w wykazie")
+    p.add_argument("--gmina", help="fragment nazwy gminy w wykazie")
+    p.add_argument("--xlsx", type=Path)
+    p.add_argument("--docx", type=Path)
+    p.set_defaults(func=cmd_parse)
+
+    p = sub.add_parser("demography", help="liczebności dzieci z prognoz GUS")
+    p.add_argument("--powiat", help="TERYT powiatu (domyślnie 2411 – raciborski)")
+    p.add_argument("--gmina", help="TERYT gminy (domyślnie 2411011 – Racibórz)")
+    p.add_argument("--xlsx", type=Path)
+    p.set_defaults(func=cmd_demography)
+
+    p = sub.add_parser("demand", help="zapotrzebowanie miejsc i prezentacja")
+    p.add_argument("--zrodlo", type=Path, help="plik w formacie demografia_dzieci.xlsx")
+    p.add_argument("--xlsx", type=Path)
+    p.add_argument("--pptx", type=Path)
+    p.add_argument("--bez-prezentacji", action="store_true", help="tylko plik Excel (bez python-pptx)")
+    p.set_defaults(func=cmd_demand)
+
+    p = sub.add_parser("registry", help="podsumowania wykazu placówek")
+    p.add_argument("--wykaz", type=Path)
+    p.add_argument("--powiat", help="fragment nazwy powiatu")
+    p.add_argument("--gmina", help="fragment nazwy gminy")
+    p.add_argument("--xlsx", type=Path)
+    p.set_defaults(func=cmd_registry)
+
+    p = sub.add_parser("zsp", help="analiza zespołów szkolno-przedszkolnych")
+    p.add_argument("--wykaz", type=Path, help="wykaz placówek (domyślnie pobrane/Wykaz_szko*2024_.xlsx)")
+    p.add_argument("--xlsx", type=Path)
+    p.set_defaults(func=cmd_zsp)
+
+    p = sub.add_parser("report", help="przebudowa raportów potokiem etapów (argumenty jak w pipeline.py)")
+    p.add_argument("argumenty", nargs=argparse.REMAINDER, help="np. build, status, rebuild raport_finansowy --workers 2")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("queue", help="parsowanie RZiS kolejką zadań (argumenty jak w parse_queue.py)")
+    p.add_argument("argumenty", nargs=argparse.REMAINDER, help="np. dodaj --sprawozdania pobrane, pracuj --procesy 4, zestaw")
+    p.set_defaults(func=cmd_queue)
+
+    p = sub.add_parser("serve", help="lokalna usługa JSON: /placowki, /wykaz, /zapotrzebowanie, /stan")
+    p.add_argument("--port", type=int, help="domyślnie 8800")
+    p.add_argument("--baza", type=Path, help="baza analityczna (domyślnie cache/analityka.sqlite)")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("sprawdz", help="sprawdzenia z asercjami na lokalnych atrapach (bez sieci)")
+    p.add_argument("sprawdzenia", nargs="*", help="pobieranie, kolejka (domyślnie wszystkie)")
+    p.set_defaults(func=cmd_check)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    instrumentation.enable(args.trace, [args.polecenie] if args.profile else ())
+    try:
+        with instrumentation.span(args.polecenie), instrumentation.profiled(args.polecenie):
+            args.func(args)
+    except FileNotFoundError as exc:
+        # brak pliku wejściowego (wykaz, prognoza GUS dla TERYT, ...) – komunikat zamiast śladu stosu
+        raise SystemExit(str(exc))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,328 @@
+"""
+Syntetyczne dane wejściowe w formatach źródłowych (do benchmarków i testów wydajności bez pobrane/):
+- PDF-y RZiS (tabela z liniami jak w sprawozdaniach z BIP; tekst Helvetica z polskimi znakami przez /Differences),
+  N placówek × S stron, zapisywane w układzie katalogów pobrane/<placówka>/RACHUNEK_..._<rok>.pdf;
+  wybrane jako skany (same obrazy stron, bez warstwy tekstowej – jak zeskanowane załączniki BIP),
+- wykaz szkół i placówek (XLSX) z N wierszami i kolumnami jak w wykazie RSPO (także zespoły szkolno-przedszkolne),
+- skoroszyty prognozy GUS "Tabl. 1" (bloki Ogółem / Mężczyźni / Kobiety × roczniki 0–89, 90+ × lata),
+  nazwane "<TERYT> <nazwa>.xlsx" – gus_source czyta je z podanego katalogu bazowego.
+Generatory są deterministyczne (ziarno), więc wyniki benchmarków są porównywalne między commitami.
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# wiersze RZiS jednostki budżetowej (wariant porównawczy) – etykiety jak w sprawozdaniach
+RZIS_WIERSZE = [
+    "A. Przychody netto z podstawowej działalności operacyjnej",
+    "A.I. Przychody netto ze sprzedaży produktów",
+    "A.II. Zmiana stanu produktów",
+    "A.III. Koszt wytworzenia produktów na własne potrzeby jednostki",
+    "A.IV. Przychody netto ze sprzedaży towarów i materiałów",
+    "A.V. Dotacje na finansowanie działalności podstawowej",
+    "A.VI. Przychody z tytułu dochodów budżetowych",
+    "B. Koszty działalności operacyjnej",
+    "B.I. Amortyzacja",
+    "B.II. Zużycie materiałów i energii",
+    "B.III. Usługi obce",
+    "B.IV. Podatki i opłaty",
+    "B.V. Wynagrodzenia",
+    "B.VI. Ubezpieczenia społeczne i inne świadczenia dla pracowników",
+    "B.VII. Pozostałe koszty rodzajowe",
+    "B.VIII. Wartość sprzedanych towarów i materiałów",
+    "B.IX. Inne świadczenia finansowane z budżetu",
+    "B.X. Pozostałe obciążenia",
+    "C. Zysk (strata) z działalności podstawowej (A - B)",
+    "D. Pozostałe przychody operacyjne",
+    "D.I. Zysk ze zbycia niefinansowych aktywów trwałych",
+    "D.II. Dotacje",
+    "D.III. Inne przychody operacyjne",
+    "E. Pozostałe koszty operacyjne",
+    "E.I. Koszty inwestycji finansowanych ze środków własnych",
+    "E.II. Pozostałe koszty operacyjne",
+    "F. Zysk (strata) z działalności operacyjnej (C + D - E)",
+    "G. Przychody finansowe",
+    "G.I. Dywidendy i udziały w zyskach",
+    "G.II. Odsetki",
+    "G.III. Inne",
+    "H. Koszty finansowe",
+    "H.I. Odsetki",
+    "H.II. Inne",
+    "I. Zysk (strata) brutto (F + G - H)",
+    "J. Podatek dochodowy",
+    "K. Pozostałe obowiązkowe zmniejszenia zysku (zwiększenia straty)",
+    "L. Zysk (strata) netto (I-J-K)",
+]
+# udziały pozycji kosztów rodzajowych w kosztach operacyjnych (jak w przedszkolach/szkołach)
+STRUKTURA_KOSZTOW = {
+    "B.I.": 0.01,
+    "B.II.": 0.09,
+    "B.III.": 0.03,
+    "B.IV.": 0.002,
+    "B.V.": 0.69,
+    "B.VI.": 0.17,
+    "B.VII.": 0.008,
+}
+TYPY_PLACOWEK = ("Przedszkole", "Szkoła Podstawowa", "Zespół Szkolno-Przedszkolny")
+
+# polskie litery spoza WinAnsi -> kody 128.. w /Differences czcionki
+_POLSKIE = "ąćęłńśźżĄĆĘŁŃŚŹŻ"
+_GLIFY = "aogonek cacute eogonek lslash nacute sacute zacute zdotaccent Aogonek Cacute Eogonek Lslash Nacute Sacute Zacute Zdotaccent"
+_KODY = {ch: bytes([128 + i]) for i, ch in enumerate(_POLSKIE)}
+
+
+def _pdf_text(text: str) -> bytes:
+    """Tekst jako literał PDF w kodowaniu czcionki (WinAnsi + polskie litery z /Differences)."""
+    out = b"".join(_KODY.get(ch) or ch.encode("cp1252", errors="replace") for ch in text)
+    return b"(" + out.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _pdf_document(pages: List[bytes], width: int = 595, height: int = 842) -> bytes:
+    """Minimalny PDF 1.4: strony z podanymi strumieniami treści, jedna czcionka Helvetica (/F1)."""
+    n = len(pages)
+    font_id = 3
+    objects: Dict[int, bytes] = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(n)) + b"] /Count %d >>" % n,
+        font_id: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding << /Type /Encoding "
+        b"/BaseEncoding /WinAnsiEncoding /Differences [128 " + " ".join(f"/{g}" for g in _GLIFY.split()).encode() + b"] >> >>",
+    }
+    for i, content in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (width, height, font_id, content_id)
+        )
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offsets[i] for i in sorted(objects))
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def format_amount(value: Optional[float]) -> str:
+    """Kwota jak w sprawozdaniach: '1 234 567,89' (puste pole dla braku wartości)."""
+    if value is None:
+        return ""
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",")
+
+
+def _table_page(rows: Sequence[Tuple[str, str, str]], widths: Sequence[int] = (355, 95, 95), row_height: int = 16) -> bytes:
+    """Strumień treści strony: tabela z obramowaniem każdej komórki (pdfplumber wykrywa ją po liniach)."""
+    x0, top = 25, 800
+    ops = [b"0.5 w"]
+    text = []
+    for r, cells in enumerate(rows):
+        y = top - (r + 1) * row_height
+        x = x0
+        for c, (cell, w) in enumerate(zip(cells, widths)):
+            ops.append(b"%d %d %d %d re S" % (x, y, w, row_height))
+            if cell:
+                # etykiety od lewej, kwoty do prawej krawędzi komórki (szerokość ~ 4,4 pt na znak przy 8 pt)
+                tx = x + 3 if c == 0 else x + w - 3 - int(4.45 * len(cell))
+                text.append(b"BT /F1 8 Tf %d %d Td " % (tx, y + 5) + _pdf_text(cell) + b" Tj ET")
+            x += w
+    return b"\n".join(ops + text)
+
+
+def rzis_values(rng: np.random.Generator) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """Kwoty RZiS (rok poprzedni, bieżący) spójne rachunkowo: B = suma B.I–B.VII, C = A - B, ..., L = I."""
+    out: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+    koszty = rng.uniform(1.5e6, 9e6)
+    for col, scale in ((0, 0.93), (1, 1.0)):
+        b = koszty * scale
+        pozycje = {k: round(b * share * rng.uniform(0.8, 1.2), 2) for k, share in STRUKTURA_KOSZTOW.items()}
+        b = round(sum(pozycje.values()), 2)
+        a = round(b * rng.uniform(0.05, 0.2), 2)
+        d = round(rng.uniform(0, 2e4), 2)
+        e = round(rng.uniform(0, 2e3), 2)
+        g = round(rng.uniform(0, 500), 2)
+        h = round(rng.uniform(0, 2e3), 2)
+        values = {"A.": a, "A.VI.": a, "B.": b, **pozycje, "C.": a - b, "D.": d, "D.III.": d, "E.": e, "E.II.": e}
+        values.update({"F.": a - b + d - e, "G.": g, "G.II.": g, "H.": h, "H.I.": h})
+        values.update({"I.": a - b + d - e + g - h, "L.": a - b + d - e + g - h})
+        for kod, value in values.items():
+            prev, curr = out.get(kod, (None, None))
+            out[kod] = (round(value, 2), curr) if col == 0 else (prev, round(value, 2))
+    return out
+
+
+def rzis_pdf_bytes(facility: str, rok: int = 2024, pages: int = 1, seed: int = 0) -> bytes:
+    """RZiS placówki: strona 1 – pełne zestawienie, kolejne strony – powtórzona tabela (większe PDF-y)."""
+    values = rzis_values(np.random.default_rng(seed))
+    rows = [
+        (f"{facility.upper()} – rachunek zysków i strat za {rok}", "", ""),
+        ("Wyszczególnienie", "Rok poprzedni", "Rok bieżący"),
+    ]
+    for label in RZIS_WIERSZE:
+        prev, curr = values.get(label.split(" ", 1)[0], (None, None))
+        rows.append((label, format_amount(prev), format_amount(curr)))
+    return _pdf_document([_table_page(rows)] * pages)
+
+
+def scanned_pdf_bytes(pdf: bytes, dpi: int = 150) -> bytes:
+    """"Skan" PDF-a: strony wyrenderowane (pypdfium2, zależność pdfplumber) i zapisane jako obrazy (Pillow)."""
+    import io
+
+    import pypdfium2
+
+    doc = pypdfium2.PdfDocument(pdf)
+    images = [doc[i].render(scale=dpi / 72, grayscale=True).to_pil() for i in range(len(doc))]
+    buf = io.BytesIO()
+    images[0].save(buf, format="PDF", resolution=dpi, save_all=True, append_images=images[1:])
+    return buf.getvalue()
+
+
+def write_rzis_pdf(
+    path: Path, facility: str, rok: int = 2024, pages: int = 1, seed: int = 0, skan: bool = False
+) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pdf = rzis_pdf_bytes(facility, rok, pages, seed)
+    path.write_bytes(scanned_pdf_bytes(pdf) if skan else pdf)
+    return path
+
+
+def facility_names(n: int) -> List[str]:
+    return [f"{TYPY_PLACOWEK[i % len(TYPY_PLACOWEK)]} nr {i + 1} w Mieście" for i in range(n)]
+
+
+def rzis_corpus(
+    base: Path, facilities: int = 20, pages: int = 1, rok: int = 2024, seed: int = 0, skany: int = 0
+) -> List[str]:
+    """
+    N placówek: <base>/<slug>/RACHUNEK_ZYSKOW_I_STRAT_<rok>_<nr>.pdf (pierwsze `skany` jako skany, nazwa _skan);
+    pomija pliki już wygenerowane.
+    """
+    files = []
+    for i, name in enumerate(facility_names(facilities)):
+        slug = name.replace(" ", "_").replace("ł", "l").replace("ó", "o").replace("ś", "s")
+        skan = i < skany
+        path = base / slug / f"RACHUNEK_ZYSKOW_I_STRAT_{rok}_{i + 1}_s{pages}{'_skan' if skan else ''}.pdf"
+        if not path.exists():
+            write_rzis_pdf(path, name, rok, pages, seed + i, skan)
+        files.append(str(path))
+    return files
+
+
+def write_registry_xlsx(path: Path, rows: int = 20000, seed: int = 0) -> Path:
+    """Wykaz placówek (kolumny jak w wykazie RSPO); ~1/8 wierszy w powiecie raciborskim, w tym zespoły z podmiotami."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    ids = np.arange(100000, 100000 + rows)
+    typy = np.array(["Przedszkole", "Szkoła podstawowa", "Liceum ogólnokształcące", "Żłobek", "Technikum"])
+    typ = typy[rng.integers(0, len(typy), rows)]
+    nr = rng.integers(1, 40, rows)
+    powiat = np.where(rng.random(rows) < 0.125, "raciborski", "gliwicki")
+    gmina = np.where((powiat == "raciborski") & (rng.random(rows) < 0.5), "Racibórz", "Kuźnia Raciborska")
+    # co 50. wiersz – zespół szkolno-przedszkolny, a dwa kolejne wiersze to jego szkoła i przedszkole
+    parent = np.full(rows, np.nan)
+    rodzaj = np.full(rows, "jednostka samodzielna", dtype=object)
+    nazwa = np.char.add(np.char.add(typ.astype(str), " nr "), nr.astype(str)).astype(object)
+    zsp = np.arange(0, rows - 2, 50)
+    rodzaj[zsp] = "jednostka złożona"
+    nazwa[zsp] = [f"Zespół Szkolno-Przedszkolny nr {k}" for k in range(1, len(zsp) + 1)]
+    typ = typ.astype(object)
+    typ[zsp] = "Zespół szkół i placówek oświatowych"
+    for offset, kind in ((1, "Szkoła podstawowa"), (2, "Przedszkole")):
+        parent[zsp + offset] = ids[zsp]
+        typ[zsp + offset] = kind
+        powiat[zsp + offset] = powiat[zsp]
+        gmina[zsp + offset] = gmina[zsp]
+    ucz = rng.integers(20, 800, rows)
+    df = pd.DataFrame(
+        {
+            "idPodmiotGlowny": ids,
+            "idPodmiotNadrzedny": parent,
+            "Nazwa placówki": nazwa,
+            "Typ podmiotu": typ,
+            "Rodzaj szkoły/placówki": rodzaj,
+            "Województwo": "śląskie",
+            "Powiat": powiat,
+            "Gmina": gmina,
+            "Miejscowość": gmina,
+            "Ulica": "ul. Szkolna",
+            "Numer domu": nr.astype(str),
+            "Numer lokalu": "",
+            "Kod pocztowy": "47-400",
+            "Poczta": gmina,
+            "ucz_ogolem": ucz,
+            "w tym_ucz_dziewczeta": (ucz * rng.uniform(0.4, 0.6, rows)).astype(int),
+            "w tym_w oddz_przedszk": np.where(typ == "Przedszkole", ucz, 0),
+            "lb_oddz": np.maximum(1, ucz // 22),
+        }
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False)
+    return path
+
+
+def write_gus_tabl1(base: Path, teryt: str, nazwa: str, lata: Sequence[int] = range(2022, 2061), seed: int = 0) -> Path:
+    """Skoroszyt prognozy "<TERYT> <nazwa>.xlsx" z arkuszem "Tabl. 1" w układzie GUS (bloki płci × roczniki × lata)."""
+    import xlsxwriter
+
+    rng = np.random.default_rng(seed)
+    lata = list(lata)
+    wiek = [str(a) for a in range(90)] + ["90+"]
+    base_pop = rng.uniform(400, 1200, len(wiek))
+    trend = np.linspace(1.0, rng.uniform(0.6, 0.9), len(lata))
+    men = np.round(np.outer(base_pop, trend) * 0.49)
+    women = np.round(np.outer(base_pop, trend) * 0.51)
+    path = base / f"{teryt} {nazwa}.xlsx"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+    ws = wb.add_worksheet("Tabl. 1")
+    ws.write_row(0, 0, [f"Tabl. 1. Ludność według płci i wieku – {nazwa}"])
+    ws.write_row(2, 0, ["Płeć", "Wiek", *lata])
+    row = 3
+    for blok, values in (("Ogółem", men + women), ("Mężczyźni", men), ("Kobiety", women)):
+        ws.write_row(row, 0, [blok, "Ogółem Total", *values.sum(axis=0).tolist()])
+        row += 1
+        for label, line in zip(wiek, values):
+            ws.write_row(row, 1, [label, *line.tolist()])
+            row += 1
+    ws.write_row(row + 1, 0, ["Źródło: dane syntetyczne"])
+    wb.close()
+    return path
+
+
+def gus_corpus(base: Path, units: int = 1, seed: int = 0) -> List[str]:
+    """Skoroszyty Tabl. 1 dla kolejnych powiatów syntetycznych (TERYT 2401, 2402, ...); zwraca kody TERYT."""
+    codes = []
+    for i in range(units):
+        teryt = f"24{i + 1:02d}"
+        if not (base / f"{teryt} syntetyczny{i + 1}.xlsx").exists():
+            write_gus_tabl1(base, teryt, f"syntetyczny{i + 1}", seed=seed + i)
+        codes.append(teryt)
+    return codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Syntetyczne PDF-y RZiS, wykaz placówek i prognozy GUS.")
+    parser.add_argument("katalog", type=Path, help="katalog docelowy")
+    parser.add_argument("--placowki", type=int, default=20)
+    parser.add_argument("--strony", type=int, default=1)
+    parser.add_argument("--skany", type=int, default=0, help="ile pierwszych placówek ma RZiS jako skan (bez tekstu)")
+    parser.add_argument("--wiersze-wykazu", type=int, default=20000)
+    parser.add_argument("--jednostki-gus", type=int, default=1)
+    args = parser.parse_args()
+
+    files = rzis_corpus(args.katalog / "pobrane", args.placowki, args.strony, skany=args.skany)
+    registry = write_registry_xlsx(args.katalog / "wykaz.xlsx", args.wiersze_wykazu)
+    gus = gus_corpus(args.katalog / "GUS", args.jednostki_gus)
+    print(f"Zapisano {len(files)} PDF-ów RZiS, {registry} i {len(gus)} skoroszyty GUS w {args.katalog}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Warstwa tekstowa stron PDF i OCR stron zeskanowanych:
+- triage(page): tania ocena strony przed wyciąganiem tabel – liczba znaków, kroje pisma, odsetek znaków
+  nieczytelnych ((cid:N), U+FFFD, znaki sterujące / z obszaru prywatnego) i obrazy; korzysta z obiektów,
+  które pdfplumber i tak parsuje dla extract_tables(), więc PDF z tekstem nic nie traci,
+- ocr_pages(): tylko strony bez użytecznej warstwy tekstowej renderowane (pypdfium2, przez pdfplumber)
+  i rozpoznawane lokalnym silnikiem OCR w ograniczonej puli wątków; wynik w cache jednostkowym
+  (build_state, przestrzeń "ocr") pod skrótem treści strony (strumienie treści + obrazy) i silnika,
+- silnik: SPRAWOZDANIA_OCR = "tesseract" (domyślnie; program `tesseract` z pakietem języka pol),
+  "brak" albo "moduł:Klasa" (własny silnik: obiekt z atrybutem `nazwa` i wywołaniem png -> tekst).
+Bez silnika strony-skany nie są odczytywane, ale nie znikają: parse_rzis_pdf oznacza je wierszem
+z zrodlo="nieczytelne" i numerem strony. Zestawienie pokazuje je osobno (kolumna strony_nieczytelne);
+placówka jest nieodczytana (kolumna odczyt) dopiero wtedy, gdy nie ma żadnej pozycji zestawienia –
+zeskanowana strona z podpisami przy czytelnym RZiS nie unieważnia sprawozdania.
+"""
+
+import hashlib
+import importlib
+import io
+import os
+import shutil
+import subprocess
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Protocol, Tuple
+
+import build_state
+import instrumentation
+
+OCR_ENV = "SPRAWOZDANIA_OCR"
+OCR_DPI = 300
+OCR_JEZYK = "pol"
+OCR_TIMEOUT = 120  # s na stronę
+OCR_PROCESY = min(4, os.cpu_count() or 1)
+MIN_ZNAKOW = 40  # mniej znaków na stronie = brak warstwy tekstowej (skan, ew. sam podpis)
+MAX_NIECZYTELNYCH = 0.3  # większy odsetek znaków nieczytelnych = warstwa tekstowa bezużyteczna
+
+# odczyt sprawozdania (kolumna zestawienia "odczyt")
+TEKST, OCR, NIECZYTELNE = "tekst", "ocr", "nieczytelne"
+
+
+@dataclass(frozen=True)
+class PageTriage:
+    nr: int
+    znaki: int
+    czcionki: int  # liczba krojów pisma użytych na stronie
+    nieczytelne: float  # odsetek znaków bez poprawnego odwzorowania na Unicode
+    obrazy: int
+
+    @property
+    def czytelna(self) -> bool:
+        return self.znaki >= MIN_ZNAKOW and self.czcionki > 0 and self.nieczytelne <= MAX_NIECZYTELNYCH
+
+    @property
+    def do_ocr(self) -> bool:
+        """Strona bez użytecznego tekstu, na której coś jest (skan albo tekst w zepsutym kodowaniu)."""
+        return not self.czytelna and (self.obrazy > 0 or self.znaki > 0)
+
+
+def _unreadable(text: str) -> bool:
+    if text.startswith("(cid:") or text == "�":
+        return True
+    return any(unicodedata.category(ch) in ("Co", "Cc", "Cs") for ch in text)
+
+
+def triage(page, nr: int) -> PageTriage:
+    """Ocena warstwy tekstowej strony pdfplumber (bez renderowania)."""
+    chars = [c for c in page.chars if not c["text"].isspace()]
+    bad = sum(_unreadable(c["text"]) for c in chars)
+    return PageTriage(
+        nr=nr,
+        znaki=len(chars),
+        czcionki=len({c.get("fontname") for c in chars if c.get("fontname")}),
+        nieczytelne=bad / len(chars) if chars else 0.0,
+        obrazy=len(page.images),
+    )
+
+
+class OcrBackend(Protocol):
+    nazwa: str
+
+    def __call__(self, png: bytes) -> str: ...
+
+
+class TesseractBackend:
+    """Program tesseract (lokalnie, bez sieci): PNG na stdin, tekst na stdout; jeden wątek na proces OCR."""
+
+    def __init__(self, jezyk: str = OCR_JEZYK, timeout: float = OCR_TIMEOUT):
+        self.jezyk = jezyk
+        self.timeout = timeout
+        self.nazwa = f"tesseract-{jezyk}"
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("tesseract") is not None
+
+    def __call__(self, png: bytes) -> str:
+        result = subprocess.run(
+            ["tesseract", "stdin", "stdout", "-l", self.jezyk, "--psm", "6"],
+            input=png,
+            capture_output=True,
+            timeout=self.timeout,
+            check=True,
+            # równoległość daje pula stron – wielowątkowy tesseract tylko by z nią konkurował
+            env={**os.environ, "OMP_THREAD_LIMIT": "1"},
+        )
+        return result.stdout.decode("utf-8", errors="replace")
+
+
+@lru_cache(maxsize=None)
+def load_backend(spec: Optional[str] = None) -> Optional[OcrBackend]:
+    """Silnik OCR wg SPRAWOZDANIA_OCR (None = brak silnika – strony-skany zostają nieodczytane)."""
+    spec = spec or os.environ.get(OCR_ENV, "tesseract")
+    if spec == "brak":
+        return None
+    if spec == "tesseract":
+        return TesseractBackend() if TesseractBackend.available() else None
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+def version() -> str:
+    """Wersja odczytu do kluczy cache parsowania: kod modułu + silnik OCR."""
+    backend = load_backend()
+    return f"{build_state.module_hash('text_layer')[:8]}-{backend.nazwa if backend else 'brak'}"
+
+
+def _raw(obj) -> bytes:
+    from pdfminer.pdftypes import resolve1
+
+    # get_data(): treść po dekodowaniu (pdfminer zachowuje ją po pierwszym odczycie, a rawdata zeruje)
+    stream = resolve1(obj)
+    return stream.get_data() if hasattr(stream, "get_data") else b""
+
+
+def page_key(page, backend: OcrBackend, dpi: int = OCR_DPI) -> str:
+    """Skrót treści strony (strumienie treści i obrazów, bez renderowania) + silnik i rozdzielczość."""
+    h = hashlib.sha256(f"{backend.nazwa}:{dpi}".encode())
+    for content in page.page_obj.contents:
+        h.update(_raw(content))
+    for image in page.images:
+        h.update(_raw(image["stream"]))
+    return h.hexdigest()
+
+
+def _render(page, dpi: int) -> bytes:
+    buf = io.BytesIO()
+    page.to_image(resolution=dpi).original.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def ocr_pages(
+    pages: List[Tuple[int, object]],
+    backend: OcrBackend,
+    procesy: int = OCR_PROCESY,
+    dpi: int = OCR_DPI,
+) -> Dict[int, Optional[str]]:
+    """
+    Tekst stron (nr -> tekst; None = OCR się nie powiódł). Strony z cache bez renderowania; pozostałe
+    renderowane po kolei w wątku wywołującym (pdfium nie jest wątkowo bezpieczne) i rozpoznawane w puli
+    `procesy` wątków – w locie najwyżej 2·procesy obrazów stron.
+    """
+    texts: Dict[int, Optional[str]] = {}
+    todo = []
+    for nr, page in pages:
+        key = page_key(page, backend, dpi)
+        cached = build_state.load_unit("ocr", key)
+        if cached is not None:
+            texts[nr] = cached["tekst"]
+        else:
+            todo.append((nr, page, key))
+    if not todo:
+        return texts
+
+    def collect(done):
+        for future in done:
+            nr, key = pending.pop(future)
+            try:
+                texts[nr] = future.result()
+            except (OSError, subprocess.SubprocessError) as exc:
+                print(f"    ! OCR strony {nr}: {type(exc).__name__}: {exc}")
+                instrumentation.count("ocr.bledy")
+                texts[nr] = None
+                continue
+            build_state.save_unit("ocr", key, {"silnik": backend.nazwa, "tekst": texts[nr]})
+
+    def recognize(nr: int, png: bytes) -> str:
+        with instrumentation.span("ocr.strona", nr=nr, silnik=backend.nazwa):
+            return backend(png)
+
+    pending: Dict = {}
+    with ThreadPoolExecutor(max_workers=max(1, procesy)) as pool:
+        for nr, page, key in todo:
+            if len(pending) >= 2 * procesy:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            with instrumentation.span("ocr.render", nr=nr):
+                png = _render(page, dpi)
+            pending[pool.submit(recognize, nr, png)] = (nr, key)
+            instrumentation.count("ocr.strony")
+        collect(wait(pending).done)
+    return texts
+
+
+def unread_pages(rows: List[dict]) -> List[int]:
+    """Numery stron, których nie odczytano (wiersze-znaczniki parse_rzis_pdf)."""
+    return [row["strona"] for row in rows if row.get("zrodlo") == NIECZYTELNE]
+
+
+def reading_status(rows: List[dict], items: List[dict]) -> str:
+    """
+    Odczyt sprawozdania: tekst / ocr (do weryfikacji) / nieczytelne. items – wiersze, z których odczytano
+    pozycje zestawienia: ocr, gdy któraś pochodzi z OCR; nieczytelne, gdy nie ma żadnej, a jakaś strona
+    pozostała nieodczytana (bez stron nieodczytanych pusty wynik to problem układu tabel, nie odczytu).
+    """
+    if not items:
+        return NIECZYTELNE if unread_pages(rows) or not rows else TEKST
+    return OCR if any(row.get("zrodlo") == OCR for row in items) else TEKST
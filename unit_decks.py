@@ -0,0 +1,226 @@
+"""
+Prezentacje demograficzne per jednostka (powiat / gmina) generowane wsadowo:
+- wspólna kostka danych (teryt × wariant × rok × grupy wieku) liczona raz z Tabl. 1 prognoz GUS – z bazy
+  analitycznej (analytics_store, tabela gus_prognoza), a gdy jej brak – wprost z prognoz,
+- grupy wieku liczone z przedziałów wiek_od–wiek_do; grupa dostępna tylko, gdy przedziały pokrywają ją w całości
+  (powiaty: roczniki -> 0–2 / 3–6 / 7–18; gminy: tylko 0–9 i 10–19),
+- treść prezentacji opisuje szablon SLAJDY (tytuły z polami {nazwa}, {rok_od}, ...), wykresy przez
+  build_demand.add_chart_slide; opcjonalny plik .pptx jako szablon wyglądu (układy slajdów),
+- każda prezentacja renderowana w osobnym procesie puli – czas całości ≈ czas najwolniejszej prezentacji
+  (przy liczbie procesów ≥ liczby jednostek); proces dostaje tylko swój wycinek kostki.
+"""
+
+import argparse
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pptx import Presentation
+from pptx.enum.chart import XL_CHART_TYPE
+
+import analytics_store
+import build_demand
+import extract_gus_children
+import gus_source
+import instrumentation
+
+OUT_DIR = Path("raporty/prezentacje")
+WOJEWODZTWO = "24"
+LATA_WYKRESU = (2030, 2040, 2050)
+
+# grupa -> (opis, wiek od, wiek do)
+GRUPY: Dict[str, Tuple[str, int, int]] = {
+    "dzieci_0_2": ("Żłobek 0–2", 0, 2),
+    "dzieci_3_6": ("Przedszkole 3–6", 3, 6),
+    "dzieci_7_18": ("Szkoła 7–18", 7, 18),
+    "dzieci_0_18": ("Dzieci 0–18", 0, 18),
+    "dzieci_0_9": ("Dzieci 0–9", 0, 9),
+    "mlodziez_10_19": ("Młodzież 10–19", 10, 19),
+}
+# zestawy grup na wykresie zapotrzebowania – pierwszy w pełni dostępny dla jednostki
+ZESTAWY_WYKRESU = (("dzieci_0_2", "dzieci_3_6", "dzieci_7_18"), ("dzieci_0_9", "mlodziez_10_19"))
+# grupa "łącznie" na wykresie liniowym (pierwsza dostępna)
+GRUPY_LACZNIE = ("dzieci_0_18", "dzieci_0_9")
+
+# szablon treści: (rodzaj slajdu, tytuł) – tytuły formatowane polami jednostki
+SLAJDY: List[Tuple[str, str]] = [
+    ("tytul", "Demografia i zapotrzebowanie miejsc – {nazwa}"),
+    ("zakres", "Zakres danych"),
+    ("zapotrzebowanie", "{nazwa} – zapotrzebowanie miejsc wg grup wieku"),
+    ("lacznie", "{nazwa} – {grupa_lacznie}, {rok_od}–{rok_do}"),
+    ("warianty", "{nazwa} – {grupa_lacznie} w wariantach prognozy"),
+]
+
+
+def load_projections(prefixes: Iterable[str] = (WOJEWODZTWO,)) -> pd.DataFrame:
+    """Tabl. 1 (blok ogółem) z bazy analitycznej, a gdy jej nie ma – z plików prognoz GUS."""
+    prefixes = tuple(prefixes)
+    if analytics_store.DB_PATH.exists():
+        where = " OR ".join(f"teryt LIKE :p{i}" for i in range(len(prefixes)))
+        df = analytics_store.query(
+            f"SELECT teryt, wariant, plec, wiek, wiek_od, wiek_do, rok, liczba FROM gus_prognoza "
+            f"WHERE plec = 'ogolem' AND ({where})",
+            {f"p{i}": f"{p}%" for i, p in enumerate(prefixes)},
+        )
+        if not df.empty:
+            return df
+    return analytics_store.load_projections(prefixes)
+
+
+def data_cube(prognozy: pd.DataFrame) -> pd.DataFrame:
+    """Kostka teryt × wariant × rok z liczebnościami grup GRUPY (NaN, gdy przedziały wieku nie pokrywają grupy)."""
+    df = prognozy[(prognozy["plec"] == "ogolem") & (prognozy["wiek"] != "ogolem")]
+    df = df[df["wiek_od"].notna() & df["wiek_do"].notna()]
+    od = df["wiek_od"].to_numpy(dtype=float)
+    do = df["wiek_do"].to_numpy(dtype=float)
+    keys = [df["teryt"], df["wariant"], df["rok"]]
+    columns = {}
+    for grupa, (_, lo, hi) in GRUPY.items():
+        inside = (od >= lo) & (do <= hi)
+        liczba = df["liczba"].where(inside, 0.0).groupby(keys).sum()
+        pokrycie = pd.Series(np.where(inside, do - od + 1, 0), index=df.index).groupby(keys).sum()
+        columns[grupa] = liczba.where(pokrycie == hi - lo + 1)
+    ogolem = prognozy[(prognozy["plec"] == "ogolem") & (prognozy["wiek"] == "ogolem")]
+    columns["ogolem"] = ogolem.groupby(["teryt", "wariant", "rok"])["liczba"].sum()
+    cube = pd.DataFrame(columns)
+    cube.index.names = ["teryt", "wariant", "rok"]
+    return cube.reset_index().sort_values(["teryt", "wariant", "rok"]).reset_index(drop=True)
+
+
+def select_units(cube: pd.DataFrame, teryt: Optional[List[str]] = None, poziom: str = "powiat") -> List[str]:
+    """Jednostki do prezentacji: podane kody TERYT albo wszystkie jednostki poziomu (powiat: 4 znaki, gmina: 7)."""
+    available = sorted(cube["teryt"].unique())
+    if teryt:
+        unknown = [t for t in teryt if t not in available]
+        if unknown:
+            raise SystemExit(f"Brak prognozy GUS dla TERYT: {', '.join(unknown)}")
+        return list(teryt)
+    length = {"wojewodztwo": 2, "powiat": 4, "gmina": 7}[poziom]
+    return [t for t in available if len(t) == length]
+
+
+def slug(text: str) -> str:
+    ascii_text = unicodedata.normalize("NFKD", text.replace("ł", "l").replace("Ł", "L")).encode("ascii", "ignore").decode()
+    return re.sub(r"[^0-9A-Za-z]+", "_", ascii_text).strip("_")
+
+
+def display_name(teryt: str) -> str:
+    """Nazwa jednostki do tytułów – ta sama konwencja co etykiety demografii (extract_gus_children.unit_label)."""
+    return extract_gus_children.unit_label(teryt)
+
+
+def _fmt(value: float) -> str:
+    return f"{value:,.0f}".replace(",", " ")
+
+
+def _pct(value: float) -> str:
+    return f"{value * 100:+.1f}%".replace(".", ",")
+
+
+def render_deck(teryt: str, nazwa: str, kostka: pd.DataFrame, path: Path, szablon: Optional[Path] = None) -> float:
+    """Zapisz prezentację jednej jednostki z jej wycinka kostki; zwraca czas renderowania [s]."""
+    started = time.perf_counter()
+    bazowy = kostka[kostka["wariant"] == "bazowy"].set_index("rok").sort_index()
+    dostepne = [g for g in GRUPY if bazowy[g].notna().any()]
+    zestaw = next(z for z in ZESTAWY_WYKRESU if all(g in dostepne for g in z))
+    lacznie = next(g for g in GRUPY_LACZNIE if g in dostepne)
+    lata = bazowy.index.to_list()
+    pola = {
+        "nazwa": nazwa,
+        "teryt": teryt,
+        "rok_od": lata[0],
+        "rok_do": lata[-1],
+        "grupa_lacznie": GRUPY[lacznie][0].lower(),
+    }
+    lata_wykresu = [lata[0], *(r for r in LATA_WYKRESU if lata[0] < r < lata[-1]), lata[-1]]
+    wybrane = bazowy.loc[lata_wykresu].fillna(0)
+
+    prs = Presentation(szablon) if szablon else Presentation()
+    for rodzaj, tytul in SLAJDY:
+        tytul = tytul.format(**pola)
+        if rodzaj == "tytul":
+            build_demand.add_slide_title(prs, tytul, f"Prognoza GUS {lata[0]}–{lata[-1]} (TERYT {teryt})")
+        elif rodzaj == "zakres":
+            start, koniec = bazowy[lacznie].iloc[0], bazowy[lacznie].iloc[-1]
+            build_demand.add_bullet_slide(
+                prs,
+                tytul,
+                [
+                    f"Dostępne grupy wieku: {', '.join(GRUPY[g][0] for g in dostepne)}.",
+                    f"{GRUPY[lacznie][0]}: {_fmt(start)} ({lata[0]}) -> {_fmt(koniec)} ({lata[-1]}), "
+                    f"zmiana {_pct(koniec / start - 1)}.",
+                    "Założenie: zapotrzebowanie na miejsca = 100% liczebności danej grupy wiekowej.",
+                ],
+            )
+        elif rodzaj == "zapotrzebowanie":
+            build_demand.add_chart_slide(
+                prs, tytul, lata_wykresu, {GRUPY[g][0]: wybrane[g].tolist() for g in zestaw}
+            )
+        elif rodzaj == "lacznie":
+            build_demand.add_chart_slide(
+                prs, tytul, lata, {GRUPY[lacznie][0]: bazowy[lacznie].fillna(0).tolist()}, chart_type=XL_CHART_TYPE.LINE
+            )
+        elif rodzaj == "warianty":
+            warianty = kostka.pivot_table(index="rok", columns="wariant", values=lacznie, aggfunc="sum")
+            if warianty.shape[1] > 1:
+                build_demand.add_chart_slide(
+                    prs,
+                    tytul,
+                    warianty.index.to_list(),
+                    {w: warianty[w].fillna(0).tolist() for w in gus_source.WARIANTY if w in warianty},
+                    chart_type=XL_CHART_TYPE.LINE,
+                )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    instrumentation.count("slajdy", len(prs.slides))
+    with instrumentation.span("zapis.pptx", plik=path):
+        prs.save(path)
+    return time.perf_counter() - started
+
+
+def render_decks(
+    cube: pd.DataFrame,
+    units: List[str],
+    out_dir: Path = OUT_DIR,
+    szablon: Optional[Path] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, Path]:
+    """Renderuj prezentacje jednostek w puli procesów. Zwraca TERYT -> zapisany plik."""
+    by_unit = dict(tuple(cube[cube["teryt"].isin(units)].groupby("teryt")))
+    paths: Dict[str, Path] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for teryt in units:
+            nazwa = display_name(teryt)
+            path = out_dir / f"{teryt}_{slug(nazwa)}.pptx"
+            futures[pool.submit(render_deck, teryt, nazwa, by_unit[teryt], path, szablon)] = (teryt, path)
+        for future in as_completed(futures):
+            teryt, path = futures[future]
+            print(f"[{future.result():5.2f} s] {path}")
+            paths[teryt] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prezentacje demograficzne per powiat / gmina (równolegle).")
+    parser.add_argument("teryt", nargs="*", help="kody TERYT jednostek (domyślnie wszystkie jednostki poziomu)")
+    parser.add_argument("--poziom", choices=("wojewodztwo", "powiat", "gmina"), default="powiat")
+    parser.add_argument("--szablon", type=Path, help="plik .pptx z układami slajdów (domyślnie szablon python-pptx)")
+    parser.add_argument("--workers", type=int, help="liczba procesów (domyślnie liczba rdzeni)")
+    parser.add_argument("--katalog", type=Path, default=OUT_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    cube = data_cube(load_projections())
+    units = select_units(cube, args.teryt, args.poziom)
+    print(f"Kostka danych: {len(cube)} wierszy, {cube['teryt'].nunique()} jednostek ({time.perf_counter() - started:.2f} s)")
+    paths = render_decks(cube, units, args.katalog, args.szablon, args.workers)
+    print(f"Zapisano {len(paths)} prezentacji w {args.katalog} ({time.perf_counter() - started:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()